@@ -1,177 +1,340 @@
 import argparse
 import time
-import random
 import os
+import hashlib
+import tempfile
+import wave
+from bisect import bisect_right
 import numpy as np
+from collections import OrderedDict
+from functools import lru_cache
 from PIL import Image, ImageDraw, ImageFont
-from moviepy import VideoFileClip, CompositeVideoClip, VideoClip
-import whisper_timestamped as whisper
+from moviepy import VideoFileClip
+import transcribe_server
+from disk_cache import DiskCache, hash_key
+from encode_profiles import (DEFAULT_ENCODE_PROFILE, ENCODE_PROFILES, parse_window, resize_for_profile,
+                             write_videofile_kwargs)
+from align_words import load_words_sidecar
 
-def create_animated_text_clip(word, start, end, screen_size, style="normal"):
-    """Create a dynamic text clip with animations"""
-    word_duration = end - start
-    font_size = int(screen_size[1] * 0.08)
-    
-    # Load font with fallbacks
+SPRITE_CACHE_MAX_BYTES = 256 * 1024 * 1024  # ~256 Mo de tuiles RGBA au maximum
+WORDS_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+_words_cache = DiskCache("words", WORDS_CACHE_MAX_BYTES)
+
+# Define text styles
+TEXT_STYLES = {
+    "normal": {"fill": "white", "stroke": "black", "stroke_width": 3},
+    "highlight": {"fill": "#FFD700", "stroke": "#FF4500", "stroke_width": 4},
+    "emphasis": {"fill": "#FF6347", "stroke": "#8B0000", "stroke_width": 5}
+}
+
+
+@lru_cache(maxsize=16)
+def load_caption_font(font_size, font_path=None):
+    """Load the caption font with fallbacks (cached per size)"""
     assets_font = os.path.normpath(os.path.join(os.path.dirname(__file__), '../../assets/fonts/impact.ttf'))
-    try:
-        font = ImageFont.truetype(assets_font, font_size)
-    except Exception:
+    candidates = [assets_font, "impact.ttf", "arialbd.ttf"]
+    if font_path and os.path.isfile(font_path):
+        candidates.insert(0, font_path)
+    for candidate in candidates:
         try:
-            font = ImageFont.truetype("impact.ttf", font_size)
+            return ImageFont.truetype(candidate, font_size)
         except Exception:
+            continue
+    return ImageFont.load_default()
+
+
+class SpriteCache:
+    """LRU cache of pre-rendered word sprites (tightly cropped RGBA tiles)"""
+
+    def __init__(self, max_bytes=SPRITE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._sprites = OrderedDict()
+
+    def get(self, word, style, font_size, font_path=None):
+        """Return (tile, offset, text_size) for a word, rendering it only on first use.
+
+        `offset` is the position of the tile's top-left corner relative to the
+        point where PIL would draw the text origin.
+        """
+        key = (word, style, font_size, font_path)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+
+        self.misses += 1
+        sprite = render_word_sprite(word, style, font_size, font_path)
+        self._sprites[key] = sprite
+        self.current_bytes += sprite[0].nbytes
+        while self.current_bytes > self.max_bytes and len(self._sprites) > 1:
+            _, old_sprite = self._sprites.popitem(last=False)
+            self.current_bytes -= old_sprite[0].nbytes
+        return sprite
+
+    def clear(self):
+        self._sprites.clear()
+        self.current_bytes = 0
+
+
+def render_word_sprite(word, style, font_size, font_path=None):
+    """Rasterize a word with its outline once into a cropped RGBA tile"""
+    font = load_caption_font(font_size, font_path)
+    style_cfg = TEXT_STYLES.get(style, TEXT_STYLES["normal"])
+    stroke_width = style_cfg["stroke_width"]
+
+    measure = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+    if hasattr(measure, 'textbbox'):
+        bbox = measure.textbbox((0, 0), word, font=font)
+    else:
+        size = measure.textsize(word, font=font)
+        bbox = (0, 0, size[0], size[1])
+
+    # La tuile couvre le texte plus le contour dans toutes les directions
+    width = max(bbox[2] - bbox[0] + 2 * stroke_width, 1)
+    height = max(bbox[3] - bbox[1] + 2 * stroke_width, 1)
+    img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    origin = (stroke_width - bbox[0], stroke_width - bbox[1])
+
+    # Draw text outline (stroke)
+    for dx in range(-stroke_width, stroke_width + 1):
+        for dy in range(-stroke_width, stroke_width + 1):
+            if dx == 0 and dy == 0:
+                continue
+            draw.text((origin[0] + dx, origin[1] + dy), word, font=font, fill=style_cfg["stroke"])
+
+    # Draw main text
+    draw.text(origin, word, font=font, fill=style_cfg["fill"])
+
+    tile = np.array(img)
+    tile.flags.writeable = False
+    return tile, (-origin[0], -origin[1]), (bbox[2] - bbox[0], bbox[3] - bbox[1])
+
+
+_sprite_cache = SpriteCache()
+
+
+def caption_position(tile_offset, text_size, screen_size):
+    """Screen position of a sprite tile so the word sits at bottom center (85% height)"""
+    text_width, text_height = text_size
+    position = (screen_size[0]/2 - text_width/2, screen_size[1]*0.85 - text_height/2)
+    return (int(round(position[0] + tile_offset[0])), int(round(position[1] + tile_offset[1])))
+
+
+def caption_style(index):
+    """Apply different styles for emphasis"""
+    if index % 7 == 0:
+        return "emphasis"
+    if index % 4 == 0:
+        return "highlight"
+    return "normal"
+
+
+def blend_sprite(frame, tile, position):
+    """Alpha-blend an RGBA tile into an RGB frame in place, only over its bounding box"""
+    frame_h, frame_w = frame.shape[:2]
+    x, y = position
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + tile.shape[1], frame_w), min(y + tile.shape[0], frame_h)
+    if x0 >= x1 or y0 >= y1:
+        return frame
+
+    src = tile[y0 - y:y1 - y, x0 - x:x1 - x]
+    alpha = src[..., 3:4].astype(np.uint16)
+    region = frame[y0:y1, x0:x1, :3].astype(np.uint16)
+    blended = (src[..., :3] * alpha + region * (255 - alpha) + 127) // 255
+    frame[y0:y1, x0:x1, :3] = blended.astype(np.uint8)
+    return frame
+
+
+class CaptionTrack:
+    """Single caption layer over a sorted word timeline.
+
+    For a frame time the active words are found by binary search and their
+    sprites are blended into the base frame, so the cost per frame depends on
+    the number of visible words rather than on the length of the story.
+    """
+
+    def __init__(self, words, screen_size, font_path=None, sprite_cache=None):
+        self.screen_size = screen_size
+        self.sprite_cache = sprite_cache or _sprite_cache
+        font_size = int(screen_size[1] * 0.08)
+
+        entries = []
+        for i, word in enumerate(words):
+            if word["end"] <= word["start"] or not word["text"]:
+                continue
             try:
-                font = ImageFont.truetype("arialbd.ttf", font_size)
-            except Exception:
-                font = ImageFont.load_default()
-    
-    # Define text styles
-    styles = {
-        "normal": {"fill": "white", "stroke": "black", "stroke_width": 3},
-        "highlight": {"fill": "#FFD700", "stroke": "#FF4500", "stroke_width": 4},
-        "emphasis": {"fill": "#FF6347", "stroke": "#8B0000", "stroke_width": 5}
-    }
-    style_cfg = styles.get(style, styles["normal"])
-    
-    # Animation configurations - all ending at bottom center
-    animations = [
-        {"start_pos": (-screen_size[0], screen_size[1]*0.85), "end_pos": (screen_size[0]/2, screen_size[1]*0.85)},
-        {"start_pos": (screen_size[0]*2, screen_size[1]*0.85), "end_pos": (screen_size[0]/2, screen_size[1]*0.85)},
-        {"start_pos": (screen_size[0]/2, screen_size[1]*2), "end_pos": (screen_size[0]/2, screen_size[1]*0.85)}
-    ]
-    anim = random.choice(animations)
-    
-    def make_frame(t):
-        # Calculate animation progress
-        progress = min(max((t - start) / word_duration, 0), 1)
-        
-        # Position animation with easing
-        ease_progress = 1 - (1 - progress) ** 2
-        x = anim["start_pos"][0] + (anim["end_pos"][0] - anim["start_pos"][0]) * ease_progress
-        y = anim["start_pos"][1] + (anim["end_pos"][1] - anim["start_pos"][1]) * ease_progress
-        
-        # Create transparent image
-        img = Image.new('RGBA', screen_size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
-        
-        # Calculate text size and position - FIXED POSITIONING
-        if hasattr(draw, 'textbbox'):
-            bbox = draw.textbbox((0, 0), word, font=font)
-        else:
-            bbox = draw.textsize(word, font=font)
-            bbox = (0, 0, bbox[0], bbox[1])
-        
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        # Fixed position at bottom center (85% screen height)
-        position = (screen_size[0]/2 - text_width/2, screen_size[1]*0.85 - text_height/2)
-        
-        # Draw text outline (stroke)
-        for dx in range(-style_cfg["stroke_width"], style_cfg["stroke_width"] + 1):
-            for dy in range(-style_cfg["stroke_width"], style_cfg["stroke_width"] + 1):
-                if dx == 0 and dy == 0:
-                    continue
-                draw.text(
-                    (position[0] + dx, position[1] + dy),
-                    word,
-                    font=font,
-                    fill=style_cfg["stroke"]
+                tile, tile_offset, text_size = self.sprite_cache.get(
+                    word["text"], caption_style(i), font_size, font_path
                 )
-        
-        # Draw main text
-        draw.text(position, word, font=font, fill=style_cfg["fill"])
-        
-        return np.array(img)
-    
-    return VideoClip(make_frame, duration=word_duration).with_start(start)
+            except Exception as e:
+                print(f"Failed to create caption for '{word['text']}': {str(e)}")
+                continue
+            position = caption_position(tile_offset, text_size, screen_size)
+            entries.append((word["start"], word["end"], tile, position))
+        entries.sort(key=lambda e: e[0])
+
+        self.entries = entries
+        self.starts = [e[0] for e in entries]
+        # Fin maximale cumulée : permet d'arrêter la recherche arrière au plus tôt
+        self.max_ends = []
+        running = float("-inf")
+        for e in entries:
+            running = max(running, e[1])
+            self.max_ends.append(running)
+
+    def active_entries(self, t):
+        """Entries with start <= t < end, in timeline order"""
+        active = []
+        j = bisect_right(self.starts, t) - 1
+        while j >= 0 and self.max_ends[j] > t:
+            if self.entries[j][1] > t:
+                active.append(self.entries[j])
+            j -= 1
+        active.reverse()
+        return active
+
+    def compose(self, frame, t):
+        active = self.active_entries(t)
+        if not active:
+            return frame
+        out = np.array(frame, dtype=np.uint8, copy=True)
+        for _, _, tile, position in active:
+            blend_sprite(out, tile, position)
+        return out
+
+    def apply_to(self, clip):
+        """Return `clip` with the caption track burned in"""
+        return clip.transform(lambda get_frame, t: self.compose(get_frame(t), t))
+
+
+def transcribe_words(audio_path, model_name="base", language="en"):
+    """Word timings from the resident Whisper worker, or in-process if none is running"""
+    try:
+        words = transcribe_server.request_transcription(audio_path, model_name, language)
+    except Exception as e:
+        print(f"Whisper worker failed ({e}), transcribing in-process")
+        words = None
+    if words is not None:
+        print("Transcribed by the resident Whisper worker")
+        return words
+    return transcribe_server.transcribe_audio(audio_path, model_name, language)
+
+
+def hash_audio_samples(wav_path, chunk_frames=1 << 16):
+    """SHA-256 of the PCM samples of a WAV file (header excluded)"""
+    h = hashlib.sha256()
+    with wave.open(wav_path, 'rb') as wf:
+        h.update(f"{wf.getnchannels()}:{wf.getsampwidth()}:{wf.getframerate()}".encode())
+        while True:
+            frames = wf.readframes(chunk_frames)
+            if not frames:
+                break
+            h.update(frames)
+    return h.hexdigest()
 
-def add_captions_to_video(input_video, output_video, font_path=None):
-    """Add dynamic captions to a video file"""
+
+def cached_transcribe_words(audio_path, model_name="base", language="en", use_cache=True):
+    """transcribe_words with an on-disk cache keyed by audio samples, model and language"""
+    if not use_cache:
+        return transcribe_words(audio_path, model_name, language)
+
+    key = hash_key(hash_audio_samples(audio_path), model_name, language)
+    words = _words_cache.get_json(key)
+    if words is not None:
+        print(f"Word timings found in cache ({key[:12]})")
+        return words
+    words = transcribe_words(audio_path, model_name, language)
+    _words_cache.put_json(key, words)
+    return words
+
+
+def window_words(words, window):
+    """Words inside a (start, end) window, shifted so that the window starts at 0"""
+    if not window:
+        return words
+    start, end = window
+    return [{**w, "start": w["start"] - start, "end": w["end"] - start}
+            for w in words if w["start"] >= start and w["end"] <= end]
+
+
+def add_captions_to_video(input_video, output_video, font_path=None, words_path=None, use_cache=True,
+                          encode_profile=None, window=None):
+    """Add dynamic captions to a video file.
+
+    When `words_path` points to a word-timing sidecar (see align_words.py) the
+    audio extraction and Whisper transcription are skipped. Otherwise the
+    transcription is looked up in the word-timing cache unless `use_cache` is False.
+    Encoder settings come from `encode_profile` (see encode_profiles.py). With
+    `window` = (start, end) in seconds only that part of the video is rendered;
+    word timings still come from (and are cached for) the whole audio.
+    """
     start_time = time.time()
     print(f"Processing video: {input_video}")
     
     # Load video
-    video = VideoFileClip(input_video)
+    source = VideoFileClip(input_video)
+    video = source
+    if window:
+        print(f"Rendering window {window[0]:.1f}s-{min(window[1], source.duration):.1f}s")
+        video = video.subclipped(window[0], min(window[1], source.duration))
+    video = resize_for_profile(video, encode_profile)
     screen_size = video.size
     duration = video.duration
     print(f"Video duration: {duration:.2f} seconds")
     print(f"Resolution: {screen_size[0]}x{screen_size[1]}")
     
-    # Extract audio for transcription
-    print("Extracting audio...")
-    audio = video.audio
-    temp_audio = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../output/audio/temp_audio.wav')
-    audio.write_audiofile(temp_audio, logger=None)
-    
-    # Transcribe audio
-    print("Transcribing audio...")
-    audio_data = whisper.load_audio(temp_audio)
-    model = whisper.load_model("base")
-    result = whisper.transcribe(model, audio_data, language="en")
-    
-    words = []
-    for segment in result["segments"]:
-        for word in segment["words"]:
-            words.append({
-                "text": word["text"].strip(),
-                "start": word["start"],
-                "end": word["end"]
-            })
-    print(f"Transcribed {len(words)} words")
+    temp_audio = None
+    if words_path and os.path.exists(words_path):
+        print(f"Loading word timings from {words_path}")
+        words = load_words_sidecar(words_path)
+    else:
+        # Extract audio for transcription
+        print("Extracting audio...")
+        audio = source.audio
+        tmp = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+        tmp.close()
+        temp_audio = tmp.name
+        audio.write_audiofile(temp_audio, logger=None)
+
+        # Transcribe audio
+        print("Transcribing audio...")
+        words = cached_transcribe_words(temp_audio, use_cache=use_cache)
+        print(f"Transcribed {len(words)} words")
     
-    # Create animated text clips
+    # Build the caption track
     print("Creating dynamic captions...")
-    text_clips = []
-    for i, word in enumerate(words):
-        if word["end"] > duration:
-            continue
-            
-        # Apply different styles for emphasis
-        style = "normal"
-        if i % 7 == 0:
-            style = "emphasis"
-        elif i % 4 == 0:
-            style = "highlight"
-            
-        try:
-            text_clip = create_animated_text_clip(
-                word["text"], 
-                word["start"], 
-                word["end"], 
-                screen_size,
-                style
-            )
-            text_clips.append(text_clip)
-            print(f"Added caption: '{word['text']}' at {word['start']:.2f}s")
-        except Exception as e:
-            print(f"Failed to create caption for '{word['text']}': {str(e)}")
-    
+    words = [w for w in window_words(words, window) if w["end"] <= duration]
+    track = CaptionTrack(words, screen_size, font_path)
+    print(f"Prepared {len(track.entries)} captions")
+    print(f"Sprite cache: {_sprite_cache.misses} rendered, {_sprite_cache.hits} reused "
+          f"({_sprite_cache.current_bytes / 1024 / 1024:.1f} MB)")
+
     # Combine video and captions
     print("Compositing video with captions...")
-    final = CompositeVideoClip([video] + text_clips)
-    
+    final = track.apply_to(video)
+
     # Write output
     print("Rendering final video...")
-    final.write_videofile(
-        output_video,
-        codec='libx264',
-        audio_codec='aac',
-        fps=video.fps,
-        threads=4,
-        logger=None,
-        ffmpeg_params=['-crf', '18', '-preset', 'fast']
-    )
+    final.write_videofile(output_video, **write_videofile_kwargs(encode_profile, video.fps))
     
     # Cleanup audio temp file
-    try:
-        os.remove(temp_audio)
-    except:
-        pass
+    if temp_audio:
+        try:
+            os.remove(temp_audio)
+        except:
+            pass
     
     total_time = time.time() - start_time
     print(f"Success! Created {output_video} in {total_time:.1f} seconds")
     video.close()
+    source.close()
     final.close()
 
 if __name__ == "__main__":
@@ -198,11 +361,37 @@ if __name__ == "__main__":
         default="impact.ttf",
         help="Path to font file (default: impact.ttf)"
     )
+    parser.add_argument(
+        "--words",
+        default=None,
+        help="Word-timing JSON from align_words.py (skips Whisper transcription)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore the word-timing cache and always transcribe"
+    )
+    parser.add_argument(
+        "--encode-profile",
+        choices=list(ENCODE_PROFILES),
+        default=DEFAULT_ENCODE_PROFILE,
+        help=f"Encoder settings (default: {DEFAULT_ENCODE_PROFILE})"
+    )
+    parser.add_argument(
+        "--window",
+        type=parse_window,
+        default=None,
+        help="Only render a time window: 15 (first 15 s) or 10-25"
+    )
 
     args = parser.parse_args()
 
     add_captions_to_video(
         args.input_video,
         args.output_video,
-        args.font
+        args.font,
+        args.words,
+        use_cache=not args.no_cache,
+        encode_profile=args.encode_profile,
+        window=args.window
     )
\ No newline at end of file
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Alignement forcé du texte TTS sur le WAV généré : produit les horodatages mot à mot
+sans retranscrire l'audio avec Whisper. Le résultat est écrit dans un fichier JSON
+annexe (<audio>.words.json) consommé par add_caption.py.
+"""
+import argparse
+import json
+import os
+import re
+import time
+import unicodedata
+
+import model_registry
+from audio_mix import TTS_SPEED_FACTOR
+from disk_cache import DiskCache, hash_file, hash_key
+
+ALIGN_CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+_align_cache = DiskCache("align", ALIGN_CACHE_MAX_BYTES)
+
+
+def words_sidecar_path(audio_path):
+    """Default word-timing sidecar next to an audio file"""
+    return os.path.splitext(audio_path)[0] + '.words.json'
+
+
+def spoken_words(md_text):
+    """Words of a markdown/story file as they are displayed in captions"""
+    words = []
+    for line in md_text.splitlines():
+        line = re.sub(r'^\s*Speaker\s*\d+\s*:', '', line, flags=re.IGNORECASE)
+        line = re.sub(r'^\s*#+\s*', '', line)
+        line = re.sub(r'[*_`]+', '', line)
+        words.extend(w for w in line.split() if w)
+    return words
+
+
+def normalize_for_alignment(word):
+    """Lowercase ASCII letters and apostrophes, as expected by the MMS aligner"""
+    word = word.replace('’', "'")
+    word = unicodedata.normalize('NFKD', word).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r"[^a-z']", '', word.lower())
+
+
+def _load_aligner():
+    try:
+        import torchaudio
+    except ImportError:
+        raise RuntimeError(
+            "L'alignement forcé nécessite torchaudio>=2.1 (pip install torchaudio)."
+        )
+
+    def loader():
+        bundle = torchaudio.pipelines.MMS_FA
+        print("Loading MMS forced-alignment model...")
+        return {
+            'bundle': bundle,
+            'model': bundle.get_model(with_star=False),
+            'tokenizer': bundle.get_tokenizer(),
+            'aligner': bundle.get_aligner(),
+        }
+    return model_registry.get_model(("mms_fa",), loader)
+
+
+def align_words(words, audio_path, speed=TTS_SPEED_FACTOR):
+    """Align known words on an audio file.
+
+    Returns [{"text", "start", "end"}] in the timeline of the audio once it is
+    played `speed` times faster (as done by montage.create_random_clip).
+    """
+    import torch
+    import torchaudio
+
+    aligner = _load_aligner()
+    bundle = aligner['bundle']
+
+    waveform, sample_rate = torchaudio.load(audio_path)
+    waveform = waveform.mean(dim=0, keepdim=True)
+    if sample_rate != bundle.sample_rate:
+        waveform = torchaudio.functional.resample(waveform, sample_rate, bundle.sample_rate)
+
+    with torch.inference_mode():
+        emission, _ = aligner['model'](waveform)
+
+    # Les mots sans lettres (nombres, symboles) sont interpolés entre leurs voisins
+    normalized = [normalize_for_alignment(w) for w in words]
+    alignable = [i for i, n in enumerate(normalized) if n]
+    if not alignable:
+        raise ValueError("No alignable words in transcript")
+    token_spans = aligner['aligner'](emission[0], aligner['tokenizer']([normalized[i] for i in alignable]))
+
+    ratio = waveform.size(1) / emission.size(1) / bundle.sample_rate
+    times = [None] * len(words)
+    for i, spans in zip(alignable, token_spans):
+        times[i] = (spans[0].start * ratio, spans[-1].end * ratio)
+
+    total = waveform.size(1) / bundle.sample_rate
+    for i, value in enumerate(times):
+        if value is None:
+            prev_end = next((times[j][1] for j in range(i - 1, -1, -1) if times[j]), 0.0)
+            next_start = next((times[j][0] for j in range(i + 1, len(times)) if times[j]), total)
+            times[i] = (prev_end, max(next_start, prev_end))
+
+    return [
+        {"text": word, "start": start / speed, "end": end / speed}
+        for word, (start, end) in zip(words, times)
+    ]
+
+
+def write_words_sidecar(words, sidecar_path, **meta):
+    os.makedirs(os.path.dirname(os.path.abspath(sidecar_path)), exist_ok=True)
+    with open(sidecar_path, 'w', encoding='utf-8') as f:
+        json.dump({**meta, "words": words}, f, ensure_ascii=False, indent=2)
+
+
+def load_words_sidecar(sidecar_path):
+    with open(sidecar_path, 'r', encoding='utf-8') as f:
+        return json.load(f)["words"]
+
+
+def align_story(input_md, audio_path, sidecar_path=None, speed=TTS_SPEED_FACTOR, use_cache=True):
+    """Align a story file on its TTS audio and write the sidecar JSON.
+
+    Alignments are cached by text, audio content and speed, so re-running on
+    an unchanged story and WAV (e.g. a preview render) skips the aligner.
+    """
+    start_time = time.time()
+    with open(input_md, 'r', encoding='utf-8') as f:
+        words = spoken_words(f.read())
+
+    key = hash_key(' '.join(words), hash_file(audio_path), speed)
+    timed_words = _align_cache.get_json(key) if use_cache else None
+    if timed_words is not None:
+        print(f"Word timings found in cache ({key[:12]})")
+    else:
+        print(f"Aligning {len(words)} words on {audio_path}")
+        timed_words = align_words(words, audio_path, speed)
+        if use_cache:
+            _align_cache.put_json(key, timed_words)
+    sidecar_path = sidecar_path or words_sidecar_path(audio_path)
+    write_words_sidecar(timed_words, sidecar_path, source=input_md, audio=audio_path, speed=speed)
+    print(f"Saved word timings to {sidecar_path} in {time.time() - start_time:.1f} seconds")
+    return sidecar_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Aligner le texte d'une histoire sur son audio TTS (horodatages mot à mot)"
+    )
+    parser.add_argument("input_md", help="Fichier markdown/texte lu par le TTS")
+    parser.add_argument("audio_file", help="WAV produit par texttospeech_vibevoice.py")
+    parser.add_argument("--output", default=None, help="Fichier JSON de sortie (default: <audio>.words.json)")
+    parser.add_argument("--speed", type=float, default=TTS_SPEED_FACTOR,
+                        help=f"Accélération appliquée à l'audio au montage (default: {TTS_SPEED_FACTOR})")
+    parser.add_argument("--no-cache", action="store_true", help="Toujours réaligner (ignorer le cache)")
+    args = parser.parse_args()
+
+    align_story(args.input_md, args.audio_file, args.output, args.speed, use_cache=not args.no_cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Mixage audio en un seul graphe de filtres ffmpeg : accélération de la voix TTS
+(atempo), fenêtre de temps éventuelle, musique de fond bouclée (-stream_loop),
+atténuée et compressée par la voix (sidechaincompress), puis normalisation de
+la sonie (loudnorm). Le graphe peut être écrit dans un fichier ou intégré
+directement à la commande ffmpeg qui produit la vidéo.
+"""
+import argparse
+import os
+import random
+import subprocess
+import wave
+
+# Accélération appliquée à la voix TTS (les horodatages des sous-titres en dépendent)
+TTS_SPEED_FACTOR = 1.35
+
+BACKGROUND_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '../../assets/audio'))
+BACKGROUND_EXTENSIONS = ('.mp3', '.wav', '.aac', '.m4a', '.ogg')
+BACKGROUND_VOLUME = 0.3
+# Cible de sonie des plateformes de streaming (YouTube ~ -14 LUFS)
+LOUDNESS_TARGET = {"I": -14, "TP": -1.5, "LRA": 11}
+SAMPLE_RATE = 44100
+
+
+def pick_background(bg_dir=BACKGROUND_DIR, rng=random):
+    """Random background track from assets/audio, or None"""
+    if not os.path.isdir(bg_dir):
+        return None
+    candidates = sorted(f for f in os.listdir(bg_dir) if f.lower().endswith(BACKGROUND_EXTENSIONS))
+    return os.path.join(bg_dir, rng.choice(candidates)) if candidates else None
+
+
+def media_duration(path):
+    """Duration in seconds of an audio file (WAV header, moviepy otherwise)"""
+    if path.lower().endswith('.wav'):
+        with wave.open(path, 'rb') as wf:
+            return wf.getnframes() / wf.getframerate()
+    from moviepy import AudioFileClip
+    clip = AudioFileClip(path)
+    try:
+        return clip.duration
+    finally:
+        clip.close()
+
+
+def mixed_duration(voice_path, speed=TTS_SPEED_FACTOR, window=None):
+    """Duration of the mixed track: the sped-up voice, cut to `window`"""
+    duration = media_duration(voice_path) / speed
+    if window:
+        duration = max(0.0, min(window[1], duration) - window[0])
+    return duration
+
+
+def atempo_chain(speed):
+    """atempo filters for any speed (each atempo is limited to 0.5-2.0)"""
+    filters = []
+    while speed > 2.0:
+        filters.append('atempo=2.0')
+        speed /= 2.0
+    while speed < 0.5:
+        filters.append('atempo=0.5')
+        speed /= 0.5
+    if abs(speed - 1.0) > 1e-6 or not filters:
+        filters.append(f'atempo={speed:.6g}')
+    return filters
+
+
+def mix_graph(voice_path, background=None, first_input=0, speed=TTS_SPEED_FACTOR, window=None,
+              bg_volume=BACKGROUND_VOLUME, duck=True, loudness=LOUDNESS_TARGET):
+    """ffmpeg input + filter arguments of the mix; returns (args, output_label).
+
+    `first_input` is the index of the voice input in the final command (e.g.
+    1 when the video is input 0). The background is looped with -stream_loop
+    and cut by amix at the end of the voice, so no intermediate file is written.
+    """
+    fmt = f'aformat=sample_fmts=fltp:sample_rates={SAMPLE_RATE}:channel_layouts=stereo'
+    voice = atempo_chain(speed)
+    if window:
+        voice += [f'atrim=start={window[0]:.3f}:end={window[1]:.3f}', 'asetpts=PTS-STARTPTS']
+    voice.append(fmt)
+
+    args = ['-i', voice_path]
+    chains = []
+    if background:
+        args += ['-stream_loop', '-1', '-i', background]
+        if duck:
+            chains.append(f"[{first_input}:a]{','.join(voice)},asplit=2[voice][key]")
+            chains.append(f"[{first_input + 1}:a]{fmt},volume={bg_volume}[bgraw]")
+            chains.append("[bgraw][key]sidechaincompress=threshold=0.03:ratio=6:attack=20:release=400[bg]")
+        else:
+            chains.append(f"[{first_input}:a]{','.join(voice)}[voice]")
+            chains.append(f"[{first_input + 1}:a]{fmt},volume={bg_volume}[bg]")
+        chains.append("[voice][bg]amix=inputs=2:duration=first:dropout_transition=0:normalize=0[mix]")
+    else:
+        chains.append(f"[{first_input}:a]{','.join(voice)}[mix]")
+
+    if loudness:
+        target = ':'.join(f'{k}={v}' for k, v in loudness.items())
+        # loudnorm travaille en 192 kHz : revenir à la fréquence de sortie
+        chains.append(f"[mix]loudnorm={target},aresample={SAMPLE_RATE}[aout]")
+    else:
+        chains.append("[mix]anull[aout]")
+    return args + ['-filter_complex', ';'.join(chains)], '[aout]'
+
+
+def mix_audio(voice_path, output_path, background=None, speed=TTS_SPEED_FACTOR, window=None,
+              bg_volume=BACKGROUND_VOLUME, duck=True, loudness=LOUDNESS_TARGET, output_args=()):
+    """Render the mixed track to `output_path` in one ffmpeg pass (`output_args`: encoder options)"""
+    args, label = mix_graph(voice_path, background, 0, speed, window, bg_volume, duck, loudness)
+    subprocess.run(['ffmpeg', '-y', '-v', 'error'] + args + ['-map', label, *output_args, output_path], check=True)
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mixer la voix TTS et une musique de fond en une passe ffmpeg"
+    )
+    parser.add_argument("voice", help="WAV produit par le TTS")
+    parser.add_argument("output", help="Fichier audio de sortie (.wav, .m4a...)")
+    parser.add_argument("--background", default=None,
+                        help="Musique de fond (défaut : piste aléatoire de assets/audio)")
+    parser.add_argument("--no-background", action="store_true", help="Voix seule")
+    parser.add_argument("--speed", type=float, default=TTS_SPEED_FACTOR,
+                        help=f"Accélération de la voix (défaut : {TTS_SPEED_FACTOR})")
+    parser.add_argument("--bg-volume", type=float, default=BACKGROUND_VOLUME,
+                        help=f"Volume de la musique (défaut : {BACKGROUND_VOLUME})")
+    parser.add_argument("--no-duck", action="store_true", help="Ne pas atténuer la musique sous la voix")
+    parser.add_argument("--no-loudnorm", action="store_true", help="Sans normalisation de la sonie")
+    args = parser.parse_args()
+
+    background = None if args.no_background else (args.background or pick_background())
+    if background:
+        print(f"Using background audio: {os.path.basename(background)}")
+    mix_audio(args.voice, args.output, background, args.speed, bg_volume=args.bg_volume,
+              duck=not args.no_duck, loudness=None if args.no_loudnorm else LOUDNESS_TARGET)
+    print(f"Saved mix to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Planification du montage : choisit les clips et les points de coupe qui couvrent
+exactement la durée audio, à partir des durées connues (index média), sans image figée.
+"""
+import argparse
+import random
+import time
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+Segment = namedtuple('Segment', ['path', 'start', 'end'])
+
+
+def plan_montage(durations, target_duration, seed=None, min_segment=1.0, max_segment=None,
+                 random_offsets=True, keyframes=None):
+    """Pick clips and cut points whose lengths sum exactly to `target_duration`.
+
+    `durations` maps clip paths to their duration in seconds. Clips are taken
+    in a shuffled order; as soon as the remaining time fits in one unused clip
+    the montage is closed with a random clip that is long enough, so only the
+    footage actually shown is decoded and no freeze frame is needed. Segments
+    are capped at `max_segment` seconds and, when shorter than their clip,
+    start at a random offset. With `keyframes` ({path: keyframe timestamps},
+    from the media index) that offset is a keyframe, so the segment can be
+    stream-copied without moving its cut. Tails shorter than `min_segment` are avoided.
+    When every clip has been used the library is reused from the start.
+    The result is deterministic for a given seed.
+    """
+    rng = random.Random(seed)
+    library = sorted((p, d) for p, d in durations.items() if d and d > 0)
+    if not library:
+        raise ValueError("No clips with a known duration")
+    cap = max_segment or float('inf')
+
+    def new_pool():
+        order = [p for p, _ in library]
+        rng.shuffle(order)
+        by_duration = sorted((d, p) for p, d in library)
+        return order, by_duration
+
+    order, by_duration = new_pool()
+    segments = []
+    remaining = target_duration
+
+    def take(path, length):
+        clip_duration = durations[path]
+        offset = 0.0
+        if random_offsets and clip_duration > length:
+            starts = (keyframes or {}).get(path) or []
+            starts = starts[:bisect_right(starts, clip_duration - length + 1e-6)]
+            offset = rng.choice(starts) if starts else rng.uniform(0, clip_duration - length)
+        segments.append(Segment(path, offset, offset + length))
+        i = bisect_left(by_duration, (clip_duration, path))
+        del by_duration[i]
+
+    while remaining > 1e-6:
+        if not by_duration:
+            # Bibliothèque épuisée : on réutilise les clips plutôt que de figer l'image
+            order, by_duration = new_pool()
+
+        # Clôture : un clip inutilisé assez long pour couvrir le reste
+        if remaining <= cap and by_duration[-1][0] >= remaining:
+            first_fit = bisect_left(by_duration, (remaining, ''))
+            _, path = by_duration[rng.randrange(first_fit, len(by_duration))]
+            take(path, remaining)
+            remaining = 0
+            break
+
+        path = order.pop()
+        length = min(durations[path], cap, remaining)
+        tail = remaining - length
+        if 0 < tail < min_segment and length - (min_segment - tail) > 0:
+            length -= min_segment - tail
+        take(path, length)
+        remaining -= length
+
+    return segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planifier un montage sur la bibliothèque vidéo indexée")
+    parser.add_argument("video_list", help="Fichier texte contenant la liste des vidéos")
+    parser.add_argument("duration", type=float, help="Durée à couvrir (secondes)")
+    parser.add_argument("--seed", type=int, default=None, help="Graine pour un plan reproductible")
+    parser.add_argument("--max-segment", type=float, default=None, help="Durée maximale d'un segment")
+    args = parser.parse_args()
+
+    from media_index import index_path_for, refresh_index
+    from montage import library_keyframes, resolve_video_list
+    video_files = resolve_video_list(args.video_list)
+    index = refresh_index(video_files, index_path_for(args.video_list))
+    durations = {p: m['duration'] for p, m in index.items() if m.get('valid')}
+
+    start_time = time.time()
+    segments = plan_montage(durations, args.duration, seed=args.seed, max_segment=args.max_segment,
+                            keyframes=library_keyframes(index, durations))
+    print(f"Planned {len(segments)} segments in {(time.time() - start_time) * 1000:.1f} ms")
+    for seg in segments:
+        print(f"{seg.path}: {seg.start:.2f}s -> {seg.end:.2f}s ({seg.end - seg.start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
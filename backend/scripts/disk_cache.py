@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Cache disque adressé par contenu, partagé par les étapes du pipeline
+(horodatages Whisper, audio TTS...). Éviction LRU selon la taille totale.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+CACHE_ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), '../../output/cache'))
+
+
+def hash_key(*parts):
+    """Stable SHA-256 key from strings/bytes/numbers"""
+    h = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = str(part).encode('utf-8')
+        h.update(len(part).to_bytes(8, 'little'))
+        h.update(part)
+    return h.hexdigest()
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's content"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class DiskCache:
+    """Files named by key under `directory`, evicted least-recently-used first
+    once their total size exceeds `max_bytes`.
+
+    The total size is measured once, then kept up to date by `put_bytes`: the
+    directory is only walked again when the running total goes over `max_bytes`
+    (entries written by other processes are counted at that point).
+    """
+
+    def __init__(self, name, max_bytes, suffix='.json', root=CACHE_ROOT):
+        self.directory = os.path.join(root, name)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._total = None
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def get_path(self, key):
+        """Path of a cached entry (refreshing its LRU timestamp), or None"""
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def get_bytes(self, key):
+        path = self.get_path(key)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def put_bytes(self, key, data):
+        path = self.path_for(key)
+        if self._total is None:
+            self._total = sum(size for _, size, _ in self.entries())
+        try:
+            self._total -= os.path.getsize(path)
+        except OSError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Écriture atomique : un lecteur concurrent ne voit jamais un fichier partiel
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._total += len(data)
+        if self._total > self.max_bytes:
+            self.evict()
+        return path
+
+    def get_json(self, key):
+        data = self.get_bytes(key)
+        return None if data is None else json.loads(data.decode('utf-8'))
+
+    def put_json(self, key, value):
+        return self.put_bytes(key, json.dumps(value, ensure_ascii=False).encode('utf-8'))
+
+    def entries(self):
+        """(mtime, size, path) of every cached file"""
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if not filename.endswith(self.suffix):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, st.st_size, path))
+        return found
+
+    def evict(self):
+        """Remove least-recently-used entries until the cache fits in max_bytes"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        self._total = total
+        return removed
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Profils d'encodage nommés partagés par tous les rendus (montage, sous-titres,
+rendu en une passe) : codec, preset, CRF plafonné (maxrate/bufsize), résolution
+et fps maximum, threads selon le nombre de cœurs et moov en tête (+faststart).
+
+`python encode_profiles.py --benchmark` encode un clip de test avec chaque profil
+et affiche la vitesse d'encodage (fps) et la taille du fichier produit.
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+# CRF plafonné plutôt que deux passes : qualité constante, débit borné par
+# maxrate/bufsize pour rester dans les recommandations d'upload des Shorts
+ENCODE_PROFILES = {
+    "shorts-quality": {
+        "codec": "libx264",
+        "preset": "medium",
+        "crf": 18,
+        "maxrate": "12M",
+        "bufsize": "24M",
+        "max_height": 1920,
+        "fps": None,  # fps de la source
+        "audio_bitrate": "192k",
+    },
+    "shorts-fast": {
+        "codec": "libx264",
+        "preset": "veryfast",
+        "crf": 21,
+        "maxrate": "8M",
+        "bufsize": "16M",
+        "max_height": 1920,
+        "fps": None,
+        "audio_bitrate": "160k",
+    },
+    "preview": {
+        "codec": "libx264",
+        "preset": "ultrafast",
+        "crf": 30,
+        "maxrate": "1M",
+        "bufsize": "2M",
+        "max_height": 640,
+        "fps": 15,
+        "audio_bitrate": "96k",
+    },
+}
+DEFAULT_ENCODE_PROFILE = "shorts-quality"
+PREVIEW_PROFILE = "preview"
+
+
+def get_encode_profile(profile=None):
+    """Settings dict for a profile name, or a base profile overridden by a dict"""
+    if isinstance(profile, dict):
+        base = ENCODE_PROFILES[profile.get("name", DEFAULT_ENCODE_PROFILE)]
+        return {**base, **{k: v for k, v in profile.items() if k != "name"}}
+    name = profile or DEFAULT_ENCODE_PROFILE
+    if name not in ENCODE_PROFILES:
+        raise ValueError(f"Unknown encode profile {name!r} (choices: {', '.join(ENCODE_PROFILES)})")
+    return ENCODE_PROFILES[name]
+
+
+def encoder_threads():
+    """Encoder threads: every available core, or IWNA_ENCODER_THREADS (set by job_scheduler.py workers)"""
+    if os.environ.get("IWNA_ENCODER_THREADS"):
+        return max(1, int(os.environ["IWNA_ENCODER_THREADS"]))
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 4
+
+
+def output_fps(profile, source_fps):
+    """Frame rate of the render: the source rate, capped by the profile"""
+    settings = get_encode_profile(profile)
+    if settings["fps"] and source_fps:
+        return min(settings["fps"], source_fps)
+    return settings["fps"] or source_fps
+
+
+def scaled_size(size, profile):
+    """(width, height) fitting the profile's max height, kept even for yuv420p"""
+    width, height = size
+    max_height = get_encode_profile(profile)["max_height"]
+    if not max_height or height <= max_height:
+        return width, height
+    return int(round(width * max_height / height / 2)) * 2, max_height
+
+
+def fits_profile(size, fps, profile):
+    """True when a clip of this size and frame rate needs no rescaling for the profile"""
+    max_fps = get_encode_profile(profile)["fps"]
+    return tuple(scaled_size(size, profile)) == tuple(size) and not (max_fps and fps > max_fps)
+
+
+def resize_for_profile(clip, profile):
+    """Downscale a moviepy clip to the profile's max height (never upscales)"""
+    new_size = scaled_size(clip.size, profile)
+    if tuple(new_size) == tuple(clip.size):
+        return clip
+    return clip.resized(new_size=new_size)
+
+
+def parse_window(text):
+    """Time window from the command line: "15" (first 15 s) or "10-25" -> (start, end)"""
+    if not text:
+        return None
+    start, _, end = text.rpartition('-')
+    window = (float(start or 0), float(end))
+    if window[0] < 0 or window[1] <= window[0]:
+        raise ValueError(f"Invalid time window {text!r}")
+    return window
+
+
+def rate_control_params(profile):
+    """CRF + VBV cap as ffmpeg arguments"""
+    settings = get_encode_profile(profile)
+    params = ['-crf', str(settings["crf"])]
+    if settings.get("maxrate"):
+        params += ['-maxrate', settings["maxrate"], '-bufsize', settings["bufsize"]]
+    return params
+
+
+def ffmpeg_video_args(profile, codec=None):
+    """Video encoder arguments for a raw ffmpeg command (`codec` overrides the profile's)"""
+    settings = get_encode_profile(profile)
+    return (['-c:v', codec or settings["codec"], '-preset', settings["preset"]]
+            + rate_control_params(profile) + ['-threads', str(encoder_threads())])
+
+
+def ffmpeg_audio_args(profile):
+    """AAC encoder arguments for a raw ffmpeg command"""
+    return ['-c:a', 'aac', '-b:a', get_encode_profile(profile)["audio_bitrate"]]
+
+
+def write_videofile_kwargs(profile, source_fps=None):
+    """Keyword arguments for moviepy's write_videofile"""
+    settings = get_encode_profile(profile)
+    return {
+        'codec': settings["codec"],
+        'audio_codec': 'aac',
+        'audio_bitrate': settings["audio_bitrate"],
+        'fps': output_fps(profile, source_fps),
+        'preset': settings["preset"],
+        'threads': encoder_threads(),
+        'pixel_format': 'yuv420p',
+        'ffmpeg_params': rate_control_params(profile) + ['-movflags', '+faststart'],
+        'logger': None,
+    }
+
+
+def benchmark_profiles(profiles=None, source=None, duration=10.0, size=(1080, 1920), fps=30):
+    """Encode the same clip with each profile; returns [(name, encode_fps, size_mb, seconds)].
+
+    Without `source`, a synthetic ffmpeg test pattern of `size` and `fps` is used.
+    """
+    if source:
+        inputs = ['-t', f'{duration:.3f}', '-i', source]
+    else:
+        inputs = ['-f', 'lavfi', '-i', f'testsrc2=size={size[0]}x{size[1]}:rate={fps}:duration={duration}',
+                  '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}']
+    results = []
+    for name in profiles or list(ENCODE_PROFILES):
+        settings = get_encode_profile(name)
+        filters = []
+        if settings["max_height"]:
+            filters.append(f"scale=-2:'min({settings['max_height']},ih)'")
+        if settings["fps"]:
+            filters.append(f"fps='min({settings['fps']},source_fps)'")
+        out = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
+        out.close()
+        try:
+            cmd = ['ffmpeg', '-y', '-v', 'error'] + inputs
+            if filters:
+                cmd += ['-vf', ','.join(filters)]
+            cmd += ffmpeg_video_args(name) + ['-pix_fmt', 'yuv420p', '-c:a', 'aac', '-b:a', settings["audio_bitrate"],
+                                              '-movflags', '+faststart', '-progress', 'pipe:1', '-nostats', out.name]
+            start_time = time.time()
+            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+            elapsed = time.time() - start_time
+            frames = 0
+            for line in result.stdout.splitlines():
+                if line.startswith('frame='):
+                    frames = int(line.split('=', 1)[1])
+            size_mb = os.path.getsize(out.name) / 1024 / 1024
+        finally:
+            os.remove(out.name)
+        results.append((name, frames / elapsed if elapsed > 0 else 0.0, size_mb, elapsed))
+        print(f"{name:16} {frames:5d} frames in {elapsed:6.2f}s  {results[-1][1]:7.1f} fps  {size_mb:7.2f} MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profils d'encodage vidéo et benchmark")
+    parser.add_argument("--benchmark", nargs="*", metavar="PROFILE", choices=list(ENCODE_PROFILES),
+                        help="Comparer la vitesse et la taille des profils (défaut : tous)")
+    parser.add_argument("--source", default=None, help="Vidéo source du benchmark (défaut : mire générée)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Durée encodée en secondes (défaut : 10)")
+    args = parser.parse_args()
+
+    if args.benchmark is None:
+        for name, settings in ENCODE_PROFILES.items():
+            print(f"{name:16} {settings}")
+        return
+    print(f"Encoder threads: {encoder_threads()}")
+    benchmark_profiles(args.benchmark or None, args.source, args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,17 @@ import json
 from datetime import datetime
 from dotenv import load_dotenv
 
+def format_story(story):
+    """Markdown block of one story (title, metadata lines, then the text)"""
+    formatted_story = f"# {story['title']}\n\n"
+    formatted_story += f"Author: u/{story['author']}\n"
+    formatted_story += f"URL: {story['url']}\n"
+    formatted_story += f"Score: {story['score']} upvotes\n"
+    formatted_story += f"Comments: {story['comments']}\n"
+    formatted_story += f"Posted: {story['created']}\n\n"
+    formatted_story += story['content']
+    return formatted_story
+
 def fetch_reddit_stories(output_file, subreddit="stories", limit=10):
     """
     Fetch stories from Reddit and save them in the same format as sample.md
@@ -81,16 +92,7 @@ def fetch_reddit_stories(output_file, subreddit="stories", limit=10):
             return False
             
         # Format stories for output
-        formatted_stories = []
-        for i, story in enumerate(stories, 1):
-            formatted_story = f"# {story['title']}\n\n"
-            formatted_story += f"Author: u/{story['author']}\n"
-            formatted_story += f"URL: {story['url']}\n"
-            formatted_story += f"Score: {story['score']} upvotes\n"
-            formatted_story += f"Comments: {story['comments']}\n"
-            formatted_story += f"Posted: {story['created']}\n\n"
-            formatted_story += story['content']
-            formatted_stories.append(formatted_story)
+        formatted_stories = [format_story(story) for story in stories]
         
         # Save to file
         output_content = "\n\n\n".join(formatted_stories)
@@ -2,85 +2,231 @@
 """
 Génère une nouvelle histoire à partir d'un exemple donné en utilisant Google Gemini.
 Modèle par défaut: gemini-2.5-flash
+
+Le mode --count N génère N histoires en parallèle avec un seul client, sous une limite
+de requêtes par minute et un budget de tokens. --api-endpoint (ou GEMINI_API_ENDPOINT)
+permet de viser un serveur local simulant l'API (transport REST).
 """
 import argparse
-import sys
+import json
 import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from dotenv import load_dotenv
 
-def generate_story(input_file, output_file, model):
-    # Lire l'histoire d'exemple
-    with open(input_file, 'r', encoding='utf-8') as f:
-        sample = f.read()
+MIN_STORY_CHARS = 200
+
+
+def create_model(model, api_endpoint=None):
+    """Configure google.generativeai once and return the GenerativeModel client"""
+    load_dotenv()
+    api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+    api_endpoint = api_endpoint or os.getenv("GEMINI_API_ENDPOINT")
+    if not api_key and not api_endpoint:
+        raise RuntimeError("Veuillez définir GOOGLE_API_KEY ou GEMINI_API_KEY dans l'environnement ou le fichier .env")
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        raise RuntimeError(
+            "Le package google-generativeai est manquant. Installez-le via 'pip install google-generativeai' ou ajoutez-le à backend/requirements.txt et réinstallez."
+        )
+    if api_endpoint:
+        genai.configure(api_key=api_key or "mock", transport="rest", client_options={"api_endpoint": api_endpoint})
+    else:
+        genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model)
 
-    # Préparer le prompt pour l'LLM
+
+def build_prompt(sample, variation=None):
     prompt = (
         "Here are several stories:\n" + sample +
         "\n\nPlease generate a new story that is different but follows the same pattern.\n"
         "Just generate the story content only (no title, no summary).\n"
         "Use simple, engaging language. Start similarly to the provided stories.\n"
     )
+    if variation is not None:
+        prompt += f"This is story #{variation + 1} of a batch: choose a setting and characters of your own.\n"
+    return prompt
+
+
+class RateLimiter:
+    """Spaces calls so that at most `per_minute` start in any minute (thread-safe)"""
 
-    # Génération avec retry et metrics
-    import time, json
-    max_attempts = 3
-    for attempt in range(1, max_attempts+1):
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class TokenBudget:
+    """Total token budget shared by concurrent generations (None = unlimited)"""
+
+    def __init__(self, max_tokens=None):
+        self.max_tokens = max_tokens
+        self.used = 0
+        self.reserved = 0
+        self.lock = threading.Lock()
+
+    def reserve(self, estimate):
+        """Reserve an estimated cost before a call; False when it would exceed the budget"""
+        with self.lock:
+            if self.max_tokens is not None and self.used + self.reserved + estimate > self.max_tokens:
+                return False
+            self.reserved += estimate
+            return True
+
+    def settle(self, estimate, actual):
+        with self.lock:
+            self.reserved -= estimate
+            self.used += actual
+
+
+def response_tokens(response, prompt, story):
+    """(prompt_tokens, output_tokens) from the response usage, estimated when missing"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None and getattr(usage, "total_token_count", 0):
+        return usage.prompt_token_count, usage.candidates_token_count
+    return len(prompt) // 4, len(story.split())
+
+
+def generate_one(model_client, prompt, limiter=None, budget=None, max_attempts=3, backoff=2.0,
+                 expected_output_tokens=1500):
+    """Generate one story with retries and exponential backoff; returns (story, meta)"""
+    estimate = len(prompt) // 4 + expected_output_tokens
+    last_error = None
+    for attempt in range(1, max_attempts + 1):
+        if budget is not None and not budget.reserve(estimate):
+            raise RuntimeError("Budget de tokens épuisé")
+        actual = 0
         try:
-            print(f"=== Début de la génération (essai {attempt}) ===")
+            if limiter is not None:
+                limiter.wait()
             gen_start = time.time()
-            # Configurer l'API
-            load_dotenv()
-            api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-            if not api_key:
-                raise RuntimeError("Veuillez définir GOOGLE_API_KEY ou GEMINI_API_KEY dans l'environnement ou le fichier .env")
-            import importlib
-            try:
-                genai = importlib.import_module("google.generativeai")
-            except ImportError:
-                raise RuntimeError(
-                    "Le package google-generativeai est manquant. Installez-le via 'pip install google-generativeai' ou ajoutez-le à backend/requirements.txt et réinstallez."
-                )
-            genai.configure(api_key=api_key)
-
-            model_client = genai.GenerativeModel(model)
-            response = model_client.generate_content(prompt)
+            # Réessais gérés ici (backoff + budget) : désactiver ceux du client sur les 503
+            response = model_client.generate_content(prompt, request_options={"retry": None})
             story = response.text or ""
             gen_duration = time.time() - gen_start
-            total_tokens = len(story.split())
-            print(story)
-            print(f"\n=== Fin génération : {len(story)} caractères en {gen_duration:.1f}s, tokens={total_tokens}, tps={total_tokens/gen_duration if gen_duration>0 else 0:.1f}")
+            prompt_tokens, output_tokens = response_tokens(response, prompt, story)
+            actual = prompt_tokens + output_tokens
+            if len(story) < MIN_STORY_CHARS:
+                raise ValueError(f"Génération trop courte ({len(story)} chars)")
+            return story, {
+                'length_chars': len(story),
+                'prompt_tokens': prompt_tokens,
+                'output_tokens': output_tokens,
+                'total_tokens': prompt_tokens + output_tokens,
+                'duration_s': round(gen_duration, 2),
+                'tokens_per_s': round(output_tokens / gen_duration, 2) if gen_duration > 0 else 0,
+                'attempts': attempt,
+            }
         except Exception as e:
-            print(f"Erreur durant génération : {e}")
-            if attempt == max_attempts:
-                sys.exit(1)
-            continue
-        # Vérifier longueur minimale
-        if len(story) < 200:
-            print(f"Génération trop courte ({len(story)} chars), relance...")
-            if attempt == max_attempts:
-                print("Échec après plusieurs essais")
-                sys.exit(1)
-            continue
-        # Sauvegarder métriques
-        meta = {
-            'length_chars': len(story),
-            'total_tokens': total_tokens,
-            'duration_s': round(gen_duration, 2),
-            'tokens_per_s': round(total_tokens/gen_duration, 2)
-        }
-        meta_file = os.path.splitext(output_file)[0] + '_meta.json'
-        with open(meta_file, 'w', encoding='utf-8') as mf:
-            json.dump(meta, mf, ensure_ascii=False, indent=2)
-        break
-
-    # Enregistrer l'histoire générée
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            last_error = e
+            print(f"Erreur durant génération (essai {attempt}) : {e}")
+            if attempt < max_attempts:
+                time.sleep(backoff * 2 ** (attempt - 1) * (1 + random.random() * 0.25))
+        finally:
+            if budget is not None:
+                budget.settle(estimate, actual)
+    raise RuntimeError(f"Échec après {max_attempts} essais : {last_error}")
+
+
+def save_story(story, meta, output_file):
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write(story)
+    meta_file = os.path.splitext(output_file)[0] + '_meta.json'
+    with open(meta_file, 'w', encoding='utf-8') as mf:
+        json.dump(meta, mf, ensure_ascii=False, indent=2)
+
+
+def generate_story(input_file, output_file, model, api_endpoint=None):
+    # Lire l'histoire d'exemple
+    with open(input_file, 'r', encoding='utf-8') as f:
+        sample = f.read()
+
+    print("=== Début de la génération ===")
+    try:
+        model_client = create_model(model, api_endpoint)
+        story, meta = generate_one(model_client, build_prompt(sample))
+    except Exception as e:
+        print(f"Erreur durant génération : {e}")
+        sys.exit(1)
+    print(story)
+    print(f"\n=== Fin génération : {meta['length_chars']} caractères en {meta['duration_s']:.1f}s, "
+          f"tokens={meta['prompt_tokens']}+{meta['output_tokens']}, tps={meta['tokens_per_s']:.1f}")
 
+    # Enregistrer l'histoire générée et ses métriques
+    save_story(story, meta, output_file)
     print(f"Histoire générée enregistrée dans {output_file}")
 
 
+def generate_stories(input_file, output_dir, count, model, concurrency=4, requests_per_minute=30,
+                     token_budget=None, api_endpoint=None, model_client=None):
+    """Generate `count` stories concurrently with one shared client.
+
+    Calls are spaced by `requests_per_minute` and stop being issued once
+    `token_budget` would be exceeded. Each story is written to
+    `output_dir/generated_story_NN.md` with its `_meta.json`; a
+    `batch_meta.json` summarizes the run. Returns the written story paths.
+    """
+    with open(input_file, 'r', encoding='utf-8') as f:
+        sample = f.read()
+    model_client = model_client or create_model(model, api_endpoint)
+    limiter = RateLimiter(requests_per_minute)
+    budget = TokenBudget(token_budget)
+    os.makedirs(output_dir, exist_ok=True)
+
+    def job(index):
+        story, meta = generate_one(model_client, build_prompt(sample, index), limiter, budget)
+        output_file = os.path.join(output_dir, f"generated_story_{index + 1:02d}.md")
+        save_story(story, {**meta, 'model': model, 'index': index + 1}, output_file)
+        return output_file, meta
+
+    start_time = time.time()
+    written = []
+    failures = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(job, index): index for index in range(count)}
+        for future in as_completed(futures):
+            try:
+                output_file, meta = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"Histoire {futures[future] + 1} : {e}")
+                continue
+            written.append(output_file)
+            print(f"Histoire {futures[future] + 1} : {meta['length_chars']} caractères, "
+                  f"{meta['output_tokens']} tokens générés en {meta['duration_s']:.1f}s -> {output_file}")
+
+    elapsed = time.time() - start_time
+    summary = {
+        'model': model,
+        'requested': count,
+        'generated': len(written),
+        'failed': failures,
+        'tokens_used': budget.used,
+        'token_budget': token_budget,
+        'duration_s': round(elapsed, 2),
+        'stories_per_min': round(len(written) / elapsed * 60, 2) if elapsed > 0 else 0,
+    }
+    with open(os.path.join(output_dir, 'batch_meta.json'), 'w', encoding='utf-8') as mf:
+        json.dump(summary, mf, ensure_ascii=False, indent=2)
+    print(f"=== {len(written)}/{count} histoires en {elapsed:.1f}s, {budget.used} tokens utilisés ===")
+    return sorted(written)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Générer une nouvelle histoire à partir d'un fichier markdown existant"
@@ -102,9 +248,32 @@ def main():
         default='gemini-2.5-flash',
         help='Nom du modèle Google Gemini à utiliser'
     )
+    parser.add_argument(
+        '--count',
+        type=int,
+        default=None,
+        help='Générer N histoires en parallèle (écrites dans --output-dir)'
+    )
+    parser.add_argument(
+        '--output-dir',
+        default=os.path.normpath(os.path.join(os.path.dirname(__file__), '../data/generated')),
+        help='Dossier de sortie du mode --count'
+    )
+    parser.add_argument('--concurrency', type=int, default=4, help='Requêtes simultanées (default: 4)')
+    parser.add_argument('--rpm', type=int, default=30, help='Requêtes maximum par minute (default: 30)')
+    parser.add_argument('--token-budget', type=int, default=None, help='Budget total de tokens du lot')
+    parser.add_argument(
+        '--api-endpoint',
+        default=None,
+        help="Point d'accès de l'API (ex. http://127.0.0.1:8080 pour un serveur simulé ; défaut : GEMINI_API_ENDPOINT)"
+    )
     args = parser.parse_args()
 
-    generate_story(args.input_file, args.output_file, args.model)
+    if args.count:
+        written = generate_stories(args.input_file, args.output_dir, args.count, args.model, args.concurrency,
+                                   args.rpm, args.token_budget, args.api_endpoint)
+        sys.exit(0 if written else 1)
+    generate_story(args.input_file, args.output_file, args.model, args.api_endpoint)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Ordonnanceur de jobs pour produire de nombreuses vidéos en parallèle. Les étapes
+lourdes tournent dans deux pools de processus dimensionnés selon les cœurs et la
+mémoire disponibles : « model » (TTS et alignement, modèles gardés chargés par
+worker) et « render » (montage, sous-titres, encodage). Les étapes s'enchaînent
+en pipeline : le TTS de l'histoire N+1 tourne pendant l'encodage de l'histoire N.
+
+L'état des jobs est gardé dans SQLite (backend/data/jobs.db) après chaque étape :
+relancer le script après un crash reprend chaque job à sa dernière étape terminée.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import pipeline_runner
+from encode_profiles import DEFAULT_ENCODE_PROFILE, ENCODE_PROFILES, PREVIEW_PROFILE
+from reddit_harvester import settle_story
+
+DEFAULT_DB_PATH = os.path.join(pipeline_runner.DATA_DIR, 'jobs.db')
+
+# Étapes d'un job dans l'ordre, et pool qui les exécute
+STAGES = ("tts", "align", "render")
+STAGE_POOLS = {"tts": "model", "align": "model", "render": "render"}
+
+# Mémoire estimée par worker (Go) : VibeVoice + MMS chargés / moviepy + ffmpeg (+ Whisper)
+MODEL_WORKER_MEM_GB = 8
+RENDER_WORKER_MEM_GB = 2
+MODEL_WORKER_MIN_CORES = 4
+RENDER_WORKER_MIN_CORES = 2
+MAX_ATTEMPTS = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    story TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    stage TEXT,
+    words TEXT,
+    output TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+"""
+
+# Colonnes ajoutées après la première version du schéma
+MIGRATIONS = {
+    "source": "ALTER TABLE jobs ADD COLUMN source TEXT",
+}
+
+
+class JobStore:
+    """Persistent job queue; `stage` is the last completed stage. Use it from a single thread"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                self.conn.execute(statement)
+        self.conn.commit()
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        self.conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+        self.conn.commit()
+
+    def add(self, story, options, source=None):
+        """Queue a story; `source` is the file it was split from (a Reddit backlog story)"""
+        now = time.time()
+        cursor = self.conn.execute(
+            "INSERT INTO jobs (story, options, source, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (os.path.abspath(story), json.dumps(options), source and os.path.abspath(source), now, now)
+        )
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def recover(self):
+        """Requeue jobs left running by a crashed scheduler; returns their number"""
+        cursor = self.conn.execute("UPDATE jobs SET status = 'pending' WHERE status = 'running'")
+        self.conn.commit()
+        return cursor.rowcount
+
+    def retry_failed(self):
+        cursor = self.conn.execute("UPDATE jobs SET status = 'pending', attempts = 0 WHERE status = 'failed'")
+        self.conn.commit()
+        return cursor.rowcount
+
+    def runnable(self):
+        """Pending jobs, the most advanced first so that started stories finish first"""
+        rows = [dict(row) for row in self.conn.execute("SELECT * FROM jobs WHERE status = 'pending' ORDER BY id")]
+        for row in rows:
+            row["options"] = json.loads(row["options"])
+        return sorted(rows, key=lambda row: -(STAGES.index(row["stage"]) + 1 if row["stage"] else 0))
+
+    def start(self, job_id):
+        self._update(job_id, status='running', error=None)
+
+    def finish_stage(self, job_id, stage, result=None):
+        fields = {"stage": stage, "attempts": 0}
+        if stage == "align":
+            fields["words"] = result
+        if stage == STAGES[-1]:
+            fields.update(status='done', output=result)
+        else:
+            fields["status"] = 'pending'
+        self._update(job_id, **fields)
+
+    def fail(self, job_id, error):
+        """Count a failed attempt; the job is retried until MAX_ATTEMPTS. Returns True when given up"""
+        attempts = self.conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()[0] + 1
+        failed = attempts >= MAX_ATTEMPTS
+        self._update(job_id, status='failed' if failed else 'pending', attempts=attempts, error=error)
+        return failed
+
+    def requeue(self, job_id, error):
+        """Put a running job back in the queue without counting an attempt"""
+        self._update(job_id, status='pending', error=error)
+
+    def source_rendered(self, source):
+        """None while a job split from `source` can still run; then True when at least one was rendered"""
+        statuses = {row[0] for row in self.conn.execute("SELECT status FROM jobs WHERE source = ?", (source,))}
+        if statuses - {'done', 'failed'}:
+            return None
+        return 'done' in statuses
+
+    def jobs(self):
+        return [dict(row) for row in self.conn.execute("SELECT * FROM jobs ORDER BY id")]
+
+    def close(self):
+        self.conn.close()
+
+
+def job_options(speaker="Alice", single_pass=False, seed=None, tts_cache=False, tts_profile=None,
+                encode_profile=None, preview=False):
+    """Options stored with a job (preview forces the cached TTS and the preview encode)"""
+    if preview:
+        tts_cache, single_pass, encode_profile = True, True, PREVIEW_PROFILE
+    return {
+        "speaker": speaker,
+        "single_pass": single_pass,
+        "seed": seed,
+        "tts_cache": tts_cache,
+        "tts_profile": tts_profile,
+        "encode_profile": encode_profile or DEFAULT_ENCODE_PROFILE,
+        "preview": preview,
+    }
+
+
+def add_jobs(store, story_files, options, preprocess=True):
+    """Queue one job per story (files are cleaned and split first, see story_text.py)"""
+    job_ids = []
+    for source in story_files:
+        parts = [source]
+        if preprocess:
+            from story_text import preprocess_file
+            parts = preprocess_file(source)
+        job_ids += [store.add(story_md, options, source) for story_md in parts]
+    return job_ids
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def available_memory_gb():
+    """Available RAM (MemAvailable), falling back to free physical pages"""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024 / 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES') / 1024 ** 3
+    except (AttributeError, ValueError, OSError):
+        return float(MODEL_WORKER_MEM_GB + RENDER_WORKER_MEM_GB)
+
+
+def pool_sizes(cores=None, memory_gb=None):
+    """(model_workers, render_workers) for the available cores and memory.
+
+    Model workers take MODEL_WORKER_MIN_CORES each, leaving at least one render
+    worker's share; render workers split the remaining cores.
+    """
+    cores = cores or available_cores()
+    memory_gb = available_memory_gb() if memory_gb is None else memory_gb
+    model = max(1, min((cores - RENDER_WORKER_MIN_CORES) // MODEL_WORKER_MIN_CORES,
+                       int(memory_gb // MODEL_WORKER_MEM_GB)))
+    render = max(1, min((cores - model * MODEL_WORKER_MIN_CORES) // RENDER_WORKER_MIN_CORES,
+                        int((memory_gb - model * MODEL_WORKER_MEM_GB) // RENDER_WORKER_MEM_GB)))
+    return model, render
+
+
+def pool_threads(model_workers, render_workers, cores=None):
+    """Threads per worker of each pool: MODEL_WORKER_MIN_CORES or more per model worker, the rest for render"""
+    cores = cores or available_cores()
+    model = max(MODEL_WORKER_MIN_CORES, cores // (model_workers + render_workers))
+    render = max(1, (cores - model * model_workers) // render_workers)
+    return {"model": model, "render": render}
+
+
+def _init_worker(threads):
+    # Avant l'import de torch / ffmpeg dans le worker : partager les cœurs entre les pools
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "IWNA_ENCODER_THREADS"):
+        os.environ[name] = str(threads)
+
+
+def run_stage(stage, story_md, options, words_path=None):
+    """Run one stage of a job in a worker process; returns the stage result (sidecar / video path)"""
+    paths = pipeline_runner.story_paths(story_md, options.get("preview"))
+    if stage == "tts":
+        # Les model workers gardent VibeVoice chargé : ne pas sérialiser la synthèse sur tts_server
+        pipeline_runner.tts_stage(story_md, paths["audio"], options["speaker"], options["tts_cache"],
+                                  options["tts_profile"], use_server=False)
+        return None
+    if stage == "align":
+        return pipeline_runner.align_stage(story_md, paths["audio"], paths["words"])
+    video_list = os.path.join(pipeline_runner.DATA_DIR, 'video_list.txt')
+    words_path = words_path if words_path and os.path.exists(words_path) else None
+    return pipeline_runner.render_stage(paths, video_list, words_path, options["single_pass"], options["seed"],
+                                        options["encode_profile"])
+
+
+def next_stage(job):
+    """Stage to run next, going back to TTS when the synthesized audio is gone"""
+    done = STAGES.index(job["stage"]) + 1 if job["stage"] else 0
+    if done and not os.path.exists(pipeline_runner.story_paths(job["story"], job["options"].get("preview"))["audio"]):
+        return STAGES[0]
+    return STAGES[done]
+
+
+def run_jobs(store, model_workers=None, render_workers=None):
+    """Run every pending job through the two pools; returns the rendered videos"""
+    sizes = pool_sizes()
+    capacity = {"model": model_workers or sizes[0], "render": render_workers or sizes[1]}
+    threads = pool_threads(capacity["model"], capacity["render"])
+    recovered = store.recover()
+    if recovered:
+        print(f"Resuming {recovered} interrupted jobs")
+    print(f"Workers: {capacity['model']} model x {threads['model']} threads, "
+          f"{capacity['render']} render x {threads['render']} threads")
+
+    os.makedirs(pipeline_runner.AUDIO_DIR, exist_ok=True)
+    os.makedirs(pipeline_runner.VIDEO_DIR, exist_ok=True)
+    pipeline_runner.ensure_video_list(os.path.join(pipeline_runner.DATA_DIR, 'video_list.txt'))
+
+    # spawn : torch et les threads ffmpeg ne survivent pas proprement à un fork
+    context = multiprocessing.get_context("spawn")
+
+    def make_pool(name):
+        return ProcessPoolExecutor(capacity[name], mp_context=context, initializer=_init_worker,
+                                   initargs=(threads[name],))
+
+    def settle_source(source):
+        # Une fois toutes ses parties terminées : utilisée si au moins une a été rendue (pas de republication)
+        rendered = store.source_rendered(source) if source else None
+        if rendered is not None:
+            settle_story(source, rendered)
+
+    def restart_pool(name):
+        print(f"A {name} worker died, restarting the pool")
+        pools[name].shutdown(wait=False, cancel_futures=True)
+        pools[name] = make_pool(name)
+
+    pools = {name: make_pool(name) for name in capacity}
+    in_flight = {}
+    # Jobs en vol quand un worker est mort : relancés seuls dans leur pool pour trouver le coupable
+    suspects = set()
+    outputs = []
+    start_time = time.time()
+    try:
+        while True:
+            busy = {name: 0 for name in pools}
+            alone = set()
+            for job, stage, _ in in_flight.values():
+                busy[STAGE_POOLS[stage]] += 1
+                if job["id"] in suspects:
+                    alone.add(STAGE_POOLS[stage])
+            running_ids = {job["id"] for job, _, _ in in_flight.values()}
+            runnable = [job for job in store.runnable() if job["id"] not in running_ids]
+            # Un suspect en attente : laisser son pool se vider avant de le lancer
+            waiting = {STAGE_POOLS[next_stage(job)] for job in runnable if job["id"] in suspects}
+            for job in runnable:
+                stage = next_stage(job)
+                name = STAGE_POOLS[stage]
+                if name in alone or busy[name] >= capacity[name]:
+                    continue
+                if name in waiting and (job["id"] not in suspects or busy[name]):
+                    continue
+                args = (run_stage, stage, job["story"], job["options"], job["words"])
+                try:
+                    future = pools[name].submit(*args)
+                except BrokenProcessPool:
+                    if any(p is pools[name] for _, _, p in in_flight.values()):
+                        # Ses jobs en vol vont le signaler : le pool est recréé à ce moment-là
+                        busy[name] = capacity[name]
+                        continue
+                    restart_pool(name)
+                    future = pools[name].submit(*args)
+                store.start(job["id"])
+                in_flight[future] = (job, stage, pools[name])
+                busy[name] += 1
+                if job["id"] in suspects:
+                    alone.add(name)
+                print(f"[job {job['id']}] {stage} started ({os.path.basename(job['story'])})")
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future not in in_flight:
+                    continue  # déjà remis en file avec son pool cassé
+                job, stage, pool = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    victims = [(job, stage)]
+                    if isinstance(e, BrokenProcessPool):
+                        # Worker tué (mémoire insuffisante...) : tout le pool tombe, on ne sait pas à cause de qui
+                        name = STAGE_POOLS[stage]
+                        for other in [f for f, (_, _, p) in in_flight.items() if p is pool]:
+                            other_job, other_stage, _ = in_flight.pop(other)
+                            victims.append((other_job, other_stage))
+                        if pools[name] is pool:
+                            restart_pool(name)
+                        e = f"worker died ({e})"
+                    if len(victims) > 1:
+                        for victim, victim_stage in victims:
+                            store.requeue(victim["id"], f"{victim_stage}: {e}")
+                            suspects.add(victim["id"])
+                        print(f"Jobs {', '.join(str(v['id']) for v, _ in victims)} requeued, "
+                              "each will run alone in its pool")
+                        continue
+                    gave_up = store.fail(job["id"], f"{stage}: {e}")
+                    print(f"[job {job['id']}] {stage} failed: {e}" + (" (giving up)" if gave_up else " (will retry)"))
+                    if gave_up:
+                        settle_source(job["source"])
+                    continue
+                suspects.discard(job["id"])
+                store.finish_stage(job["id"], stage, result)
+                print(f"[job {job['id']}] {stage} done")
+                if stage == STAGES[-1]:
+                    outputs.append(result)
+                    settle_source(job["source"])
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    elapsed = time.time() - start_time
+    print(f"{len(outputs)} videos in {elapsed:.1f}s"
+          + (f" ({len(outputs) / elapsed * 3600:.1f} videos/hour)" if outputs and elapsed > 0 else ""))
+    return outputs
+
+
+def print_status(store):
+    for job in store.jobs():
+        detail = job["output"] if job["status"] == "done" else (job["error"] or "")
+        print(f"{job['id']:4d}  {job['status']:8} {job['stage'] or '-':7} "
+              f"{os.path.basename(job['story']):32} {detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="File de jobs vidéo : pools de processus, étapes en pipeline et reprise après crash"
+    )
+    parser.add_argument("stories", nargs="*", help="Fichiers markdown d'histoires à ajouter à la file")
+    parser.add_argument("--fetch", type=int, default=0,
+                        help="Ajouter N histoires de la file Reddit (voir reddit_harvester.py)")
+    parser.add_argument("--subreddit", nargs="+", default=["stories"], help="Subreddits pour --fetch")
+    parser.add_argument("--speaker", default="Alice", help="Nom du locuteur")
+    parser.add_argument("--single-pass", action="store_true", help="Montage et sous-titres en un seul encodage")
+    parser.add_argument("--seed", type=int, default=None, help="Graine pour des montages reproductibles")
+    parser.add_argument("--tts-cache", action="store_true", help="Synthèse phrase par phrase avec cache audio")
+    parser.add_argument("--tts-profile", choices=["fast", "balanced", "quality"], default=None,
+                        help="Profil d'inférence TTS (défaut : quality)")
+    parser.add_argument("--encode-profile", choices=list(ENCODE_PROFILES), default=DEFAULT_ENCODE_PROFILE,
+                        help=f"Profil d'encodage vidéo (défaut : {DEFAULT_ENCODE_PROFILE})")
+    parser.add_argument("--preview", action="store_true", help="Aperçus basse résolution (<histoire>_preview.mp4)")
+    parser.add_argument("--raw-text", action="store_true",
+                        help="Lire les fichiers tels quels (sans nettoyage ni découpage par histoire)")
+    parser.add_argument("--model-workers", type=int, default=None,
+                        help="Workers TTS/alignement (défaut : selon les cœurs et la mémoire)")
+    parser.add_argument("--render-workers", type=int, default=None,
+                        help="Workers de rendu (défaut : selon les cœurs et la mémoire)")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Base SQLite des jobs")
+    parser.add_argument("--retry-failed", action="store_true", help="Remettre les jobs en échec dans la file")
+    parser.add_argument("--status", action="store_true", help="Afficher les jobs et quitter")
+    parser.add_argument("--no-run", action="store_true", help="Ajouter les jobs sans les exécuter")
+    args = parser.parse_args()
+
+    store = JobStore(args.db)
+    try:
+        if args.status:
+            print_status(store)
+            return
+        if args.retry_failed:
+            print(f"{store.retry_failed()} failed jobs requeued")
+        story_files = list(args.stories)
+        if args.fetch:
+            story_files += pipeline_runner.fetch_stories(args.fetch, args.subreddit)
+        if story_files:
+            options = job_options(args.speaker, args.single_pass, args.seed, args.tts_cache, args.tts_profile,
+                                  args.encode_profile, args.preview)
+            job_ids = add_jobs(store, story_files, options, preprocess=not args.raw_text)
+            print(f"Queued {len(job_ids)} jobs")
+        if not args.no_run:
+            run_jobs(store, args.model_workers, args.render_workers)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Petit protocole JSON-lines sur socket Unix pour les workers résidents (Whisper, TTS...).
+Chaque requête est une ligne JSON, chaque réponse une ligne JSON {"ok": bool, ...}.
+"""
+import json
+import os
+import socket
+import socketserver
+import tempfile
+
+
+def default_socket_path(name):
+    """Socket path for a named service (overridable with IWNA_<NAME>_SOCKET)"""
+    env_key = f"IWNA_{name.upper()}_SOCKET"
+    return os.getenv(env_key) or os.path.join(tempfile.gettempdir(), f"iwna-{name}.sock")
+
+
+def serve(socket_path, handler):
+    """Serve `handler(request) -> dict` on a Unix socket until interrupted.
+
+    Requests are handled one at a time so the resident model is never used
+    concurrently.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("Unix sockets are not available on this platform")
+
+    # Supprimer un socket orphelin laissé par un worker précédent
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if request.get("op") == "ping":
+                        response = {"ok": True}
+                    else:
+                        response = {"ok": True, **handler(request)}
+                except Exception as e:
+                    response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+    server = socketserver.UnixStreamServer(socket_path, RequestHandler)
+    print(f"Listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping service")
+    finally:
+        server.server_close()
+        try:
+            os.remove(socket_path)
+        except OSError:
+            pass
+
+
+def call(socket_path, request, connect_timeout=2.0):
+    """Send one request to a service.
+
+    Returns the response dict, or None when no service is listening so the
+    caller can fall back to in-process work. Raises RuntimeError when the
+    service reports an error.
+    """
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(connect_timeout)
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return None
+        # La requête elle-même peut être longue (transcription, synthèse)
+        sock.settimeout(None)
+        with sock.makefile("rwb") as stream:
+            stream.write((json.dumps(request) + "\n").encode("utf-8"))
+            stream.flush()
+            line = stream.readline()
+    finally:
+        sock.close()
+
+    if not line:
+        return None
+    response = json.loads(line)
+    if not response.get("ok"):
+        raise RuntimeError(response.get("error", "unknown service error"))
+    return response
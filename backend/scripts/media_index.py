@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Index persistant des métadonnées de la bibliothèque vidéo (durée, résolution, fps, codec,
+positions des images clés).
+Stocké en JSON à côté de video_list.txt et rafraîchi uniquement pour les fichiers modifiés,
+pour que le montage puisse valider et choisir les clips sans rien décoder.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+
+INDEX_VERSION = 3
+
+
+def index_path_for(video_list_path):
+    """Index file stored next to the video list"""
+    return os.path.join(os.path.dirname(os.path.abspath(video_list_path)), 'video_index.json')
+
+
+def parse_fps(value):
+    """Frame rate as a float from ffprobe's "30000/1001" (or "29.97"); None when 0 or invalid ("0/0")"""
+    try:
+        fps = float(Fraction(str(value)))
+    except (ValueError, ZeroDivisionError):
+        return None
+    return fps if fps > 0 else None
+
+
+def probe_keyframes(video_path):
+    """Keyframe timestamps in seconds, read from the packet flags (nothing is decoded)"""
+    result = subprocess.run([
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_path
+    ], capture_output=True, text=True, check=True)
+    keyframes = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags and pts_time not in ('', 'N/A'):
+            keyframes.append(round(float(pts_time), 3))
+    return sorted(keyframes)
+
+
+def probe_video(video_path):
+    """Read codec, resolution, fps, duration and keyframes with ffprobe (None if unavailable)"""
+    if not shutil.which('ffprobe'):
+        return None
+    try:
+        result = subprocess.run([
+            'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+            '-show_entries', 'stream=codec_name,width,height,r_frame_rate,pix_fmt,time_base,duration:format=duration',
+            '-of', 'json', video_path
+        ], capture_output=True, text=True, check=True)
+        info = json.loads(result.stdout)
+        stream = info['streams'][0]
+        duration = stream.get('duration') or info.get('format', {}).get('duration')
+        return {
+            'codec': stream['codec_name'],
+            'width': int(stream['width']),
+            'height': int(stream['height']),
+            'fps': str(stream['r_frame_rate']),
+            'frame_rate': parse_fps(stream['r_frame_rate']),
+            'pix_fmt': stream.get('pix_fmt'),
+            'time_base': stream.get('time_base'),
+            'duration': float(duration),
+            'keyframes': probe_keyframes(video_path),
+        }
+    except Exception:
+        return None
+
+
+def _probe_with_moviepy(video_path):
+    """Fallback when ffprobe is missing: header read only, codec unknown"""
+    try:
+        from moviepy import VideoFileClip
+        with VideoFileClip(video_path, audio=False) as clip:
+            return {
+                'codec': None,
+                'width': int(clip.size[0]),
+                'height': int(clip.size[1]),
+                'fps': str(clip.fps),
+                'frame_rate': parse_fps(clip.fps),
+                'pix_fmt': None,
+                'time_base': None,
+                'duration': float(clip.duration),
+                'keyframes': None,
+            }
+    except Exception:
+        return None
+
+
+def _probe_entry(video_path, size, mtime):
+    meta = probe_video(video_path) or _probe_with_moviepy(video_path)
+    entry = {'size': size, 'mtime': mtime, 'valid': bool(meta and meta['duration'] > 0)}
+    if meta:
+        entry.update(meta)
+    return entry
+
+
+def load_index(index_path):
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == INDEX_VERSION:
+            return data.get('videos', {})
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def save_index(index_path, videos):
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(index_path), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({'version': INDEX_VERSION, 'videos': videos}, f, indent=2)
+    os.replace(tmp_path, index_path)
+
+
+def refresh_index(video_files, index_path, max_workers=None):
+    """Return {path: metadata} for `video_files`, probing only new or changed files.
+
+    Entries are keyed by absolute path; a file is re-probed when its size or
+    mtime differs from the stored values. Probes run in parallel.
+    """
+    videos = load_index(index_path)
+    result = {}
+    to_probe = []
+    for path in video_files:
+        abs_path = os.path.abspath(path)
+        try:
+            st = os.stat(abs_path)
+        except OSError:
+            result[path] = {'valid': False}
+            continue
+        cached = videos.get(abs_path)
+        if cached and cached.get('size') == st.st_size and cached.get('mtime') == st.st_mtime:
+            result[path] = cached
+        else:
+            to_probe.append((path, abs_path, st.st_size, st.st_mtime))
+
+    if to_probe:
+        start_time = time.time()
+        workers = max_workers or min(8, (os.cpu_count() or 2))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            entries = pool.map(lambda item: _probe_entry(item[1], item[2], item[3]), to_probe)
+            for (path, abs_path, _, _), entry in zip(to_probe, entries):
+                videos[abs_path] = entry
+                result[path] = entry
+        save_index(index_path, videos)
+        print(f"Indexed {len(to_probe)} new/changed videos in {time.time() - start_time:.1f} seconds")
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construire/rafraîchir l'index des vidéos de fond")
+    parser.add_argument(
+        "video_list",
+        nargs="?",
+        default=os.path.normpath(os.path.join(os.path.dirname(__file__), '../data/video_list.txt')),
+        help="Fichier texte contenant la liste des vidéos"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de probes en parallèle")
+    args = parser.parse_args()
+
+    from montage import resolve_video_list
+    video_files = resolve_video_list(args.video_list)
+    index = refresh_index(video_files, index_path_for(args.video_list), args.workers)
+    valid = [p for p, meta in index.items() if meta.get('valid')]
+    print(f"{len(valid)}/{len(video_files)} valid videos, "
+          f"{sum(index[p]['duration'] for p in valid):.1f}s of footage")
+
+
+if __name__ == "__main__":
+    main()
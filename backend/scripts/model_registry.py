@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Registre des modèles chargés dans le processus (Whisper, VibeVoice, aligneur...),
+pour qu'un même processus traitant plusieurs histoires ne recharge rien.
+"""
+import threading
+import time
+
+_models = {}
+_lock = threading.Lock()
+
+
+def get_model(key, loader):
+    """Return the model registered under `key`, calling `loader()` on first use"""
+    with _lock:
+        if key not in _models:
+            start_time = time.time()
+            _models[key] = loader()
+            print(f"Loaded {key} in {time.time() - start_time:.1f} seconds")
+        return _models[key]
+
+
+def loaded_models():
+    with _lock:
+        return list(_models)
+
+
+def release(key=None):
+    """Drop one model (or all of them) from the registry"""
+    with _lock:
+        if key is None:
+            _models.clear()
+        else:
+            _models.pop(key, None)
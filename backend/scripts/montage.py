@@ -1,151 +1,227 @@
 import os
-import random
 import argparse
 import time
 import subprocess
 import tempfile
-from moviepy import VideoFileClip, AudioFileClip, concatenate_videoclips, ImageClip, CompositeAudioClip, concatenate_audioclips
+from bisect import bisect_right
+from clip_planner import Segment, plan_montage
+from encode_profiles import (DEFAULT_ENCODE_PROFILE, ENCODE_PROFILES, ffmpeg_audio_args, fits_profile, parse_window, resize_for_profile, write_videofile_kwargs)
+from media_index import index_path_for, refresh_index
+from moviepy import VideoFileClip, concatenate_videoclips
+from audio_mix import mix_audio, mix_graph, mixed_duration, pick_background
 
-try:
-    from moviepy.audio.fx.volumex import volumex  # type: ignore
-except ImportError:
-    volumex = None  # si volumex indisponible, on n’appliquera pas de mix
+# Codecs que le concat demuxer peut joindre sans réencodage dans un MP4
+STREAM_COPY_CODECS = ('h264', 'hevc')
 
-def validate_video_file(video_path):
-    """Verify a video file is readable before processing"""
-    try:
-        with VideoFileClip(video_path) as test_clip:
-            if test_clip.duration <= 0:
-                return False
-        return True
-    except Exception:
+def stream_copy_compatible(probes):
+    """True when every clip can be concatenated without re-encoding"""
+    if not probes or any(p is None or not p.get('codec') or not p.get('frame_rate') for p in probes):
+        return False
+    first = probes[0]
+    if first['codec'] not in STREAM_COPY_CODECS:
         return False
+    keys = ('codec', 'width', 'height', 'fps', 'pix_fmt', 'time_base')
+    return all(all(p[k] == first[k] for k in keys) for p in probes)
+
+def keyframe_aligned(segment, keyframes, clip_duration):
+    """Move a partial segment back to the keyframe at or before its start, keeping its length.
+
+    Returns None when the clip's keyframes are unknown; full clips are unchanged.
+    """
+    if is_full_clip(segment, clip_duration):
+        return segment
+    if not keyframes:
+        return None
+    i = bisect_right(keyframes, segment.start + 1e-3) - 1
+    if i < 0:
+        return None
+    start = keyframes[i]
+    return Segment(segment.path, start, start + segment.end - segment.start)
+
+def _concat_escape(path):
+    return os.path.abspath(path).replace("'", "'\\''")
 
-def create_random_clip(audio_path, video_list_path, output_path):
-    """Create random video montage synchronized to audio"""
+def render_stream_copy(segments, durations, audio_path, output_path, encode_profile=None,
+                       background=None, window=None):
+    """Concatenate the segments with the concat demuxer and stream copy.
+
+    `segments` is a list of clip_planner.Segment and `durations` the full clip
+    durations. Nothing is re-encoded: partial segments are cut with
+    inpoint/outpoint in the concat list, so they must start on a keyframe
+    (see keyframe_aligned). The TTS voice is mixed with `background`
+    (audio_mix.mix_graph) and muxed in the same ffmpeg pass.
+    """
+    list_file = tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8')
     try:
-        start_time = time.time()
-        print(f"Starting video creation with audio: {audio_path}")
+        for seg in segments:
+            list_file.write(f"file '{_concat_escape(seg.path)}'\n")
+            if not is_full_clip(seg, durations[seg.path]):
+                list_file.write(f"inpoint {seg.start:.3f}\noutpoint {seg.end:.3f}\n")
+        list_file.close()
 
-        # Load audio, speed it up by 1.35× with ffmpeg et validate
-        # Création d'un fichier temporaire pour audio accéléré
-        tmp_audio = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-        tmp_audio.close()
+        audio_args, audio_label = mix_graph(audio_path, background, first_input=1, window=window)
         subprocess.run([
-            'ffmpeg', '-y', '-i', audio_path,
-            '-filter:a', 'atempo=1.35', tmp_audio.name
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'concat', '-safe', '0', '-i', list_file.name,
+            *audio_args,
+            '-map', '0:v:0', '-map', audio_label,
+            '-c:v', 'copy', *ffmpeg_audio_args(encode_profile), '-shortest',
+            '-movflags', '+faststart',
+            output_path
         ], check=True)
-        audio = AudioFileClip(tmp_audio.name)
-        audio_duration = audio.duration
-        print(f"Audio duration: {audio_duration:.2f} seconds")
+    finally:
+        try:
+            os.remove(list_file.name)
+        except OSError:
+            pass
 
-        # Read and validate video list
-        with open(video_list_path, 'r') as f:
-            raw_list = [line.strip() for line in f if line.strip()]
-
-        # Résoudre chemins relatifs vers assets/video
-        base_assets = os.path.normpath(os.path.join(os.path.dirname(__file__), '../../assets/video'))
-        video_files = []
-        for p in raw_list:
-            if os.path.isabs(p):
-                video_files.append(p)
-            else:
-                # Préfère assets/video
-                candidate = os.path.join(base_assets, p)
-                video_files.append(candidate if os.path.exists(candidate) else p)
-        print(f"Found {len(video_files)} videos in list")
-
-        # Filter valid videos
-        valid_videos = [v for v in video_files if validate_video_file(v)]
-        print(f"{len(valid_videos)} valid videos found")
-        if not valid_videos:
-            raise ValueError("No valid video files found")
-
-        # Randomize video order
-        random.shuffle(valid_videos)
-
-        clips = []
-        used_videos = set()
-        current_duration = 0
-        clip_count = 0
-
-        # Process videos
-        for video_file in valid_videos:
-            if current_duration >= audio_duration:
-                break
-
-            if video_file in used_videos:
-                continue
+def write_mixed_track(audio_path, background=None, window=None, encode_profile=None):
+    """Mix the TTS voice and background into a temp AAC track (caller removes it)"""
+    tmp = tempfile.NamedTemporaryFile(suffix='.m4a', delete=False)
+    tmp.close()
+    try:
+        mix_audio(audio_path, tmp.name, background, window=window, output_args=ffmpeg_audio_args(encode_profile))
+    except Exception:
+        os.remove(tmp.name)
+        raise
+    return tmp.name
 
-            try:
-                clip = VideoFileClip(video_file)
-                clip_duration = clip.duration
-                remaining = audio_duration - current_duration
-
-                # For the last clip, handle differently
-                if current_duration + clip_duration >= audio_duration and remaining > 0:
-                    # Take needed portion from beginning
-                    subclip = clip.subclipped(0, remaining)
-                    clips.append(subclip)
-                    current_duration += remaining
-                    print(f"Added final clip: {video_file} ({remaining:.2f}s)")
-                else:
-                    # Use full clip
-                    clips.append(clip)
-                    current_duration += clip_duration
-                    print(f"Added clip: {video_file} ({clip_duration:.2f}s)")
-
-                used_videos.add(video_file)
-                clip_count += 1
+def is_full_clip(segment, clip_duration):
+    """A segment that covers (almost) its whole clip can be stream-copied"""
+    return segment.start < 1e-3 and clip_duration - segment.end < 0.05
 
-            except Exception as e:
-                print(f"Skipping {video_file} due to error: {str(e)}")
+def resolve_video_list(video_list_path):
+    """Read the video list, resolving relative entries against assets/video"""
+    with open(video_list_path, 'r') as f:
+        raw_list = [line.strip() for line in f if line.strip()]
+
+    # Résoudre chemins relatifs vers assets/video
+    base_assets = os.path.normpath(os.path.join(os.path.dirname(__file__), '../../assets/video'))
+    video_files = []
+    for p in raw_list:
+        if os.path.isabs(p):
+            video_files.append(p)
+        else:
+            # Préfère assets/video
+            candidate = os.path.join(base_assets, p)
+            video_files.append(candidate if os.path.exists(candidate) else p)
+    return video_files
+
+def plan_background(video_list_path, audio_duration, seed=None):
+    """Validate the library through the metadata index and plan the montage segments.
+
+    Returns (segments, durations, index); random offsets start on indexed keyframes.
+    """
+    # Read the video list and validate it against the metadata index
+    video_files = resolve_video_list(video_list_path)
+    print(f"Found {len(video_files)} videos in list")
+    index = refresh_index(video_files, index_path_for(video_list_path))
+
+    # Filter valid videos
+    valid_videos = [v for v in video_files if index[v].get('valid')]
+    print(f"{len(valid_videos)} valid videos found")
+    if not valid_videos:
+        raise ValueError("No valid video files found")
+
+    # Plan clips and cut points from the known durations
+    durations = {v: index[v]['duration'] for v in valid_videos}
+    segments = plan_montage(durations, audio_duration, seed=seed, keyframes=library_keyframes(index, durations))
+    for seg in segments:
+        full_clip = is_full_clip(seg, durations[seg.path])
+        print(f"{'Added clip' if full_clip else 'Added segment'}: {seg.path} "
+              f"({seg.start:.2f}s -> {seg.end:.2f}s)")
+    return segments, durations, index
+
+def library_keyframes(index, paths):
+    """{path: keyframe timestamps} from the media index (None when unknown)"""
+    return {p: index[p].get('keyframes') for p in paths}
+
+def build_montage_clip(segments, durations, audio_duration, seed=None, keyframes=None):
+    """Concatenate planned segments with moviepy.
+
+    A clip that cannot be opened is removed from `durations` and the montage
+    is replanned (clip_planner.plan_montage), so the video still covers
+    `audio_duration`. Returns (montage, opened_clips); the caller closes the
+    opened clips.
+    """
+    sources = {}
+    while True:
+        failed = []
+        for path in dict.fromkeys(seg.path for seg in segments):
+            if path in sources:
                 continue
+            try:
+                sources[path] = VideoFileClip(path)
+            except Exception as e:
+                print(f"Cannot open {path} ({e}), replanning without it")
+                failed.append(path)
+        if not failed:
+            break
+        durations = {p: d for p, d in durations.items() if p not in failed}
+        if not durations:
+            for source in sources.values():
+                source.close()
+            raise ValueError("No clip could be opened for the montage")
+        segments = plan_montage(durations, audio_duration, seed=seed, keyframes=keyframes)
 
-        # Handle insufficient duration
-        if current_duration < audio_duration:
-            print(f"Adding freeze frame to cover missing {audio_duration - current_duration:.2f}s")
-            last_frame = clips[-1].get_frame(clips[-1].duration - 0.1)
-            freeze = ImageClip(last_frame, duration=audio_duration - current_duration)
-            clips.append(freeze)
-
-        # Concatenate and export
-        print(f"Concatenating {len(clips)} clips...")
-        final = concatenate_videoclips(clips, method="compose")
-
-        print("Adding audio track with background")
-        # audio TTS
-        tts_audio = audio
-        # Chercher audio de fond
-        bg_dir = os.path.normpath(os.path.join(os.path.dirname(__file__), '../../assets/audio'))
-        bg_file = None
-        if os.path.isdir(bg_dir):
-            candidates = [f for f in os.listdir(bg_dir) if f.lower().endswith(('.mp3','.wav','.aac','.m4a','.ogg'))]
-            if candidates:
-                bg_file = os.path.join(bg_dir, random.choice(candidates))
-        if bg_file:
-            print(f"Using background audio: {os.path.basename(bg_file)}")
-            bg_clip = AudioFileClip(bg_file)
-            # Boucler et tronquer à la durée TTS
-            loops = int(tts_audio.duration / bg_clip.duration) + 1
-            bg_looped = concatenate_audioclips([bg_clip] * loops).subclipped(0, tts_audio.duration)
-            # Ajuster le volume de fond
-            if volumex:
-                bg_looped = bg_looped.fx(volumex, 0.3)
-            comp_audio = CompositeAudioClip([tts_audio, bg_looped])
-            final = final.with_audio(comp_audio)
+    clips = []
+    for seg in segments:
+        source = sources[seg.path]
+        if is_full_clip(seg, durations[seg.path]):
+            clips.append(source)
         else:
-            final = final.with_audio(tts_audio)
-
-        print("Rendering final video...")
-        final.write_videofile(
-            output_path,
-            codec='libx264',
-            audio_codec='aac',
-            fps=24,
-            threads=4,
-            logger=None
-        )
+            clips.append(source.subclipped(seg.start, min(seg.end, source.duration)))
+    montage = concatenate_videoclips(clips, method="compose")
+    return montage, clips + list(sources.values())
+
+def create_random_clip(audio_path, video_list_path, output_path, seed=None, encode_profile=None, window=None):
+    """Create random video montage synchronized to audio.
+
+    Clips and cut points are chosen by clip_planner.plan_montage from the
+    indexed durations; pass `seed` for a reproducible montage. Encoder settings
+    come from `encode_profile` (see encode_profiles.py). With `window` =
+    (start, end) in seconds of the sped-up voice, only that part is rendered.
+    """
+    try:
+        start_time = time.time()
+        print(f"Starting video creation with audio: {audio_path}")
+
+        # Durée de la voix accélérée (audio_mix.TTS_SPEED_FACTOR), limitée à la fenêtre éventuelle
+        audio_duration = mixed_duration(audio_path, window=window)
+        if window:
+            print(f"Rendering window {window[0]:.1f}s-{window[0] + audio_duration:.1f}s")
+        print(f"Audio duration: {audio_duration:.2f} seconds")
+        background = pick_background()
+        if background:
+            print(f"Using background audio: {os.path.basename(background)}")
+
+        segments, durations, index = plan_background(video_list_path, audio_duration, seed)
+
+        # Fast path : clips de même format -> concat demuxer + stream copy, coupes
+        # calées sur les images clés (sauf si le profil impose une réduction de résolution ou de fps)
+        used_probes = [index[seg.path] for seg in segments]
+        probe = used_probes[0] if used_probes else None
+        aligned = [keyframe_aligned(seg, index[seg.path].get('keyframes'), durations[seg.path]) for seg in segments]
+        if stream_copy_compatible(used_probes) and None not in aligned and fits_profile(
+                (probe['width'], probe['height']), probe['frame_rate'], encode_profile):
+            print(f"Compatible clips ({probe['codec']} {probe['width']}x{probe['height']}), "
+                  f"concatenating {len(segments)} segments with stream copy")
+            render_stream_copy(aligned, durations, audio_path, output_path, encode_profile, background, window)
+            total_time = time.time() - start_time
+            print(f"Success! Created {output_path} in {total_time:.1f} seconds")
+            return
+
+        print(f"Concatenating {len(segments)} segments...")
+        final, clips = build_montage_clip(segments, durations, audio_duration, seed,
+                                          library_keyframes(index, durations))
+
+        print("Mixing audio track with background")
+        tmp_audio_path = write_mixed_track(audio_path, background, window, encode_profile)
+        final = resize_for_profile(final, encode_profile)
+
+        print(f"Rendering final video ({final.w}x{final.h})...")
+        final.write_videofile(output_path, audio=tmp_audio_path,
+                              **{**write_videofile_kwargs(encode_profile, final.fps), 'audio_codec': 'copy'})
 
         total_time = time.time() - start_time
         print(f"Success! Created {output_path} in {total_time:.1f} seconds")
@@ -155,8 +231,6 @@ def create_random_clip(audio_path, video_list_path, output_path):
         raise
     finally:
         # Clean up resources
-        if 'audio' in locals():
-            audio.close()
         if 'final' in locals():
             final.close()
         if 'clips' in locals():
@@ -165,8 +239,8 @@ def create_random_clip(audio_path, video_list_path, output_path):
                     clip.close()
         # Supprimer le fichier audio temporaire s'il existe
         try:
-            if os.path.exists(tmp_audio.name):
-                os.remove(tmp_audio.name)
+            if 'tmp_audio_path' in locals() and os.path.exists(tmp_audio_path):
+                os.remove(tmp_audio_path)
         except Exception as e:
             print(f"Error removing temporary audio file: {e}")
 
@@ -198,6 +272,24 @@ if __name__ == "__main__":
         default=default_output,
         help="Fichier de sortie (ex: output.mp4)"
     )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Graine pour un montage reproductible"
+    )
+    parser.add_argument(
+        "--encode-profile",
+        choices=list(ENCODE_PROFILES),
+        default=DEFAULT_ENCODE_PROFILE,
+        help=f"Profil d'encodage (défaut : {DEFAULT_ENCODE_PROFILE})"
+    )
+    parser.add_argument(
+        "--window",
+        type=parse_window,
+        default=None,
+        help="Ne rendre qu'une fenêtre : 15 (15 premières secondes) ou 10-25"
+    )
 
     args = parser.parse_args()
 
@@ -208,5 +300,8 @@ if __name__ == "__main__":
     create_random_clip(
         args.audio_file,
         args.video_list,
-        args.output_file
+        args.output_file,
+        seed=args.seed,
+        encode_profile=args.encode_profile,
+        window=args.window
     )
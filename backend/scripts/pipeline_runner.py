@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Orchestrateur en processus unique : appelle directement les fonctions des étapes
+(Reddit, nettoyage du texte, TTS, alignement, montage, sous-titres) pour une file d'histoires, en gardant
+les modèles chargés d'une histoire à l'autre (voir model_registry.py).
+"""
+import argparse
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+import model_registry
+from encode_profiles import DEFAULT_ENCODE_PROFILE, ENCODE_PROFILES, PREVIEW_PROFILE, parse_window
+import tts_server
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.normpath(os.path.join(SCRIPT_DIR, '..', '..'))
+DATA_DIR = os.path.join(PROJECT_ROOT, 'backend', 'data')
+AUDIO_DIR = os.path.join(PROJECT_ROOT, 'output', 'audio')
+VIDEO_DIR = os.path.join(PROJECT_ROOT, 'output', 'video')
+
+
+class StageTimer:
+    """Collects per-story, per-stage wall times"""
+
+    def __init__(self):
+        self.rows = []
+
+    @contextmanager
+    def stage(self, story, name):
+        print(f"=== [{story}] {name} ===")
+        start_time = time.time()
+        status = "ok"
+        try:
+            yield
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            elapsed = time.time() - start_time
+            self.rows.append((story, name, elapsed, status))
+            print(f"--- [{story}] {name}: {elapsed:.1f}s ({status})")
+
+    def summary(self):
+        print("\n" + "=" * 50)
+        print("PIPELINE TIMINGS")
+        print("=" * 50)
+        for story, name, elapsed, status in self.rows:
+            print(f"{story:24} {name:12} {elapsed:8.1f}s  {status}")
+        totals = {}
+        for _, name, elapsed, _ in self.rows:
+            totals[name] = totals.get(name, 0.0) + elapsed
+        print("-" * 50)
+        for name, elapsed in totals.items():
+            print(f"{'TOTAL':24} {name:12} {elapsed:8.1f}s")
+        print(f"Models kept warm: {', '.join(str(k) for k in model_registry.loaded_models()) or 'none'}")
+        print("=" * 50)
+
+
+def ensure_video_list(video_list):
+    """Initialise video_list.txt from assets/video if missing or empty"""
+    if not os.path.exists(video_list) or os.path.getsize(video_list) == 0:
+        assets_videos_dir = os.path.join(PROJECT_ROOT, 'assets', 'video')
+        files = sorted(f for f in os.listdir(assets_videos_dir) if f.lower().endswith(('.mp4', '.mov', '.mkv')))
+        with open(video_list, 'w', encoding='utf-8') as vf:
+            for f in files:
+                vf.write(f + "\n")
+
+
+def fetch_stories(limit, subreddits=("stories",)):
+    """Poll Reddit for new posts and reserve the best-ranked stories of the backlog,
+    falling back to sample.md when the backlog is empty (see reddit_harvester.settle_story)"""
+    from reddit_harvester import harvest_incremental, pop_stories
+    try:
+        harvest_incremental(list(subreddits))
+    except Exception as e:
+        print(f"Warning: Could not fetch stories from Reddit: {e}")
+    stories = pop_stories(limit)
+    if stories:
+        return stories
+    print("Warning: No story in the Reddit backlog. Using sample stories instead.")
+    return [os.path.join(DATA_DIR, 'sample.md')]
+
+
+def story_paths(story_md, preview=False):
+    """Output files of a story: audio, words (alignment sidecar), video, captioned"""
+    name = os.path.splitext(os.path.basename(story_md))[0]
+    output_audio = os.path.join(AUDIO_DIR, f'{name}.wav')
+    return {
+        "audio": output_audio,
+        "words": os.path.splitext(output_audio)[0] + '.words.json',
+        "video": os.path.join(VIDEO_DIR, f'{name}.mp4'),
+        "captioned": os.path.join(VIDEO_DIR, f'{name}_preview.mp4' if preview else f'{name}_captioned.mp4'),
+    }
+
+
+def tts_stage(story_md, output_audio, speaker="Alice", tts_cache=False, tts_profile=None, use_server=True):
+    """Synthesize the story with the resident TTS worker if it listens (and `use_server`), in this process otherwise"""
+    if use_server and tts_server.request_synthesis(story_md, output_audio, speaker, cached=tts_cache,
+                                                   profile=tts_profile) is not None:
+        print("Synthesized by the resident TTS worker")
+    elif tts_cache:
+        from texttospeech_vibevoice import DEFAULT_PROFILE, synthesize_tts_cached
+        synthesize_tts_cached(story_md, output_audio, speaker, profile=tts_profile or DEFAULT_PROFILE)
+    else:
+        from texttospeech_vibevoice import DEFAULT_PROFILE, synthesize_tts
+        synthesize_tts(story_md, output_audio, speaker, profile=tts_profile or DEFAULT_PROFILE)
+
+
+def align_stage(story_md, output_audio, words_json):
+    """Write the word-timing sidecar; returns its path, or None when alignment failed"""
+    from align_words import align_story
+    if os.path.exists(words_json):
+        os.remove(words_json)
+    try:
+        align_story(story_md, output_audio, words_json)
+    except Exception as e:
+        print(f"Warning: Alignment failed, captions will use Whisper transcription. Error: {e}")
+    return words_json if os.path.exists(words_json) else None
+
+
+def render_stage(paths, video_list, words_path=None, single_pass=False, seed=None, encode_profile=None,
+                 window=None, stage=None):
+    """Montage + captions (or the single-pass render) of a synthesized story.
+
+    `stage(name)` returns a context manager wrapping each encode (e.g. a
+    StageTimer stage); `window` implies the single-pass render.
+    """
+    stage = stage or (lambda name: nullcontext())
+    if single_pass or window is not None:
+        from render_short import render_short
+        with stage("render"):
+            render_short(paths["audio"], video_list, paths["captioned"], words_path=words_path, seed=seed,
+                         encode_profile=encode_profile, window=window)
+    else:
+        from montage import create_random_clip
+        from add_caption import add_captions_to_video
+        with stage("montage"):
+            create_random_clip(paths["audio"], video_list, paths["video"], seed=seed, encode_profile=encode_profile)
+        with stage("captions"):
+            add_captions_to_video(paths["video"], paths["captioned"], words_path=words_path,
+                                  encode_profile=encode_profile)
+    return paths["captioned"]
+
+
+def run_story(story_md, timer, video_list, speaker="Alice", single_pass=False, seed=None, tts_cache=False,
+              tts_profile=None, encode_profile=None, preview=False, window=None):
+    """Run TTS -> alignment -> montage -> captions for one story file.
+
+    `preview` renders `<name>_preview.mp4` in a single low-resolution encode,
+    reusing the sentence TTS cache and cached word timings. `window` =
+    (start, end) only renders that part of the short (implies a single pass).
+    """
+    name = os.path.splitext(os.path.basename(story_md))[0]
+    paths = story_paths(story_md, preview)
+    if preview:
+        tts_cache = True
+        encode_profile = PREVIEW_PROFILE
+        single_pass = True
+
+    with timer.stage(name, "tts"):
+        tts_stage(story_md, paths["audio"], speaker, tts_cache, tts_profile)
+
+    with timer.stage(name, "align"):
+        words_path = align_stage(story_md, paths["audio"], paths["words"])
+
+    return render_stage(paths, video_list, words_path, single_pass, seed, encode_profile, window,
+                        stage=lambda stage_name: timer.stage(name, stage_name))
+
+
+def run_queue(story_files, speaker="Alice", single_pass=False, seed=None, keep_going=True, tts_cache=False,
+              tts_profile=None, preprocess=True, encode_profile=None, preview=False, window=None):
+    """Process a queue of story files in this process; returns the rendered videos.
+
+    With `preprocess`, each file is first cleaned and split into one job per
+    story (see story_text.py). A story taken from the Reddit backlog is marked
+    used once at least one of its videos is rendered (so that parts already
+    published are not rendered again), and put back in the backlog otherwise.
+    """
+    from reddit_harvester import settle_story
+    os.makedirs(AUDIO_DIR, exist_ok=True)
+    os.makedirs(VIDEO_DIR, exist_ok=True)
+    video_list = os.path.join(DATA_DIR, 'video_list.txt')
+    ensure_video_list(video_list)
+
+    timer = StageTimer()
+    outputs = []
+    try:
+        for source in story_files:
+            try:
+                parts = [source]
+                if preprocess:
+                    from story_text import preprocess_file
+                    with timer.stage(os.path.splitext(os.path.basename(source))[0], "preprocess"):
+                        parts = preprocess_file(source)
+            except Exception as e:
+                print(f"Story {source} failed: {e}")
+                settle_story(source, False)
+                if not keep_going:
+                    raise
+                continue
+            rendered = False
+            for story_md in parts:
+                try:
+                    outputs.append(run_story(story_md, timer, video_list, speaker, single_pass, seed, tts_cache,
+                                             tts_profile, encode_profile, preview, window))
+                    rendered = True
+                except Exception as e:
+                    print(f"Story {story_md} failed: {e}")
+                    if not keep_going:
+                        settle_story(source, rendered)
+                        raise
+            settle_story(source, rendered)
+    finally:
+        timer.summary()
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pipeline en processus unique pour une file d'histoires (modèles gardés en mémoire)"
+    )
+    parser.add_argument("stories", nargs="*", help="Fichiers markdown d'histoires (défaut : récupération Reddit)")
+    parser.add_argument("--fetch", type=int, default=1,
+                        help="Nombre d'histoires à prendre dans la file Reddit si aucun fichier n'est donné")
+    parser.add_argument("--subreddit", nargs="+", default=["stories"], help="Subreddits pour la récupération")
+    parser.add_argument("--speaker", default="Alice", help="Nom du locuteur")
+    parser.add_argument("--single-pass", action="store_true", help="Montage et sous-titres en un seul encodage")
+    parser.add_argument("--seed", type=int, default=None, help="Graine pour des montages reproductibles")
+    parser.add_argument("--tts-cache", action="store_true",
+                        help="Synthèse phrase par phrase avec cache audio")
+    parser.add_argument("--tts-profile", choices=["fast", "balanced", "quality"], default=None,
+                        help="Profil d'inférence TTS (défaut : quality)")
+    parser.add_argument("--raw-text", action="store_true",
+                        help="Lire les fichiers tels quels (sans nettoyage ni découpage par histoire)")
+    parser.add_argument("--encode-profile", choices=list(ENCODE_PROFILES), default=DEFAULT_ENCODE_PROFILE,
+                        help=f"Profil d'encodage vidéo (défaut : {DEFAULT_ENCODE_PROFILE})")
+    parser.add_argument("--preview", action="store_true",
+                        help="Aperçu rapide basse résolution (<histoire>_preview.mp4, caches TTS et horodatages)")
+    parser.add_argument("--window", type=parse_window, default=None,
+                        help="Ne rendre qu'une fenêtre : 15 (15 premières secondes) ou 10-25 (une seule passe)")
+    parser.add_argument("--stop-on-error", action="store_true", help="Arrêter la file à la première erreur")
+    args = parser.parse_args()
+
+    story_files = args.stories or fetch_stories(args.fetch, args.subreddit)
+    outputs = run_queue(story_files, args.speaker, args.single_pass, args.seed,
+                        keep_going=not args.stop_on_error, tts_cache=args.tts_cache,
+                        tts_profile=args.tts_profile, preprocess=not args.raw_text,
+                        encode_profile=args.encode_profile, preview=args.preview, window=args.window)
+    print(f"Pipeline terminé ! {len(outputs)} vidéos dans output/video")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Récupération concurrente d'histoires sur plusieurs subreddits et listings
+(hot, new, top:week...) via l'API JSON de Reddit. Les posts déjà vus (identifiant
+ou texte identique) sont écartés grâce à story_store.py et chaque nouvelle histoire
+est écrite dans son propre fichier markdown.
+
+En mode incrémental (--incremental), seul le listing "new" est lu, depuis le dernier
+post vu à l'exécution précédente (curseur par subreddit) : un sondage fréquent ne
+coûte qu'une requête par subreddit s'il n'y a rien de nouveau. Les histoires retenues
+alimentent une file classée (--backlog, --pop) dans laquelle le pipeline pioche. Un post
+"new" n'a pas encore de score : l'ingestion ne filtre que sur la longueur, et les scores
+de la file sont rafraîchis via /by_id avant chaque --pop, où --min-score s'applique.
+
+L'URL de base est configurable (--base-url / REDDIT_BASE_URL) pour tester contre
+un faux serveur local qui sert /r/<subreddit>/<listing>.json.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+from fetch_reddit_stories import format_story
+from story_store import DEFAULT_DB_PATH, StoryStore, content_hash
+
+PUBLIC_BASE_URL = "https://www.reddit.com"
+OAUTH_BASE_URL = "https://oauth.reddit.com"
+TOKEN_URL = "https://www.reddit.com/api/v1/access_token"
+DEFAULT_OUTPUT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '../data/reddit'))
+PAGE_SIZE = 100  # maximum accepté par l'API
+SCORE_REFRESH_INTERVAL = 3600  # âge maximal (s) du score d'une histoire de la file avant --pop
+
+
+class RedditClient:
+    """Minimal Reddit listing client over urllib (thread-safe, no shared state after init).
+
+    With credentials and no explicit `base_url`, an application-only OAuth
+    token is requested and calls go to oauth.reddit.com.
+    """
+
+    def __init__(self, base_url=None, user_agent=None, client_id=None, client_secret=None, timeout=15.0):
+        self.user_agent = user_agent or "script:storyfetcher:v1.0 (by u/yourusername)"
+        self.timeout = timeout
+        self.token = None
+        if base_url is None and client_id and client_secret:
+            self.token = self._request_token(client_id, client_secret)
+            base_url = OAUTH_BASE_URL
+        self.base_url = (base_url or PUBLIC_BASE_URL).rstrip('/')
+
+    @classmethod
+    def from_env(cls, base_url=None):
+        load_dotenv()
+        return cls(
+            base_url=base_url or os.getenv("REDDIT_BASE_URL"),
+            user_agent=os.getenv("REDDIT_USER_AGENT"),
+            client_id=os.getenv("REDDIT_CLIENT_ID"),
+            client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
+        )
+
+    def _request_token(self, client_id, client_secret):
+        credentials = base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()
+        request = urllib.request.Request(
+            TOKEN_URL,
+            data=urllib.parse.urlencode({"grant_type": "client_credentials"}).encode(),
+            headers={"Authorization": f"Basic {credentials}", "User-Agent": self.user_agent},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)["access_token"]
+
+    def get_json(self, path, params=None):
+        url = f"{self.base_url}{path}"
+        if params:
+            url += "?" + urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+        headers = {"User-Agent": self.user_agent}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(url, headers=headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)
+
+    def listing(self, subreddit, listing="hot", limit=PAGE_SIZE, after=None, before=None, time_filter=None):
+        """One page of a listing; returns (posts, after fullname or None)"""
+        data = self.get_json(f"/r/{subreddit}/{listing}.json", {
+            "limit": min(limit, PAGE_SIZE), "after": after, "before": before, "t": time_filter, "raw_json": 1,
+        })["data"]
+        return [child["data"] for child in data["children"]], data.get("after")
+
+    def by_id(self, post_ids):
+        """Current data (score, comments...) of up to PAGE_SIZE posts"""
+        fullnames = ','.join(post_id if post_id.startswith('t3_') else f't3_{post_id}' for post_id in post_ids)
+        data = self.get_json(f"/by_id/{fullnames}.json", {"raw_json": 1})["data"]
+        return [child["data"] for child in data["children"]]
+
+
+def parse_listing(spec):
+    """'top:week' -> ('top', 'week'); 'hot' -> ('hot', None)"""
+    listing, _, time_filter = spec.partition(':')
+    return listing, time_filter or None
+
+
+def fetch_listing(client, subreddit, listing_spec="hot", limit=25):
+    """Up to `limit` posts of one subreddit listing, following pagination"""
+    listing, time_filter = parse_listing(listing_spec)
+    posts = []
+    after = None
+    while len(posts) < limit:
+        page, after = client.listing(subreddit, listing, limit - len(posts), after, time_filter=time_filter)
+        posts.extend(page)
+        if not page or not after:
+            break
+    return posts[:limit]
+
+
+def fetch_since(client, subreddit, last_fullname=None, last_created_utc=None, limit=100, page_size=25):
+    """Posts of the "new" listing newer than the cursor, newest first.
+
+    Stops at the first already-seen post, so an unchanged subreddit costs a
+    single request. Without a cursor, reads up to `limit` posts.
+    """
+    posts = []
+    after = None
+    while len(posts) < limit:
+        page, after = client.listing(subreddit, "new", page_size, after)
+        for post in page:
+            if post.get("name") == last_fullname or (
+                    last_created_utc is not None and post.get("created_utc", 0) <= last_created_utc):
+                return posts
+            posts.append(post)
+        if not page or not after:
+            break
+    return posts[:limit]
+
+
+def is_story(post, min_length=200):
+    """Text posts long enough to be a story (no stickied or NSFW posts).
+
+    The score is not checked here: fresh posts have none yet (see pop_stories).
+    """
+    return (post.get("is_self") and not post.get("stickied") and not post.get("over_18")
+            and len(post.get("selftext") or "") > min_length
+            and post.get("selftext") not in ("[removed]", "[deleted]"))
+
+
+def story_entry(post):
+    """Post as the story dict used by fetch_reddit_stories.format_story"""
+    created = datetime.fromtimestamp(post.get("created_utc", 0), tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return {
+        "title": post["title"],
+        "author": post.get("author") or "Unknown",
+        "url": post.get("url") or f"https://www.reddit.com{post.get('permalink', '')}",
+        "score": post.get("score", 0),
+        "comments": post.get("num_comments", 0),
+        "created": created,
+        "content": post["selftext"],
+    }
+
+
+def write_story(post, output_dir):
+    path = os.path.join(output_dir, f"{post.get('subreddit', 'reddit')}_{post['id']}.md")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(format_story(story_entry(post)) + "\n")
+    return path
+
+
+def ingest(store, posts, subreddit, output_dir, stats, min_length=200):
+    """Filter, deduplicate and write fetched posts; returns the new story paths"""
+    written = []
+    for post in posts:
+        stats["fetched"] += 1
+        if not is_story(post, min_length):
+            stats["filtered"] += 1
+            continue
+        body_hash = content_hash(post["selftext"])
+        if store.is_seen(post["id"], body_hash):
+            stats["duplicates"] += 1
+            continue
+        post.setdefault("subreddit", subreddit)
+        path = write_story(post, output_dir)
+        store.add(post, body_hash, path)
+        written.append(path)
+    return written
+
+
+def report(stats, written, start_time):
+    print(f"Fetched {stats['fetched']} posts in {time.time() - start_time:.1f}s: {len(written)} new stories, "
+          f"{stats['duplicates']} already seen, {stats['filtered']} filtered out")
+
+
+def harvest(subreddits, listings=("hot",), limit=25, output_dir=DEFAULT_OUTPUT_DIR, db_path=DEFAULT_DB_PATH,
+            client=None, max_workers=8, min_length=200):
+    """Fetch every (subreddit, listing) pair concurrently and write the new stories.
+
+    Network calls run in a thread pool; filtering, deduplication and writes
+    happen in the calling thread as listings complete. Returns the paths of
+    the story files written.
+    """
+    client = client or RedditClient.from_env()
+    os.makedirs(output_dir, exist_ok=True)
+    store = StoryStore(db_path)
+    start_time = time.time()
+    written = []
+    stats = {"fetched": 0, "filtered": 0, "duplicates": 0}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(fetch_listing, client, subreddit, spec, limit): (subreddit, spec)
+                for subreddit in subreddits for spec in listings
+            }
+            for future in as_completed(futures):
+                subreddit, spec = futures[future]
+                try:
+                    posts = future.result()
+                except Exception as e:
+                    print(f"Error fetching r/{subreddit} {spec}: {e}")
+                    continue
+                new = ingest(store, posts, subreddit, output_dir, stats, min_length)
+                written.extend(new)
+                print(f"r/{subreddit} {spec}: {len(posts)} posts, {len(new)} new stories")
+    finally:
+        store.close()
+
+    report(stats, written, start_time)
+    return written
+
+
+def harvest_incremental(subreddits, output_dir=DEFAULT_OUTPUT_DIR, db_path=DEFAULT_DB_PATH, client=None,
+                        max_workers=8, min_length=200, limit=100, page_size=25):
+    """Fetch only the posts published since the previous run of each subreddit.
+
+    Cursors (fullname and timestamp of the newest post seen) are read before
+    the fetch and advanced once the posts are ingested, so a failed fetch is
+    simply retried on the next run. Returns the paths of the new stories.
+    """
+    client = client or RedditClient.from_env()
+    os.makedirs(output_dir, exist_ok=True)
+    store = StoryStore(db_path)
+    start_time = time.time()
+    written = []
+    stats = {"fetched": 0, "filtered": 0, "duplicates": 0}
+    try:
+        cursors = {subreddit: store.get_cursor(subreddit, "new") for subreddit in subreddits}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(fetch_since, client, subreddit, *cursors[subreddit], limit, page_size): subreddit
+                for subreddit in subreddits
+            }
+            for future in as_completed(futures):
+                subreddit = futures[future]
+                try:
+                    posts = future.result()
+                except Exception as e:
+                    print(f"Error fetching r/{subreddit} new: {e}")
+                    continue
+                new = ingest(store, posts, subreddit, output_dir, stats, min_length)
+                written.extend(new)
+                if posts:
+                    newest = max(posts, key=lambda post: post.get("created_utc", 0))
+                    store.set_cursor(subreddit, "new", newest.get("name"), newest.get("created_utc"))
+                print(f"r/{subreddit}: {len(posts)} posts since last run, {len(new)} new stories")
+    finally:
+        store.close()
+
+    report(stats, written, start_time)
+    return written
+
+
+def refresh_scores(store, client, max_age=SCORE_REFRESH_INTERVAL):
+    """Re-read the score of backlog posts older than `max_age` (/by_id, 100 per request); returns their number"""
+    post_ids = store.stale_scores(max_age)
+    for i in range(0, len(post_ids), PAGE_SIZE):
+        store.update_scores(client.by_id(post_ids[i:i + PAGE_SIZE]))
+    return len(post_ids)
+
+
+def pop_stories(count=1, db_path=DEFAULT_DB_PATH, min_score=0, client=None, refresh=True):
+    """Reserve the best-ranked unused stories of the backlog, on refreshed scores.
+
+    The stories are only marked used by settle_story() once rendered.
+    """
+    store = StoryStore(db_path)
+    try:
+        if refresh:
+            try:
+                refreshed = refresh_scores(store, client or RedditClient.from_env())
+                if refreshed:
+                    print(f"Refreshed the score of {refreshed} backlog stories")
+            except Exception as e:
+                print(f"Warning: Could not refresh backlog scores: {e}")
+        return store.pop(count, min_score)
+    finally:
+        store.close()
+
+
+def settle_story(path, used, db_path=DEFAULT_DB_PATH):
+    """Mark a popped story used (rendered) or put it back in the backlog (failed)"""
+    if not os.path.exists(db_path):
+        return
+    store = StoryStore(db_path)
+    try:
+        if used:
+            store.mark_used(path)
+        else:
+            store.release(path)
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Récupérer des histoires sur plusieurs subreddits en parallèle (un fichier par histoire)"
+    )
+    parser.add_argument("subreddits", nargs="*", default=["stories"], help="Subreddits (default: stories)")
+    parser.add_argument("--listings", nargs="+", default=["hot"],
+                        help="Listings à parcourir : hot, new, rising, top:week... (default: hot)")
+    parser.add_argument("--limit", type=int, default=25, help="Posts examinés par listing (default: 25)")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Dossier des fichiers d'histoires")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Base SQLite des posts déjà vus")
+    parser.add_argument("--base-url", default=None,
+                        help="URL de base de l'API (ex. faux serveur local ; défaut : REDDIT_BASE_URL ou reddit.com)")
+    parser.add_argument("--workers", type=int, default=8, help="Requêtes simultanées (default: 8)")
+    parser.add_argument("--min-length", type=int, default=200, help="Longueur minimale du texte (default: 200)")
+    parser.add_argument("--min-score", type=int, default=0,
+                        help="Score minimal (rafraîchi) pour --pop et --backlog (default: 0)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Ne lire que les nouveaux posts depuis la dernière exécution (listing new)")
+    parser.add_argument("--backlog", action="store_true", help="Afficher la file des histoires non utilisées")
+    parser.add_argument("--pop", type=int, default=None, metavar="N",
+                        help="Réserver les N meilleures histoires de la file et afficher leurs chemins")
+    parser.add_argument("--mark-used", nargs="+", default=None, metavar="PATH",
+                        help="Marquer des histoires réservées comme utilisées (vidéo rendue)")
+    args = parser.parse_args()
+
+    if args.mark_used:
+        for path in args.mark_used:
+            settle_story(path, True, args.db)
+        return
+    if args.backlog or args.pop:
+        if args.pop:
+            paths = pop_stories(args.pop, args.db, args.min_score, RedditClient.from_env(args.base_url))
+            for path in paths:
+                print(path)
+            sys.exit(0 if paths else 1)
+        store = StoryStore(args.db)
+        try:
+            for post_id, subreddit, title, rank, path in store.backlog(min_score=args.min_score):
+                print(f"{rank:8.0f}  r/{subreddit:16} {title[:60]}  ({path})")
+        finally:
+            store.close()
+        return
+
+    client = RedditClient.from_env(args.base_url)
+    if args.incremental:
+        written = harvest_incremental(args.subreddits, args.output_dir, args.db, client, args.workers,
+                                      args.min_length, args.limit)
+    else:
+        written = harvest(args.subreddits, args.listings, args.limit, args.output_dir, args.db,
+                          client, args.workers, args.min_length)
+    for path in written:
+        print(path)
+    sys.exit(0 if written else 1)
+
+
+if __name__ == "__main__":
+    main()
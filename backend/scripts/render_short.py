@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Rendu en une seule passe : montage, mixage audio (TTS + fond) et sous-titres sont
+composés en mémoire puis encodés une seule fois, sans output.mp4 intermédiaire.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from add_caption import CaptionTrack, cached_transcribe_words, window_words
+from align_words import load_words_sidecar
+from audio_mix import mix_audio, mixed_duration, pick_background
+from encode_profiles import (DEFAULT_ENCODE_PROFILE, ENCODE_PROFILES, parse_window, resize_for_profile,
+                             write_videofile_kwargs)
+from montage import build_montage_clip, library_keyframes, plan_background, write_mixed_track
+
+
+def render_short(audio_path, video_list_path, output_path, words_path=None, font_path=None,
+                 seed=None, use_cache=True, encode_profile=None, window=None):
+    """Render the captioned short from the TTS WAV in a single encode.
+
+    Word timings come from `words_path` (align_words.py sidecar) when given,
+    otherwise from Whisper on the sped-up voice track (through the word cache).
+    The audio track is mixed in one ffmpeg pass by audio_mix.py.
+    Encoder settings come from `encode_profile` (see encode_profiles.py). With
+    `window` = (start, end) in seconds only that part of the short is rendered
+    (word timings are still computed and cached for the whole voice track).
+    """
+    start_time = time.time()
+    print(f"Starting single-pass render with audio: {audio_path}")
+    tmp_audio_path = None
+    tmp_voice_path = None
+    final = None
+    opened = []
+    try:
+        audio_duration = mixed_duration(audio_path, window=window)
+        if window:
+            print(f"Rendering window {window[0]:.1f}s-{window[0] + audio_duration:.1f}s")
+        print(f"Audio duration: {audio_duration:.2f} seconds")
+        background = pick_background()
+        if background:
+            print(f"Using background audio: {os.path.basename(background)}")
+
+        segments, durations, index = plan_background(video_list_path, audio_duration, seed)
+        montage, opened = build_montage_clip(segments, durations, audio_duration, seed,
+                                             library_keyframes(index, durations))
+        # Réduire avant les sous-titres : les tuiles sont rendues à la taille finale
+        montage = resize_for_profile(montage, encode_profile)
+        screen_size = montage.size
+        print(f"Resolution: {screen_size[0]}x{screen_size[1]}")
+
+        if words_path and os.path.exists(words_path):
+            print(f"Loading word timings from {words_path}")
+            words = load_words_sidecar(words_path)
+        else:
+            # La voix seule accélérée (sans fond ni normalisation) donne une meilleure transcription
+            print("Transcribing voice track...")
+            tmp = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+            tmp.close()
+            tmp_voice_path = mix_audio(audio_path, tmp.name, loudness=None)
+            words = cached_transcribe_words(tmp_voice_path, use_cache=use_cache)
+        words = [w for w in window_words(words, window) if w["end"] <= audio_duration]
+
+        print("Creating dynamic captions...")
+        track = CaptionTrack(words, screen_size, font_path)
+        print(f"Prepared {len(track.entries)} captions")
+
+        final = track.apply_to(montage)
+        tmp_audio_path = write_mixed_track(audio_path, background, window, encode_profile)
+
+        print("Rendering final video...")
+        final.write_videofile(output_path, audio=tmp_audio_path,
+                              **{**write_videofile_kwargs(encode_profile, montage.fps), 'audio_codec': 'copy'})
+        total_time = time.time() - start_time
+        print(f"Success! Created {output_path} in {total_time:.1f} seconds")
+    finally:
+        if final is not None:
+            final.close()
+        for clip in opened:
+            clip.close()
+        for path in (tmp_audio_path, tmp_voice_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(
+        description="Montage + sous-titres encodés en une seule passe"
+    )
+    parser.add_argument(
+        "audio_file",
+        nargs="?",
+        default=os.path.normpath(os.path.join(script_dir, '../../output/audio/story_complet.wav')),
+        help="Fichier audio TTS .wav"
+    )
+    parser.add_argument(
+        "video_list",
+        nargs="?",
+        default=os.path.normpath(os.path.join(script_dir, '../data/video_list.txt')),
+        help="Fichier texte contenant la liste des vidéos"
+    )
+    parser.add_argument(
+        "output_file",
+        nargs="?",
+        default=os.path.normpath(os.path.join(script_dir, '../../output/video/output_captioned.mp4')),
+        help="Fichier vidéo de sortie"
+    )
+    parser.add_argument("--words", default=None, help="Horodatages JSON produits par align_words.py")
+    parser.add_argument("--font", default="impact.ttf", help="Police des sous-titres")
+    parser.add_argument("--seed", type=int, default=None, help="Graine pour un montage reproductible")
+    parser.add_argument("--no-cache", action="store_true", help="Ignorer le cache des horodatages")
+    parser.add_argument("--encode-profile", choices=list(ENCODE_PROFILES), default=DEFAULT_ENCODE_PROFILE,
+                        help=f"Profil d'encodage (défaut : {DEFAULT_ENCODE_PROFILE})")
+    parser.add_argument("--window", type=parse_window, default=None,
+                        help="Ne rendre qu'une fenêtre : 15 (15 premières secondes) ou 10-25")
+    args = parser.parse_args()
+
+    render_short(
+        args.audio_file,
+        args.video_list,
+        args.output_file,
+        words_path=args.words,
+        font_path=args.font,
+        seed=args.seed,
+        use_cache=not args.no_cache,
+        encode_profile=args.encode_profile,
+        window=args.window
+    )
+
+
+if __name__ == "__main__":
+    main()
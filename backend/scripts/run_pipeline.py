@@ -2,10 +2,61 @@
 """
 Script pipeline orchestrant les étapes : TTS, montage vidéo et ajout de sous-titres.
 """
+import argparse
 import os
 import subprocess
 
+import tts_server
+from encode_profiles import DEFAULT_ENCODE_PROFILE, ENCODE_PROFILES, PREVIEW_PROFILE
+from story_text import preprocess_file
+
 def main():
+    parser = argparse.ArgumentParser(description="Pipeline complet : histoire, TTS, montage et sous-titres")
+    parser.add_argument(
+        '--single-pass',
+        action='store_true',
+        help="Montage et sous-titres encodés en une seule passe (render_short.py)"
+    )
+    parser.add_argument(
+        '--tts-cache',
+        action='store_true',
+        help="Synthèse phrase par phrase avec cache audio (seules les phrases modifiées sont régénérées)"
+    )
+    parser.add_argument(
+        '--tts-profile',
+        choices=['fast', 'balanced', 'quality'],
+        default=None,
+        help="Profil d'inférence TTS (défaut : quality)"
+    )
+    parser.add_argument(
+        '--raw-text',
+        action='store_true',
+        help="Lire l'histoire telle quelle (sans retirer métadonnées et markdown)"
+    )
+    parser.add_argument(
+        '--encode-profile',
+        choices=list(ENCODE_PROFILES),
+        default=DEFAULT_ENCODE_PROFILE,
+        help=f"Profil d'encodage vidéo (défaut : {DEFAULT_ENCODE_PROFILE})"
+    )
+    parser.add_argument(
+        '--preview',
+        action='store_true',
+        help="Aperçu rapide : basse résolution, une seule passe, caches TTS et horodatages (output_preview.mp4)"
+    )
+    parser.add_argument(
+        '--window',
+        default=None,
+        help="Ne rendre qu'une fenêtre : 15 (15 premières secondes) ou 10-25 (implique une seule passe)"
+    )
+    args = parser.parse_args()
+    if args.preview:
+        args.tts_cache = True
+        args.single_pass = True
+        args.encode_profile = PREVIEW_PROFILE
+    if args.window:
+        args.single_pass = True
+
     # Définir les chemins du projet
     script_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.normpath(os.path.join(script_dir, '..', '..'))
@@ -22,20 +73,51 @@ def main():
     reddit_script = os.path.join(script_dir, 'fetch_reddit_stories.py')
     reddit_stories_md = os.path.join(data_dir, 'reddit_stories.md')
     # Try to fetch stories from Reddit, but continue with sample stories if it fails
-    try:
-        # Fetch 1 story from r/stories
-        subprocess.run(['python', reddit_script, reddit_stories_md, '--limit', '1'], check=True)
+    if args.preview and os.path.exists(reddit_stories_md):
+        # L'aperçu retravaille la dernière histoire récupérée
+        print(f"Preview: reusing {reddit_stories_md}")
         generated_md = reddit_stories_md
-    except subprocess.CalledProcessError as e:
-        print(f"Warning: Could not fetch stories from Reddit. Using sample stories instead. Error: {e}")
-        generated_md = os.path.join(data_dir, 'sample.md')
+    else:
+        try:
+            # Fetch 1 story from r/stories
+            subprocess.run(['python', reddit_script, reddit_stories_md, '--limit', '1'], check=True)
+            generated_md = reddit_stories_md
+        except subprocess.CalledProcessError as e:
+            print(f"Warning: Could not fetch stories from Reddit. Using sample stories instead. Error: {e}")
+            generated_md = os.path.join(data_dir, 'sample.md')
+
+    # Étape 0b : Nettoyage du texte (métadonnées, markdown, nombres) avant le TTS
+    if not args.raw_text:
+        print("=== Étape 0b: Nettoyage du texte ===")
+        generated_md = preprocess_file(generated_md, split=False)[0]
 
     # Étape 1 : Synthèse vocale
     print("=== Étape 1: Synthèse vocale (TTS) ===")
     tts_script = os.path.join(script_dir, 'texttospeech_vibevoice.py')
     sample_md = generated_md  # Utiliser l'histoire générée
     output_audio = os.path.join(audio_dir, 'story_complet.wav')
-    subprocess.run(['python', tts_script, sample_md, output_audio, '--speaker', 'Alice'], check=True)
+    # Utiliser le worker TTS résident s'il tourne (modèle déjà chargé)
+    if tts_server.request_synthesis(sample_md, output_audio, 'Alice', cached=args.tts_cache,
+                                    profile=args.tts_profile) is not None:
+        print("Synthesized by the resident TTS worker")
+    else:
+        tts_cmd = ['python', tts_script, sample_md, output_audio, '--speaker', 'Alice']
+        if args.tts_cache:
+            tts_cmd.append('--cache')
+        if args.tts_profile:
+            tts_cmd += ['--profile', args.tts_profile]
+        subprocess.run(tts_cmd, check=True)
+
+    # Étape 1b : Alignement forcé du texte sur l'audio (évite la retranscription Whisper)
+    print("=== Étape 1b: Alignement des mots ===")
+    align_script = os.path.join(script_dir, 'align_words.py')
+    words_json = os.path.splitext(output_audio)[0] + '.words.json'
+    if os.path.exists(words_json):
+        os.remove(words_json)
+    try:
+        subprocess.run(['python', align_script, sample_md, output_audio, '--output', words_json], check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Warning: Alignment failed, captions will use Whisper transcription. Error: {e}")
 
     # Étape 2 : Montage vidéo
     print("=== Étape 2: Montage vidéo ===")
@@ -50,14 +132,33 @@ def main():
             for f in files:
                 vf.write(f+"\n")
     input_audio = output_audio
+    output_captioned = os.path.join(video_dir, 'output_preview.mp4' if args.preview else 'output_captioned.mp4')
+
+    if args.single_pass:
+        # Étapes 2+3 fusionnées : un seul encodage
+        print("=== Étapes 2+3: Montage et sous-titres (une passe) ===")
+        render_script = os.path.join(script_dir, 'render_short.py')
+        render_cmd = ['python', render_script, input_audio, video_list, output_captioned,
+                      '--encode-profile', args.encode_profile]
+        if os.path.exists(words_json):
+            render_cmd += ['--words', words_json]
+        if args.window:
+            render_cmd += ['--window', args.window]
+        subprocess.run(render_cmd, check=True)
+        print("Pipeline terminé ! Fichiers disponibles dans output/")
+        return
+
     output_video = os.path.join(video_dir, 'output.mp4')
-    subprocess.run(['python', montage_script, input_audio, video_list, output_video], check=True)
+    subprocess.run(['python', montage_script, input_audio, video_list, output_video,
+                    '--encode-profile', args.encode_profile], check=True)
 
     # Étape 3 : Ajout des sous-titres
     print("=== Étape 3: Ajout des sous-titres ===")
     caption_script = os.path.join(script_dir, 'add_caption.py')
-    output_captioned = os.path.join(video_dir, 'output_captioned.mp4')
-    subprocess.run(['python', caption_script, output_video, output_captioned], check=True)
+    caption_cmd = ['python', caption_script, output_video, output_captioned, '--encode-profile', args.encode_profile]
+    if os.path.exists(words_json):
+        caption_cmd += ['--words', words_json]
+    subprocess.run(caption_cmd, check=True)
 
     print("Pipeline terminé ! Fichiers disponibles dans output/")
 
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Mémoire locale SQLite des posts Reddit déjà récupérés (identifiants et empreintes
+du texte), pour ne jamais transformer deux fois la même histoire en vidéo, même
+republiée sous un autre identifiant. Garde aussi les curseurs de récupération
+incrémentale par subreddit et la file (backlog) classée des histoires à produire.
+Une histoire retirée de la file est réservée, puis marquée utilisée seulement une
+fois sa vidéo rendue (ou rendue à la file si le rendu échoue).
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import time
+
+DEFAULT_DB_PATH = os.path.normpath(os.path.join(os.path.dirname(__file__), '../data/reddit_stories.db'))
+# Une réservation non confirmée (pipeline interrompu) expire et l'histoire revient dans la file
+RESERVATION_TTL = 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id TEXT PRIMARY KEY,
+    subreddit TEXT NOT NULL,
+    title TEXT,
+    author TEXT,
+    url TEXT,
+    score INTEGER,
+    num_comments INTEGER,
+    created_utc REAL,
+    content_hash TEXT NOT NULL,
+    path TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS posts_content_hash ON posts (content_hash);
+CREATE TABLE IF NOT EXISTS cursors (
+    subreddit TEXT NOT NULL,
+    listing TEXT NOT NULL,
+    last_fullname TEXT,
+    last_created_utc REAL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (subreddit, listing)
+);
+"""
+
+# Colonnes ajoutées après la première version du schéma
+MIGRATIONS = {
+    "rank": "ALTER TABLE posts ADD COLUMN rank REAL NOT NULL DEFAULT 0",
+    "used_at": "ALTER TABLE posts ADD COLUMN used_at REAL",
+    "reserved_at": "ALTER TABLE posts ADD COLUMN reserved_at REAL",
+    "scored_at": "ALTER TABLE posts ADD COLUMN scored_at REAL",
+}
+
+
+def content_hash(text):
+    """Hash of a post body, insensitive to case, whitespace and punctuation"""
+    normalized = ' '.join(re.sub(r'[^\w\s]', ' ', text.lower()).split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def story_rank(post):
+    """Backlog priority: engagement (score, comments weighted double)"""
+    return (post.get("score") or 0) + 2 * (post.get("num_comments") or 0)
+
+
+class StoryStore:
+    """Seen-post store; use it from a single thread"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(posts)")}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                self.conn.execute(statement)
+        self.conn.commit()
+
+    def is_seen(self, post_id, body_hash):
+        row = self.conn.execute(
+            "SELECT 1 FROM posts WHERE id = ? OR content_hash = ? LIMIT 1", (post_id, body_hash)
+        ).fetchone()
+        return row is not None
+
+    def add(self, post, body_hash, path=None):
+        # scored_at reste vide : le score d'un post tout juste publié sera rafraîchi (stale_scores)
+        self.conn.execute(
+            "INSERT OR IGNORE INTO posts (id, subreddit, title, author, url, score, num_comments, created_utc,"
+            " content_hash, path, fetched_at, rank) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (post["id"], post.get("subreddit", ""), post.get("title"), post.get("author"), post.get("url"),
+             post.get("score"), post.get("num_comments"), post.get("created_utc"), body_hash,
+             os.path.abspath(path) if path else None, time.time(), story_rank(post))
+        )
+        self.conn.commit()
+
+    def stale_scores(self, max_age):
+        """Ids of backlog posts never re-scored, or whose score is older than `max_age` seconds"""
+        rows = self.conn.execute(
+            "SELECT id FROM posts WHERE used_at IS NULL AND path IS NOT NULL"
+            " AND (reserved_at IS NULL OR reserved_at < ?) AND (scored_at IS NULL OR scored_at < ?)"
+            " ORDER BY created_utc DESC",
+            (time.time() - RESERVATION_TTL, time.time() - max_age)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def update_scores(self, posts):
+        """Store fresh score / comment counts (e.g. from /by_id) and recompute the rank"""
+        now = time.time()
+        self.conn.executemany(
+            "UPDATE posts SET score = ?, num_comments = ?, rank = ?, scored_at = ? WHERE id = ?",
+            [(post.get("score"), post.get("num_comments"), story_rank(post), now, post["id"]) for post in posts]
+        )
+        self.conn.commit()
+
+    def get_cursor(self, subreddit, listing="new"):
+        """(last_fullname, last_created_utc) of the newest post seen, or (None, None)"""
+        row = self.conn.execute(
+            "SELECT last_fullname, last_created_utc FROM cursors WHERE subreddit = ? AND listing = ?",
+            (subreddit, listing)
+        ).fetchone()
+        return row if row else (None, None)
+
+    def set_cursor(self, subreddit, listing, fullname, created_utc):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cursors (subreddit, listing, last_fullname, last_created_utc, updated_at)"
+            " VALUES (?, ?, ?, ?, ?)", (subreddit, listing, fullname, created_utc, time.time())
+        )
+        self.conn.commit()
+
+    def backlog(self, limit=None, min_score=None):
+        """Unused, unreserved stories with a file on disk, best ranked first: [(id, subreddit, title, rank, path)]"""
+        query = ("SELECT id, subreddit, title, rank, path FROM posts WHERE used_at IS NULL AND path IS NOT NULL"
+                 " AND (reserved_at IS NULL OR reserved_at < ?)")
+        params = [time.time() - RESERVATION_TTL]
+        if min_score:
+            query += " AND score >= ?"
+            params.append(min_score)
+        rows = self.conn.execute(query + " ORDER BY rank DESC, created_utc DESC", params).fetchall()
+        rows = [row for row in rows if os.path.exists(row[4])]
+        return rows[:limit] if limit else rows
+
+    def pop(self, count=1, min_score=None):
+        """Reserve the `count` best stories of the backlog; returns their paths.
+
+        Call mark_used() once a story is rendered, or release() if it failed.
+        """
+        rows = self.backlog(count, min_score)
+        now = time.time()
+        self.conn.executemany("UPDATE posts SET reserved_at = ? WHERE id = ?", [(now, row[0]) for row in rows])
+        self.conn.commit()
+        return [row[4] for row in rows]
+
+    def mark_used(self, path):
+        """The story at `path` was turned into a video: never offer it again"""
+        self.conn.execute("UPDATE posts SET used_at = ? WHERE path = ?", (time.time(), os.path.abspath(path)))
+        self.conn.commit()
+
+    def release(self, path):
+        """Put a reserved story back in the backlog (its render failed)"""
+        self.conn.execute("UPDATE posts SET reserved_at = NULL WHERE path = ? AND used_at IS NULL",
+                          (os.path.abspath(path),))
+        self.conn.commit()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Préparation du texte des histoires avant la synthèse vocale : retire les métadonnées
+(Author:/URL:/Score:... écrites par fetch_reddit_stories.py) et la syntaxe markdown,
+sépare les fichiers multi-histoires en un fichier par histoire et écrit les nombres
+et abréviations en toutes lettres. Le fichier nettoyé sert à la fois au TTS et à
+l'alignement des sous-titres (align_words.py).
+"""
+import argparse
+import json
+import os
+import re
+
+STORY_PREFIX = re.compile(r'^\s*Story\s+\d+\s*:\s*', re.IGNORECASE)
+METADATA_LINE = re.compile(r'^\s*(Author|URL|Score|Comments|Posted)\s*:\s*(.*)$', re.IGNORECASE)
+SPEAKER_TAG = re.compile(r'^\s*Speaker\s*\d+\s*:\s*', re.IGNORECASE)
+
+ONES = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+        "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"]
+TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+SCALES = [(10 ** 9, "billion"), (10 ** 6, "million"), (1000, "thousand")]
+ORDINAL_WORDS = {"one": "first", "two": "second", "three": "third", "five": "fifth", "eight": "eighth",
+                 "nine": "ninth", "twelve": "twelfth"}
+
+# Abréviations courantes (et sigles Reddit) lues telles quelles par le TTS
+ABBREVIATIONS = [
+    (r'\bMr\.', "Mister"), (r'\bMrs\.', "Missus"), (r'\bMs\.', "Miss"), (r'\bDr\.', "Doctor"),
+    (r'\be\.g\.', "for example"), (r'\bi\.e\.', "that is"), (r'\betc\.', "et cetera"),
+    (r'\bvs\.?(?=\s)', "versus"), (r'\bapprox\.', "approximately"),
+    (r'\bw/o\b', "without"), (r'\bw/(?=\s)', "with"), (r'\s&\s', " and "),
+    (r'\bTL;?DR\b:?', "In short,"), (r'\bAITA\b', "am I the asshole"), (r'\bWIBTA\b', "would I be the asshole"),
+    (r'\bIMO\b', "in my opinion"), (r'\bBTW\b', "by the way"), (r'\bIDK\b', "I don't know"),
+    (r'\bBF\b', "boyfriend"), (r'\bGF\b', "girlfriend"),
+    (r'\b([Mm]y|[Hh]er|[Hh]is|[Yy]our|[Tt]heir|[Oo]ur)\s+SO\b', r"\1 partner"),
+]
+
+MONTHS = ("January|February|March|April|May|June|July|August|September|October|November|December"
+          "|Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec")
+# Un nombre entre 1100 et 2099 n'est lu comme une année qu'après ces mots ("in 1998", "summer of 2019", "May 3, 2021")
+YEAR_CONTEXT = re.compile(
+    r'\b(?:in|since|from|until|till|by|before|after|around|circa|during|year|early|late|mid|'
+    r'(?:spring|summer|fall|autumn|winter|class|year|end|start|beginning|middle)\s+of|'
+    rf'(?:{MONTHS})\.?(?:\s+\w+,)?)\s+$', re.IGNORECASE)
+# ... et jamais devant une unité ("in 1500 dollars", "since 1200 people")
+NOT_YEAR_AFTER = re.compile(r'\s*(?:dollars?|bucks|euros?|pounds?|people|miles?|km|meters?|feet|words|times|'
+                            r'calories|followers|subscribers|votes|upvotes)\b', re.IGNORECASE)
+
+
+def number_to_words(n):
+    """Cardinal English words for a non-negative integer (digits are spelled above a trillion)"""
+    if n < 20:
+        return ONES[n]
+    if n < 100:
+        return TENS[n // 10] + ("-" + ONES[n % 10] if n % 10 else "")
+    if n < 1000:
+        rest = n % 100
+        return ONES[n // 100] + " hundred" + (" " + number_to_words(rest) if rest else "")
+    if n >= 10 ** 12:
+        return " ".join(ONES[int(d)] for d in str(n))
+    for value, name in SCALES:
+        if n >= value:
+            rest = n % value
+            return number_to_words(n // value) + " " + name + (" " + number_to_words(rest) if rest else "")
+
+
+def ordinal_to_words(n):
+    words = number_to_words(n)
+    head, sep, last = words.rpartition(" ")
+    prefix, dash, last = last.rpartition("-")
+    if last in ORDINAL_WORDS:
+        last = ORDINAL_WORDS[last]
+    elif last.endswith("y"):
+        last = last[:-1] + "ieth"
+    else:
+        last += "th"
+    return head + sep + prefix + dash + last
+
+
+def year_to_words(n):
+    """1987 -> nineteen eighty-seven, 2005 -> two thousand five, 2019 -> twenty nineteen"""
+    century, rest = divmod(n, 100)
+    if rest == 0:
+        return number_to_words(n) if n % 1000 == 0 else number_to_words(century) + " hundred"
+    if 2000 <= n < 2010:
+        return number_to_words(n)
+    return number_to_words(century) + " " + ("oh " + ONES[rest] if rest < 10 else number_to_words(rest))
+
+
+def _number(text):
+    return int(text.replace(",", ""))
+
+
+def _spell_time(match):
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    words = number_to_words(hour)
+    if minute:
+        words += " " + ("oh " + ONES[minute] if minute < 10 else number_to_words(minute))
+    elif not meridiem and match.group(2):
+        words += " o'clock"
+    if meridiem:
+        words += " " + " ".join(meridiem.replace(".", "").upper())
+    return words
+
+
+def _spell_money(match):
+    amount, cents, suffix = match.group(1), match.group(2), (match.group(3) or "").lower()
+    if suffix:
+        whole = float(amount.replace(",", "") + ("." + cents if cents else ""))
+        value = int(round(whole * {"k": 1000, "m": 10 ** 6}[suffix]))
+        return number_to_words(value) + " dollars"
+    words = number_to_words(_number(amount)) + (" dollar" if _number(amount) == 1 else " dollars")
+    if cents and int(cents):
+        words += " and " + number_to_words(int(cents)) + " cents"
+    return words
+
+
+def _spell_amount(text):
+    whole, _, fraction = text.partition(".")
+    words = number_to_words(_number(whole))
+    if fraction:
+        words += " point " + " ".join(ONES[int(d)] for d in fraction)
+    return words
+
+
+def _is_year(match):
+    before = match.string[max(0, match.start() - 30):match.start()]
+    return bool(YEAR_CONTEXT.search(before)) and not NOT_YEAR_AFTER.match(match.string, match.end())
+
+
+def _spell_integer(match):
+    text = match.group(0)
+    n = _number(text)
+    if "," not in text and 1100 <= n < 2100 and _is_year(match):
+        return year_to_words(n)
+    return number_to_words(n)
+
+
+def normalize_text(text):
+    """Write abbreviations, amounts, times, ordinals and numbers as spoken words"""
+    for pattern, replacement in ABBREVIATIONS:
+        text = re.sub(pattern, replacement, text)
+    text = re.sub(r'\((\d{1,2})\s?([MF])\)',
+                  lambda m: f"({number_to_words(int(m.group(1)))}, {'male' if m.group(2) == 'M' else 'female'})",
+                  text)
+    text = re.sub(r'\$(\d[\d,]*)(?:\.(\d+))?(?:\s?([kKmM])\b)?', _spell_money, text)
+    text = re.sub(r'\b(\d{1,2}):(\d{2})\s?([AaPp]\.?[Mm]\.?)?(?!\w|\.\w)', _spell_time, text)
+    text = re.sub(r'\b(\d{1,2})()\s?([AaPp]\.?[Mm]\.?)(?!\w|\.\w)', _spell_time, text)
+    text = re.sub(r'\b(\d[\d,]*(?:\.\d+)?)\s?%', lambda m: _spell_amount(m.group(1)) + " percent", text)
+    text = re.sub(r'\b(\d+)(st|nd|rd|th)\b', lambda m: ordinal_to_words(int(m.group(1))), text, flags=re.IGNORECASE)
+    text = re.sub(r'\b(?:\d{1,3}(?:,\d{3})+|\d+)\.\d+\b', lambda m: _spell_amount(m.group(0)), text)
+    text = re.sub(r'\b\d{1,3}(?:,\d{3})+\b|\b\d+\b', _spell_integer, text)
+    return text
+
+
+def strip_markup(text):
+    """Remove markdown syntax, links, URLs and HTML while keeping the readable text"""
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'!\[[^\]]*\]\([^)]*\)', '', text)
+    text = re.sub(r'\[([^\]]*)\]\([^)]*\)', r'\1', text)
+    text = re.sub(r'https?://\S+|www\.\S+', '', text)
+    text = re.sub(r'&amp;', '&', text)
+    text = re.sub(r'&(nbsp|#x200B);', ' ', text)
+    lines = []
+    for line in text.splitlines():
+        line = SPEAKER_TAG.sub('', line)
+        if re.match(r'^\s*([-*_]\s*){3,}$', line):
+            line = ''
+        line = re.sub(r'^\s*#{1,6}\s+', '', line)
+        line = re.sub(r'^\s*>+\s?', '', line)
+        line = re.sub(r'^\s*(?:[-*+]|\d+[.)])\s+', '', line)
+        line = re.sub(r'(\*\*|__|~~|`)', '', line)
+        line = re.sub(r'(?<!\w)[*_](\S(?:.*?\S)?)[*_](?!\w)', r'\1', line)
+        lines.append(' '.join(line.split()))
+    return '\n'.join(lines)
+
+
+def parse_stories(md_text):
+    """Split a (multi-)story markdown file on its level-one headings.
+
+    Returns [{"title", "meta", "body"}]; metadata lines are removed from the
+    body and kept in "meta".
+    """
+    stories = []
+    current = None
+    for line in md_text.splitlines():
+        heading = re.match(r'^\s*#\s+(.*)$', line)
+        if heading:
+            current = {"title": STORY_PREFIX.sub('', heading.group(1)).strip(), "meta": {}, "lines": []}
+            stories.append(current)
+            continue
+        if current is None:
+            current = {"title": None, "meta": {}, "lines": []}
+            stories.append(current)
+        metadata = METADATA_LINE.match(line)
+        if metadata and not any(l.strip() for l in current["lines"]):
+            current["meta"][metadata.group(1).lower()] = metadata.group(2).strip()
+            continue
+        current["lines"].append(line)
+    return [
+        {"title": s["title"], "meta": s["meta"], "body": '\n'.join(s["lines"]).strip()}
+        for s in stories if s["title"] or '\n'.join(s["lines"]).strip()
+    ]
+
+
+def clean_story(story, include_title=True):
+    """Spoken text of one parsed story, paragraphs separated by blank lines"""
+    paragraphs = [' '.join(p.split()) for p in re.split(r'\n\s*\n', strip_markup(story["body"]))]
+    if include_title and story["title"]:
+        title = ' '.join(strip_markup(story["title"]).split())
+        if title and title[-1] not in '.!?…':
+            title += '.'
+        paragraphs.insert(0, title)
+    paragraphs = [normalize_text(p) for p in paragraphs if p]
+    return '\n\n'.join(p[:1].upper() + p[1:] for p in paragraphs)
+
+
+def count_tokens(text, tokenizer=None):
+    """Token count with the model tokenizer when given, else a word/punctuation estimate"""
+    if tokenizer is not None:
+        return len(tokenizer.encode(text))
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def story_slug(title, index):
+    slug = re.sub(r'[^a-z0-9]+', '_', (title or '').lower()).strip('_')[:40]
+    return f"{index:02d}_{slug}" if slug else f"{index:02d}"
+
+
+def preprocess_file(input_md, output_dir=None, split=True, include_title=True, tokenizer=None):
+    """Clean a story file for TTS; returns the list of cleaned files.
+
+    With `split`, each story gets its own `<stem>_<NN>_<title>.md` in
+    `output_dir` (default: a `stories/` folder next to the input), otherwise
+    all stories are kept in one `<stem>_clean.md`. A `<stem>_stories.json`
+    manifest records titles, metadata and token counts before/after.
+    """
+    with open(input_md, 'r', encoding='utf-8') as f:
+        raw = f.read()
+    output_dir = output_dir or os.path.join(os.path.dirname(os.path.abspath(input_md)), 'stories')
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(input_md))[0]
+
+    stories = parse_stories(raw)
+    if not stories:
+        raise ValueError(f"No story found in {input_md}")
+    raw_blocks = re.split(r'(?m)^(?=\s*#\s)', raw) if len(stories) > 1 else [raw]
+    raw_blocks = [b for b in raw_blocks if b.strip()]
+
+    entries = []
+    for index, story in enumerate(stories, 1):
+        text = clean_story(story, include_title)
+        raw_text = raw_blocks[index - 1] if len(raw_blocks) == len(stories) else story["body"]
+        entries.append({
+            "title": story["title"], "meta": story["meta"], "text": text,
+            "raw_tokens": count_tokens(raw_text, tokenizer), "clean_tokens": count_tokens(text, tokenizer),
+        })
+
+    if split:
+        for index, entry in enumerate(entries, 1):
+            entry["path"] = os.path.join(output_dir, f"{stem}_{story_slug(entry['title'], index)}.md")
+            with open(entry["path"], 'w', encoding='utf-8') as f:
+                f.write(entry["text"] + '\n')
+        outputs = [entry["path"] for entry in entries]
+    else:
+        path = os.path.join(output_dir, f"{stem}_clean.md")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n\n'.join(entry["text"] for entry in entries) + '\n')
+        for entry in entries:
+            entry["path"] = path
+        outputs = [path]
+
+    print(f"Preprocessed {len(entries)} stories from {input_md}")
+    for entry in entries:
+        saved = entry["raw_tokens"] - entry["clean_tokens"]
+        share = saved / entry["raw_tokens"] if entry["raw_tokens"] else 0.0
+        print(f"  {(entry['title'] or stem)[:40]:40} {entry['raw_tokens']:6} -> {entry['clean_tokens']:6} tokens "
+              f"({saved} saved, {share:.0%})")
+
+    manifest = os.path.join(output_dir, f"{stem}_stories.json")
+    with open(manifest, 'w', encoding='utf-8') as f:
+        json.dump({"source": input_md, "stories": [{k: v for k, v in e.items() if k != "text"} for e in entries]},
+                  f, ensure_ascii=False, indent=2)
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Nettoyer un fichier d'histoires pour le TTS (métadonnées, markdown, nombres, abréviations)"
+    )
+    parser.add_argument("input_md", help="Fichier markdown d'histoires (ex. sortie de fetch_reddit_stories.py)")
+    parser.add_argument("--output-dir", default=None, help="Dossier de sortie (default: stories/ à côté de l'entrée)")
+    parser.add_argument("--no-split", action="store_true", help="Garder toutes les histoires dans un seul fichier")
+    parser.add_argument("--no-title", action="store_true", help="Ne pas lire le titre de l'histoire")
+    parser.add_argument("--tokenizer", default=None,
+                        help="Tokenizer Hugging Face pour compter les tokens (ex. Qwen/Qwen2.5-1.5B)")
+    args = parser.parse_args()
+
+    tokenizer = None
+    if args.tokenizer:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+
+    for path in preprocess_file(args.input_md, args.output_dir, not args.no_split, not args.no_title, tokenizer):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
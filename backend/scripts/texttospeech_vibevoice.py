@@ -5,9 +5,11 @@ Synthèse vocale TTS avec VibeVoice. Lit un fichier markdown/texte et génère u
 import argparse
 import os
 import sys
+import tempfile
 import re
 import time
 import traceback
+import wave
 from typing import List, Tuple
 
 # Add VibeVoice to path
@@ -15,7 +17,10 @@ vibevoice_path = os.path.normpath(os.path.join(os.path.dirname(__file__), '..',
 if os.path.isdir(vibevoice_path) and vibevoice_path not in sys.path:
     sys.path.insert(0, vibevoice_path)
 
+import numpy as np
 import torch
+import model_registry
+from disk_cache import DiskCache, hash_file, hash_key
 from vibevoice.modular.modeling_vibevoice_inference import VibeVoiceForConditionalGenerationInference
 from vibevoice.processor.vibevoice_processor import VibeVoiceProcessor
 
@@ -153,7 +158,137 @@ def format_text_for_vibevoice(text: str) -> str:
     return formatted_text
 
 
-def synthesize_tts(input_md_path: str, output_wav_path: str, speaker_name: str = "Alice"):
+DEFAULT_MODEL_PATH = "microsoft/VibeVoice-1.5B"
+DEFAULT_CFG_SCALE = 1.3
+DEFAULT_DDPM_STEPS = 20
+TTS_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Profils d'inférence : compromis vitesse / qualité pour les workers CPU.
+# threads=None utilise OMP_NUM_THREADS ou tous les cœurs ; quantize = quantification dynamique int8 des nn.Linear (CPU, float32).
+INFERENCE_PROFILES = {
+    "fast": {"dtype": "float32", "threads": None, "ddpm_steps": 10, "cfg_scale": 1.3, "quantize": True},
+    "balanced": {"dtype": "float32", "threads": None, "ddpm_steps": 15, "cfg_scale": 1.3, "quantize": False},
+    "quality": {"dtype": "bfloat16", "threads": None, "ddpm_steps": DEFAULT_DDPM_STEPS,
+                "cfg_scale": DEFAULT_CFG_SCALE, "quantize": False},
+}
+DEFAULT_PROFILE = "quality"
+
+
+def get_profile(profile=DEFAULT_PROFILE) -> dict:
+    """Settings of a profile name, or of a dict of overrides on top of the default profile"""
+    if isinstance(profile, dict):
+        return {**INFERENCE_PROFILES[DEFAULT_PROFILE], **profile}
+    if profile not in INFERENCE_PROFILES:
+        raise ValueError(f"Unknown inference profile '{profile}' (choose from {', '.join(INFERENCE_PROFILES)})")
+    return dict(INFERENCE_PROFILES[profile])
+
+
+def set_torch_threads(threads=None):
+    # Sans valeur explicite : OMP_NUM_THREADS (workers de job_scheduler.py), sinon tous les cœurs
+    threads = threads or int(os.environ.get("OMP_NUM_THREADS") or 0) or os.cpu_count() or 1
+    if torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+        print(f"Using {threads} intra-op threads")
+
+
+def load_tts_model(model_path: str = DEFAULT_MODEL_PATH, dtype: str = "bfloat16", quantize: bool = False):
+    """Load (processor, model) once per process and per dtype/quantization through the model registry"""
+    torch_dtype = getattr(torch, dtype)
+
+    def loader():
+        # Load processor
+        print(f"Loading processor & model from {model_path}")
+        processor = VibeVoiceProcessor.from_pretrained(model_path)
+
+        # Load model with fallback mechanism
+        device = "cpu"  # Force CPU usage for this script
+    
+        # Check if CUDA is available
+        if torch.cuda.is_available():
+            device = "cuda"
+            print(f"Using device: {device}")
+        else:
+            print(f"CUDA not available, using device: {device}")
+    
+        try:
+            # Try to load with flash attention first
+            model = VibeVoiceForConditionalGenerationInference.from_pretrained(
+                model_path,
+                torch_dtype=torch_dtype,
+                device_map=device,
+                attn_implementation='flash_attention_2'  # flash_attention_2 is recommended
+            )
+        except Exception as e:
+            print(f"[ERROR] : {type(e).__name__}: {e}")
+            print("Error loading the model with flash_attention_2. Trying to use SDPA. However, note that only flash_attention_2 has been fully tested, and using SDPA may result in lower audio quality.")
+            try:
+                # Try SDPA next
+                model = VibeVoiceForConditionalGenerationInference.from_pretrained(
+                    model_path,
+                    torch_dtype=torch_dtype,
+                    device_map=device,
+                    attn_implementation='sdpa'
+                )
+            except Exception as e2:
+                print(f"[ERROR] : {type(e2).__name__}: {e2}")
+                print("Error loading the model with SDPA. Falling back to default attention implementation.")
+                # Fall back to default attention (usually 'eager')
+                model = VibeVoiceForConditionalGenerationInference.from_pretrained(
+                    model_path,
+                    torch_dtype=torch_dtype,
+                    device_map=device,
+                )
+
+        model.eval()
+
+        if quantize:
+            if device == "cpu" and torch_dtype == torch.float32:
+                print("Applying dynamic int8 quantization to linear layers")
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+            else:
+                print(f"Dynamic quantization needs a float32 model on CPU, skipping ({dtype} on {device})")
+
+        if hasattr(model.model, 'language_model'):
+           print(f"Language model attention: {model.model.language_model.config._attn_implementation}")
+
+        return processor, model
+
+    return model_registry.get_model(("vibevoice", model_path, dtype, quantize), loader)
+
+
+def load_profile_model(profile=DEFAULT_PROFILE):
+    """Apply a profile (threads, dtype, quantization, DDPM steps); returns (processor, model, settings)"""
+    settings = get_profile(profile)
+    set_torch_threads(settings["threads"])
+    processor, model = load_tts_model(DEFAULT_MODEL_PATH, settings["dtype"], settings["quantize"])
+    model.set_ddpm_inference_steps(num_steps=settings["ddpm_steps"])
+    return processor, model, settings
+
+
+_voice_samples = {}
+
+
+def get_voice_mapper() -> VoiceMapper:
+    """VoiceMapper shared by the process (the voices directory is scanned once)"""
+    return model_registry.get_model(("voice_mapper",), VoiceMapper)
+
+
+def load_voice_sample(voice_path: str) -> np.ndarray:
+    """Reference voice decoded to mono float32 at SAMPLE_RATE, cached per file and modification time.
+
+    The processor takes voice samples as paths or arrays and encodes the voice
+    prompt inside `model.generate`: the decoded waveform is the part it lets us reuse.
+    """
+    key = (os.path.abspath(voice_path), os.path.getmtime(voice_path))
+    if key not in _voice_samples:
+        import librosa
+        wav, _ = librosa.load(voice_path, sr=SAMPLE_RATE, mono=True)
+        _voice_samples[key] = wav.astype(np.float32)
+    return _voice_samples[key]
+
+
+def synthesize_tts(input_md_path: str, output_wav_path: str, speaker_name: str = "Alice",
+                   profile=DEFAULT_PROFILE):
     # Read text
     with open(input_md_path, 'r', encoding='utf-8') as f:
         text = f.read()
@@ -162,80 +297,32 @@ def synthesize_tts(input_md_path: str, output_wav_path: str, speaker_name: str =
     formatted_text = format_text_for_vibevoice(text)
     
     # Initialize voice mapper
-    voice_mapper = VoiceMapper()
+    voice_mapper = get_voice_mapper()
     
     # Get voice path for the specified speaker
     voice_path = voice_mapper.get_voice_path(speaker_name)
     print(f"Using voice: {os.path.basename(voice_path)} for speaker: {speaker_name}")
     
-    # Model path
-    model_path = "microsoft/VibeVoice-1.5B"
-    
-    # Load processor
-    print(f"Loading processor & model from {model_path}")
-    processor = VibeVoiceProcessor.from_pretrained(model_path)
-
-    # Load model with fallback mechanism
-    device = "cpu"  # Force CPU usage for this script
-    
-    # Check if CUDA is available
-    if torch.cuda.is_available():
-        device = "cuda"
-        print(f"Using device: {device}")
-    else:
-        print(f"CUDA not available, using device: {device}")
-    
-    try:
-        # Try to load with flash attention first
-        model = VibeVoiceForConditionalGenerationInference.from_pretrained(
-            model_path,
-            torch_dtype=torch.bfloat16,
-            device_map=device,
-            attn_implementation='flash_attention_2'  # flash_attention_2 is recommended
-        )
-    except Exception as e:
-        print(f"[ERROR] : {type(e).__name__}: {e}")
-        print("Error loading the model with flash_attention_2. Trying to use SDPA. However, note that only flash_attention_2 has been fully tested, and using SDPA may result in lower audio quality.")
-        try:
-            # Try SDPA next
-            model = VibeVoiceForConditionalGenerationInference.from_pretrained(
-                model_path,
-                torch_dtype=torch.bfloat16,
-                device_map=device,
-                attn_implementation='sdpa'
-            )
-        except Exception as e2:
-            print(f"[ERROR] : {type(e2).__name__}: {e2}")
-            print("Error loading the model with SDPA. Falling back to default attention implementation.")
-            # Fall back to default attention (usually 'eager')
-            model = VibeVoiceForConditionalGenerationInference.from_pretrained(
-                model_path,
-                torch_dtype=torch.bfloat16,
-                device_map=device,
-            )
+    # Load processor & model (reused if already loaded in this process)
+    processor, model, settings = load_profile_model(profile)
 
-    model.eval()
-    model.set_ddpm_inference_steps(num_steps=20)  # Use 20 steps for better quality
-
-    if hasattr(model.model, 'language_model'):
-       print(f"Language model attention: {model.model.language_model.config._attn_implementation}")
-       
     # Prepare inputs for the model
+    voice_sample = load_voice_sample(voice_path)
     inputs = processor(
         text=[formatted_text],  # Wrap in list for batch processing
-        voice_samples=[[voice_path]],  # Wrap in list for batch processing
+        voice_samples=[[voice_sample]],  # Wrap in list for batch processing
         padding=True,
         return_tensors="pt",
         return_attention_mask=True,
     )
-    print(f"Starting generation with cfg_scale: 1.3")
+    print(f"Starting generation with cfg_scale: {settings['cfg_scale']}, {settings['ddpm_steps']} DDPM steps")
 
     # Generate audio
     start_time = time.time()
     outputs = model.generate(
         **inputs,
         max_new_tokens=None,
-        cfg_scale=1.3,
+        cfg_scale=settings["cfg_scale"],
         tokenizer=processor.tokenizer,
         generation_config={'do_sample': False},
         verbose=True,
@@ -292,6 +379,465 @@ def synthesize_tts(input_md_path: str, output_wav_path: str, speaker_name: str =
     
     print("="*50)
 
+    return {
+        "output_wav": output_wav_path,
+        "audio_duration": audio_duration,
+        "generation_time": generation_time,
+        "rtf": rtf,
+    }
+
+
+SAMPLE_RATE = 24000  # Fréquence de sortie de VibeVoice
+SPEAKER_TAG = re.compile(r'^\s*Speaker\s*\d+\s*:\s*', re.IGNORECASE)
+SENTENCE_END = re.compile(r'(?<=[.!?…])["”\')\]]*\s+')
+
+
+def split_text_chunks(text: str, max_chars: int = 600) -> List[str]:
+    """Split a story into chunks of whole sentences, never crossing a paragraph.
+
+    Sentences longer than `max_chars` are kept whole rather than cut mid-word.
+    """
+    chunks = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = SPEAKER_TAG.sub('', ' '.join(paragraph.split()))
+        if not paragraph:
+            continue
+        current = ""
+        for sentence in SENTENCE_END.split(paragraph):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+def speech_to_numpy(speech) -> np.ndarray:
+    """Model speech output (torch tensor) as a flat float32 array"""
+    if isinstance(speech, torch.Tensor):
+        speech = speech.detach().float().cpu().numpy()
+    return np.asarray(speech, dtype=np.float32).reshape(-1)
+
+
+class StreamingWavWriter:
+    """16-bit mono WAV written chunk by chunk with a crossfade at each boundary.
+
+    The header is patched after every write, so the file on disk is a valid
+    WAV containing everything synthesized so far.
+    """
+
+    def __init__(self, path: str, sample_rate: int = SAMPLE_RATE, crossfade_ms: float = 30.0):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.sample_rate = sample_rate
+        self.crossfade = int(sample_rate * crossfade_ms / 1000)
+        self.frames_written = 0
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._file = open(path, 'wb')
+        self._wav = wave.open(self._file, 'wb')
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def _write(self, audio: np.ndarray):
+        if audio.size == 0:
+            return
+        pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2')
+        self._wav.writeframes(pcm.tobytes())
+        self._file.flush()
+        self.frames_written += audio.size
+
+    def append(self, audio: np.ndarray):
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        n = min(self.crossfade, self._tail.size, audio.size)
+        if n > 0:
+            fade = np.linspace(0.0, 1.0, n, dtype=np.float32)
+            head = self._tail[-n:] * (1.0 - fade) + audio[:n] * fade
+            self._write(np.concatenate([self._tail[:-n], head]))
+            audio = audio[n:]
+        else:
+            self._write(self._tail)
+        # Garder la fin du morceau pour le fondu avec le suivant
+        keep = min(self.crossfade, audio.size)
+        self._write(audio[:audio.size - keep])
+        self._tail = audio[audio.size - keep:]
+
+    @property
+    def duration(self) -> float:
+        return self.frames_written / self.sample_rate
+
+    def close(self):
+        self._write(self._tail)
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._wav.close()
+        self._file.close()
+
+
+def generate_batch(processor, model, scripts: List[str], voice_samples: List[list],
+                   cfg_scale: float = DEFAULT_CFG_SCALE):
+    """Run one padded `model.generate` over several formatted scripts.
+
+    `voice_samples` holds, for each script, the list of voice samples of its
+    speakers. Returns (list of float32 audio arrays, generation_time).
+    """
+    inputs = processor(
+        text=scripts,
+        voice_samples=voice_samples,
+        padding=True,
+        return_tensors="pt",
+        return_attention_mask=True,
+    )
+    start_time = time.time()
+    outputs = model.generate(
+        **inputs,
+        max_new_tokens=None,
+        cfg_scale=cfg_scale,
+        tokenizer=processor.tokenizer,
+        generation_config={'do_sample': False},
+        verbose=False,
+    )
+    generation_time = time.time() - start_time
+    audios = []
+    for i in range(len(scripts)):
+        speech = outputs.speech_outputs[i] if outputs.speech_outputs and i < len(outputs.speech_outputs) else None
+        if speech is None:
+            raise RuntimeError(f"No audio output generated for batch item {i + 1}")
+        audios.append(speech_to_numpy(speech))
+    return audios, generation_time
+
+
+def iter_tts_chunks(chunks: List[str], voice_path: str, profile=DEFAULT_PROFILE):
+    """Generate each chunk in turn, yielding (index, audio float32 array, generation_time)"""
+    processor, model, settings = load_profile_model(profile)
+    voice_sample = load_voice_sample(voice_path)
+
+    for index, chunk in enumerate(chunks):
+        audios, generation_time = generate_batch(
+            processor, model, [format_text_for_vibevoice(chunk)], [[voice_sample]], settings["cfg_scale"]
+        )
+        yield index, audios[0], generation_time
+
+
+def plan_batches(lengths: List[int], batch_size: int) -> List[List[int]]:
+    """Group item indices of similar token length to limit padding waste"""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def write_wav(path: str, audio: np.ndarray, sample_rate: int = SAMPLE_RATE):
+    writer = StreamingWavWriter(path, sample_rate, crossfade_ms=0)
+    writer.append(audio)
+    writer.close()
+
+
+def synthesize_batch(input_paths: List[str], output_dir: str, speaker_name: str = "Alice",
+                     batch_size: int = 4, profile=DEFAULT_PROFILE):
+    """Synthesize many story files with batched generation.
+
+    Inputs are sorted by prompt token length and generated `batch_size` at a
+    time in one padded `model.generate` call. Each item gets its own WAV in
+    `output_dir`; per-item and per-batch RTF are reported.
+    """
+    processor, model, settings = load_profile_model(profile)
+    voice_path = get_voice_mapper().get_voice_path(speaker_name)
+    voice_sample = load_voice_sample(voice_path)
+    print(f"Using voice: {os.path.basename(voice_path)} for speaker: {speaker_name}")
+
+    scripts = []
+    for path in input_paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            scripts.append(format_text_for_vibevoice(f.read()))
+    lengths = [len(processor.tokenizer.encode(script)) for script in scripts]
+
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    for batch_number, batch in enumerate(plan_batches(lengths, batch_size), 1):
+        batch_lengths = [lengths[i] for i in batch]
+        padding = 1 - sum(batch_lengths) / (max(batch_lengths) * len(batch))
+        print(f"Batch {batch_number}: {len(batch)} items, {min(batch_lengths)}-{max(batch_lengths)} tokens "
+              f"({padding:.0%} padding)")
+        audios, generation_time = generate_batch(
+            processor, model, [scripts[i] for i in batch], [[voice_sample] for _ in batch], settings["cfg_scale"]
+        )
+        batch_audio = sum(audio.size for audio in audios) / SAMPLE_RATE
+        for i, audio in zip(batch, audios):
+            output_wav = os.path.join(output_dir, os.path.splitext(os.path.basename(input_paths[i]))[0] + '.wav')
+            write_wav(output_wav, audio)
+            duration = audio.size / SAMPLE_RATE
+            rtf = generation_time / duration if duration > 0 else float('inf')
+            results.append({"input": input_paths[i], "output_wav": output_wav, "audio_duration": duration,
+                            "tokens": lengths[i], "rtf": rtf})
+            print(f"  {os.path.basename(input_paths[i])}: {duration:.2f}s audio, RTF {rtf:.2f}x -> {output_wav}")
+        print(f"  Batch time: {generation_time:.2f}s for {batch_audio:.2f}s audio "
+              f"(throughput RTF {generation_time / batch_audio if batch_audio > 0 else float('inf'):.2f}x)")
+    return results
+
+
+def synthesize_tts_streaming(input_md_path: str, output_wav_path: str, speaker_name: str = "Alice",
+                             max_chars: int = 600, crossfade_ms: float = 30.0, on_chunk=None,
+                             profile=DEFAULT_PROFILE):
+    """Synthesize a story chunk by chunk, appending to the output WAV as it goes.
+
+    Long stories are generated in short chunks joined with a crossfade; the
+    WAV header is rewritten after each chunk, so an interrupted run leaves a
+    playable prefix. `on_chunk(index, total, seconds)` is called after each
+    chunk is written.
+    """
+    with open(input_md_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    chunks = split_text_chunks(text, max_chars)
+    if not chunks:
+        raise RuntimeError(f"No text to synthesize in {input_md_path}")
+
+    voice_path = get_voice_mapper().get_voice_path(speaker_name)
+    print(f"Using voice: {os.path.basename(voice_path)} for speaker: {speaker_name}")
+    print(f"Streaming {len(chunks)} chunks (max {max_chars} chars) to {output_wav_path}")
+
+    writer = StreamingWavWriter(output_wav_path, crossfade_ms=crossfade_ms)
+    total_generation = 0.0
+    try:
+        for index, audio, generation_time in iter_tts_chunks(chunks, voice_path, profile):
+            writer.append(audio)
+            total_generation += generation_time
+            chunk_duration = audio.size / SAMPLE_RATE
+            print(f"Chunk {index + 1}/{len(chunks)}: {chunk_duration:.2f}s audio in {generation_time:.2f}s "
+                  f"(RTF {generation_time / chunk_duration if chunk_duration > 0 else float('inf'):.2f}x)")
+            if on_chunk:
+                on_chunk(index, len(chunks), writer.duration)
+    finally:
+        writer.close()
+
+    audio_duration = writer.duration
+    rtf = total_generation / audio_duration if audio_duration > 0 else float('inf')
+    print(f"Saved output to {output_wav_path}")
+    print(f"Audio duration: {audio_duration:.2f} seconds, generation time: {total_generation:.2f} seconds, "
+          f"RTF: {rtf:.2f}x")
+    return {
+        "output_wav": output_wav_path,
+        "audio_duration": audio_duration,
+        "generation_time": total_generation,
+        "rtf": rtf,
+    }
+
+
+_tts_cache = DiskCache("tts", TTS_CACHE_MAX_BYTES, suffix='.pcm')
+_voice_hashes = {}
+
+
+def voice_hash(voice_path: str) -> str:
+    key = (os.path.abspath(voice_path), os.path.getmtime(voice_path))
+    if key not in _voice_hashes:
+        _voice_hashes[key] = hash_file(voice_path)
+    return _voice_hashes[key]
+
+
+def sentence_cache_key(sentence: str, voice_path: str, settings: dict, model_path: str = DEFAULT_MODEL_PATH) -> str:
+    """Cache key of one synthesized sentence (normalized text, voice, model and inference settings)"""
+    normalized = ' '.join(sentence.split())
+    return hash_key(normalized, voice_hash(voice_path), model_path, settings["dtype"], settings["quantize"],
+                    settings["cfg_scale"], settings["ddpm_steps"], SAMPLE_RATE)
+
+
+def synthesize_tts_cached(input_md_path: str, output_wav_path: str, speaker_name: str = "Alice",
+                          batch_size: int = 4, profile=DEFAULT_PROFILE, crossfade_ms: float = 30.0):
+    """Synthesize a story sentence by sentence through the on-disk audio cache.
+
+    Sentences already synthesized with the same voice, model and settings are
+    reused, so editing one paragraph only regenerates the changed sentences.
+    Missing sentences are generated in batches; the model is only loaded if
+    something is missing.
+    """
+    with open(input_md_path, 'r', encoding='utf-8') as f:
+        sentences = split_text_chunks(f.read(), max_chars=0)
+    if not sentences:
+        raise RuntimeError(f"No text to synthesize in {input_md_path}")
+
+    voice_path = get_voice_mapper().get_voice_path(speaker_name)
+    print(f"Using voice: {os.path.basename(voice_path)} for speaker: {speaker_name}")
+    settings = get_profile(profile)
+    keys = [sentence_cache_key(s, voice_path, settings) for s in sentences]
+
+    audios = {}
+    for i, key in enumerate(keys):
+        data = _tts_cache.get_bytes(key)
+        if data is not None:
+            audios[i] = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32767
+    missing = [i for i in range(len(sentences)) if i not in audios]
+    print(f"{len(sentences) - len(missing)}/{len(sentences)} sentences found in cache")
+
+    generation_time = 0.0
+    if missing:
+        processor, model, _ = load_profile_model(settings)
+        voice_sample = load_voice_sample(voice_path)
+        scripts = [format_text_for_vibevoice(sentences[i]) for i in missing]
+        lengths = [len(processor.tokenizer.encode(script)) for script in scripts]
+        for batch in plan_batches(lengths, batch_size):
+            batch_audios, batch_time = generate_batch(
+                processor, model, [scripts[j] for j in batch], [[voice_sample] for _ in batch], settings["cfg_scale"]
+            )
+            generation_time += batch_time
+            for j, audio in zip(batch, batch_audios):
+                i = missing[j]
+                audios[i] = audio
+                pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2')
+                _tts_cache.put_bytes(keys[i], pcm.tobytes())
+            print(f"Generated {len(batch)} sentences in {batch_time:.2f}s")
+
+    writer = StreamingWavWriter(output_wav_path, crossfade_ms=crossfade_ms)
+    try:
+        for i in range(len(sentences)):
+            writer.append(audios[i])
+    finally:
+        writer.close()
+
+    audio_duration = writer.duration
+    print(f"Saved output to {output_wav_path} ({audio_duration:.2f}s, "
+          f"{len(missing)} sentences generated in {generation_time:.2f}s)")
+    return {
+        "output_wav": output_wav_path,
+        "audio_duration": audio_duration,
+        "generation_time": generation_time,
+        "rtf": generation_time / audio_duration if audio_duration > 0 else float('inf'),
+        "sentences_cached": len(sentences) - len(missing),
+        "sentences_generated": len(missing),
+    }
+
+
+def assign_voices(speaker_numbers: List[str], speaker_names: List[str]) -> dict:
+    """Map each script speaker number to a voice name, in order of first appearance.
+
+    Names are reused in turn when the script has more speakers than names.
+    """
+    numbers = list(dict.fromkeys(speaker_numbers))
+    if len(numbers) > len(speaker_names):
+        print(f"Warning: {len(numbers)} speakers in script but only {len(speaker_names)} voices given, reusing voices")
+    return {number: speaker_names[i % len(speaker_names)] for i, number in enumerate(numbers)}
+
+
+def schedule_segments(voice_paths: List[str], lengths: List[int], batch_size: int) -> List[List[int]]:
+    """Batches of segment indices sharing one voice, grouped by token length.
+
+    All items of a batch use the same (cached) voice prompt, so the prompts
+    are identical in size and only the text is padded.
+    """
+    by_voice = {}
+    for i, voice_path in enumerate(voice_paths):
+        by_voice.setdefault(voice_path, []).append(i)
+    batches = []
+    for indices in by_voice.values():
+        for batch in plan_batches([lengths[i] for i in indices], batch_size):
+            batches.append([indices[j] for j in batch])
+    return batches
+
+
+def synthesize_multi_speaker(input_path: str, output_wav_path: str, speaker_names: List[str],
+                             batch_size: int = 4, profile=DEFAULT_PROFILE, crossfade_ms: float = 30.0,
+                             turn_pause_ms: float = 250.0):
+    """Synthesize a `Speaker N:` script with one voice per speaker.
+
+    Segments come from `parse_txt_script`; speaker numbers are mapped to
+    `speaker_names` through VoiceMapper. Segments of the same voice are
+    generated together in batches, then written back in script order with a
+    short pause at each change of speaker.
+    """
+    with open(input_path, 'r', encoding='utf-8') as f:
+        scripts, speaker_numbers = parse_txt_script(f.read())
+    if not scripts:
+        raise ValueError(f"No 'Speaker N:' lines found in {input_path}")
+
+    voices = assign_voices(speaker_numbers, speaker_names)
+    voice_mapper = get_voice_mapper()
+    voice_paths = [voice_mapper.get_voice_path(voices[number]) for number in speaker_numbers]
+    for number, name in voices.items():
+        print(f"Speaker {number}: {name} ({os.path.basename(voice_mapper.get_voice_path(name))})")
+
+    processor, model, settings = load_profile_model(profile)
+    samples = {path: load_voice_sample(path) for path in set(voice_paths)}
+    # Chaque segment est généré seul avec sa voix : il devient le locuteur 1 du modèle
+    segments = [format_text_for_vibevoice(SPEAKER_TAG.sub('', script)) for script in scripts]
+    lengths = [len(processor.tokenizer.encode(segment)) for segment in segments]
+
+    audios = [None] * len(segments)
+    generation_time = 0.0
+    for batch in schedule_segments(voice_paths, lengths, batch_size):
+        batch_audios, batch_time = generate_batch(
+            processor, model, [segments[i] for i in batch], [[samples[voice_paths[i]]] for i in batch],
+            settings["cfg_scale"]
+        )
+        generation_time += batch_time
+        for i, audio in zip(batch, batch_audios):
+            audios[i] = audio
+        print(f"Generated {len(batch)} segments for {os.path.basename(voice_paths[batch[0]])} in {batch_time:.2f}s")
+
+    pause = np.zeros(int(SAMPLE_RATE * turn_pause_ms / 1000), dtype=np.float32)
+    writer = StreamingWavWriter(output_wav_path, crossfade_ms=crossfade_ms)
+    try:
+        for i, audio in enumerate(audios):
+            if i and speaker_numbers[i] != speaker_numbers[i - 1] and pause.size:
+                writer.append(pause)
+            writer.append(audio)
+    finally:
+        writer.close()
+
+    audio_duration = writer.duration
+    rtf = generation_time / audio_duration if audio_duration > 0 else float('inf')
+    print(f"Saved output to {output_wav_path} ({len(segments)} segments, {len(voices)} speakers, "
+          f"{audio_duration:.2f}s audio, RTF {rtf:.2f}x)")
+    return {
+        "output_wav": output_wav_path,
+        "audio_duration": audio_duration,
+        "generation_time": generation_time,
+        "rtf": rtf,
+        "speakers": voices,
+    }
+
+
+BENCHMARK_TEXT = (
+    "I never thought a lost umbrella would change my life. It was raining hard that Tuesday, "
+    "and the bus was late again. A stranger offered to share hers, and we talked all the way downtown. "
+    "Three years later, we still argue about who was actually holding it."
+)
+
+
+def benchmark_profiles(profiles=None, speaker_name: str = "Alice", text: str = BENCHMARK_TEXT, threads=None):
+    """Synthesize the same text with each profile and report RTF per profile.
+
+    Each profile's model is released after its run so only one copy stays in
+    memory. `threads` overrides the thread count of every profile.
+    Returns {profile: result dict}.
+    """
+    profiles = profiles or list(INFERENCE_PROFILES)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_md = os.path.join(tmp_dir, 'benchmark.md')
+        with open(input_md, 'w', encoding='utf-8') as f:
+            f.write(text)
+        for name in profiles:
+            settings = get_profile(name)
+            if threads:
+                settings["threads"] = threads
+            print(f"=== Benchmark profile '{name}' ===")
+            results[name] = synthesize_tts(input_md, os.path.join(tmp_dir, f'{name}.wav'), speaker_name, settings)
+            results[name]["settings"] = settings
+            model_registry.release(("vibevoice", DEFAULT_MODEL_PATH, settings["dtype"], settings["quantize"]))
+
+    print("\n" + "=" * 72)
+    print("INFERENCE PROFILE BENCHMARK")
+    print("=" * 72)
+    print(f"{'profile':10} {'dtype':9} {'threads':>7} {'steps':>5} {'int8':>5} {'gen (s)':>8} {'audio (s)':>9} {'RTF':>6}")
+    for name, result in results.items():
+        settings = result["settings"]
+        print(f"{name:10} {settings['dtype']:9} {settings['threads'] or os.cpu_count():>7} "
+              f"{settings['ddpm_steps']:>5} {'yes' if settings['quantize'] else 'no':>5} "
+              f"{result['generation_time']:>8.2f} {result['audio_duration']:>9.2f} {result['rtf']:>6.2f}")
+    print("=" * 72)
+    return results
+
 
 def main():
     parser = argparse.ArgumentParser(description="Générer un WAV TTS depuis un fichier markdown avec VibeVoice")
@@ -300,9 +846,45 @@ def main():
     parser.add_argument("output_wav", help="Fichier WAV de sortie", 
                         default=os.path.normpath(os.path.join(os.path.dirname(__file__), '../../output/audio/story_complet.wav')), nargs='?')
     parser.add_argument("--speaker", help="Nom du locuteur", default="Alice")
+    parser.add_argument("--speakers", nargs="+", default=None, metavar="NAME",
+                        help="Script multi-locuteurs 'Speaker N:' : une voix par locuteur, dans l'ordre d'apparition")
+    parser.add_argument("--profile", choices=list(INFERENCE_PROFILES), default=DEFAULT_PROFILE,
+                        help=f"Profil d'inférence (default: {DEFAULT_PROFILE})")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Nombre de threads torch (défaut : celui du profil, tous les cœurs)")
+    parser.add_argument("--benchmark", nargs="*", choices=list(INFERENCE_PROFILES), default=None, metavar="PROFILE",
+                        help="Mesurer le RTF de chaque profil sur un texte fixe (tous les profils si aucun n'est donné)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Synthèse par morceaux écrits au fur et à mesure dans le WAV")
+    parser.add_argument("--chunk-chars", type=int, default=600,
+                        help="Taille maximale d'un morceau en mode --stream (default: 600)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Synthèse phrase par phrase avec cache audio (seules les phrases modifiées sont régénérées)")
+    parser.add_argument("--batch", nargs="+", default=None, metavar="MD",
+                        help="Synthétiser plusieurs fichiers en lots (un WAV par fichier dans --output-dir)")
+    parser.add_argument("--batch-size", type=int, default=4, help="Nombre d'histoires par génération (default: 4)")
+    parser.add_argument("--output-dir",
+                        default=os.path.normpath(os.path.join(os.path.dirname(__file__), '../../output/audio')),
+                        help="Dossier de sortie du mode --batch")
     args = parser.parse_args()
 
-    synthesize_tts(args.input_md, args.output_wav, args.speaker)
+    profile = get_profile(args.profile)
+    if args.threads:
+        profile["threads"] = args.threads
+
+    if args.benchmark is not None:
+        benchmark_profiles(args.benchmark, args.speaker, threads=args.threads)
+    elif args.speakers:
+        synthesize_multi_speaker(args.input_md, args.output_wav, args.speakers, args.batch_size, profile)
+    elif args.batch:
+        synthesize_batch(args.batch, args.output_dir, args.speaker, args.batch_size, profile)
+    elif args.cache:
+        synthesize_tts_cached(args.input_md, args.output_wav, args.speaker, args.batch_size, profile)
+    elif args.stream:
+        synthesize_tts_streaming(args.input_md, args.output_wav, args.speaker, max_chars=args.chunk_chars,
+                                 profile=profile)
+    else:
+        synthesize_tts(args.input_md, args.output_wav, args.speaker, profile)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Worker de transcription résident : garde le modèle whisper_timestamped en mémoire
+et renvoie les horodatages mot à mot via un socket Unix (voir local_service.py).
+
+Requête : {"audio_path": "...", "model": "base", "language": "en"}
+      ou  {"pcm": "<base64 float32 mono 16 kHz>", ...}
+Réponse : {"ok": true, "words": [{"text", "start", "end"}, ...]}
+"""
+import argparse
+import base64
+import os
+
+import local_service
+import model_registry
+
+SERVICE_NAME = "whisper"
+DEFAULT_MODEL = "base"
+DEFAULT_LANGUAGE = "en"
+
+
+def load_whisper_model(model_name=DEFAULT_MODEL):
+    """Load a whisper_timestamped model once per process"""
+    def loader():
+        import whisper_timestamped as whisper
+        print(f"Loading whisper model '{model_name}'...")
+        return whisper.load_model(model_name)
+    return model_registry.get_model(("whisper", model_name), loader)
+
+
+def words_from_result(result):
+    """Flatten a whisper_timestamped result into a list of word timings"""
+    words = []
+    for segment in result["segments"]:
+        for word in segment["words"]:
+            words.append({
+                "text": word["text"].strip(),
+                "start": word["start"],
+                "end": word["end"]
+            })
+    return words
+
+
+def transcribe_audio(audio, model_name=DEFAULT_MODEL, language=DEFAULT_LANGUAGE):
+    """Transcribe an audio path or a float32 16 kHz array in this process"""
+    import whisper_timestamped as whisper
+    if isinstance(audio, str):
+        audio = whisper.load_audio(audio)
+    model = load_whisper_model(model_name)
+    result = whisper.transcribe(model, audio, language=language)
+    return words_from_result(result)
+
+
+def handle_request(request):
+    model_name = request.get("model", DEFAULT_MODEL)
+    language = request.get("language", DEFAULT_LANGUAGE)
+    if "pcm" in request:
+        import numpy as np
+        audio = np.frombuffer(base64.b64decode(request["pcm"]), dtype=np.float32)
+    elif "audio_path" in request:
+        audio = request["audio_path"]
+        if not os.path.exists(audio):
+            raise FileNotFoundError(audio)
+    else:
+        raise ValueError("request needs 'audio_path' or 'pcm'")
+    return {"words": transcribe_audio(audio, model_name, language)}
+
+
+def request_transcription(audio, model_name=DEFAULT_MODEL, language=DEFAULT_LANGUAGE, socket_path=None):
+    """Ask a running worker for word timings.
+
+    `audio` is a file path or a float32 16 kHz NumPy array. Returns None when
+    no worker is listening.
+    """
+    request = {"model": model_name, "language": language}
+    if isinstance(audio, str):
+        request["audio_path"] = os.path.abspath(audio)
+    else:
+        request["pcm"] = base64.b64encode(audio.astype("float32").tobytes()).decode("ascii")
+    response = local_service.call(socket_path or local_service.default_socket_path(SERVICE_NAME), request)
+    if response is None:
+        return None
+    return response["words"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur de transcription Whisper résident")
+    parser.add_argument("--socket", default=local_service.default_socket_path(SERVICE_NAME),
+                        help="Chemin du socket Unix")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Modèle Whisper préchargé (default: base)")
+    args = parser.parse_args()
+
+    load_whisper_model(args.model)
+    local_service.serve(args.socket, handle_request)
+
+
+if __name__ == "__main__":
+    main()
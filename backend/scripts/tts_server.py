@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Worker TTS résident : charge VibeVoice une seule fois, garde en cache les échantillons
+de voix de référence et sert les demandes de synthèse via un socket Unix
+(voir local_service.py).
+
+Requête : {"input_md": "...", "output_wav": "...", "speaker": "Alice", "cached": false, "profile": "quality"}
+          (ou "speakers": ["Alice", "Frank"] pour un script multi-locuteurs "Speaker N:")
+Réponse : {"ok": true, "output_wav": "...", "audio_duration": ..., "generation_time": ..., "rtf": ...}
+"""
+import argparse
+import os
+
+import local_service
+
+SERVICE_NAME = "tts"
+
+
+def handle_request(request):
+    from texttospeech_vibevoice import DEFAULT_PROFILE, synthesize_multi_speaker, synthesize_tts, synthesize_tts_cached
+    input_md = request["input_md"]
+    if not os.path.exists(input_md):
+        raise FileNotFoundError(input_md)
+    if request.get("speakers"):
+        return synthesize_multi_speaker(input_md, request["output_wav"], request["speakers"],
+                                        profile=request.get("profile") or DEFAULT_PROFILE)
+    synthesize = synthesize_tts_cached if request.get("cached") else synthesize_tts
+    return synthesize(input_md, request["output_wav"], request.get("speaker", "Alice"),
+                      profile=request.get("profile") or DEFAULT_PROFILE)
+
+
+def request_synthesis(input_md, output_wav, speaker="Alice", socket_path=None, cached=False, profile=None,
+                      speakers=None):
+    """Ask a running TTS worker to synthesize a file; None when no worker is listening.
+
+    `speakers` (list of voice names) synthesizes a "Speaker N:" script with one voice per speaker.
+    """
+    request = {
+        "input_md": os.path.abspath(input_md),
+        "output_wav": os.path.abspath(output_wav),
+        "speaker": speaker,
+        "cached": cached,
+        "profile": profile,
+    }
+    if speakers:
+        request["speakers"] = list(speakers)
+    return local_service.call(socket_path or local_service.default_socket_path(SERVICE_NAME), request)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur TTS VibeVoice résident")
+    parser.add_argument("--socket", default=local_service.default_socket_path(SERVICE_NAME),
+                        help="Chemin du socket Unix")
+    parser.add_argument("--speaker", action="append", default=[],
+                        help="Voix à précharger (option répétable)")
+    parser.add_argument("--profile", default="quality", help="Profil d'inférence préchargé (fast, balanced, quality)")
+    args = parser.parse_args()
+
+    from texttospeech_vibevoice import get_voice_mapper, load_profile_model, load_voice_sample
+    load_profile_model(args.profile)
+    voice_mapper = get_voice_mapper()
+    for speaker in args.speaker:
+        load_voice_sample(voice_mapper.get_voice_path(speaker))
+
+    local_service.serve(args.socket, handle_request)
+
+
+if __name__ == "__main__":
+    main()
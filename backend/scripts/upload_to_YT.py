@@ -2,14 +2,19 @@
 
 import http.client
 import httplib2
+import json
 import os
 import random
 import sys
+import threading
 import time
+import urllib.parse
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, build_http
 from oauth2client.client import flow_from_clientsecrets
 from oauth2client.file import Storage
 from oauth2client.tools import argparser, run_flow
@@ -26,6 +31,10 @@ RETRIABLE_EXCEPTIONS = (httplib2.HttpLib2Error, IOError, http.client.NotConnecte
 
 RETRIABLE_STATUS_CODES = [500, 502, 503, 504]
 
+# Taille des morceaux envoyés : multiple de 256 Kio exigé par l'API
+CHUNK_ALIGN = 256 * 1024
+DEFAULT_CHUNK_MB = 8
+
 CLIENT_SECRETS_FILE = "backend/scripts/client_secret.json"
 
 YOUTUBE_UPLOAD_SCOPE = "https://www.googleapis.com/auth/youtube.upload"
@@ -50,7 +59,7 @@ https://developers.google.com/api-client-library/python/guide/aaa_client_secrets
 VALID_PRIVACY_STATUSES = ("public", "private", "unlisted")
 
 
-def get_authenticated_service(args):
+def get_credentials(args):
     flow = flow_from_clientsecrets(CLIENT_SECRETS_FILE,
         scope=YOUTUBE_UPLOAD_SCOPE,
         message=MISSING_CLIENT_SECRETS_MESSAGE)
@@ -60,20 +69,92 @@ def get_authenticated_service(args):
 
     if credentials is None or credentials.invalid:
         credentials = run_flow(flow, storage, args)
+    return credentials
+
+def build_service(credentials, api_endpoint=None):
+    """YouTube client with its own Http object (httplib2 is not thread-safe).
+    Without credentials, requests are sent unauthenticated (fake local endpoint)."""
+    # build_http() ne suit pas les 308 « Resume Incomplete » des uploads par morceaux
+    http = build_http()
+    if credentials is not None:
+        http = credentials.authorize(http)
+    client_options = {"api_endpoint": api_endpoint} if api_endpoint else None
+    return build(YOUTUBE_API_SERVICE_NAME, YOUTUBE_API_VERSION, http=http, client_options=client_options)
+
+def get_authenticated_service(args):
+    credentials = None if args.anonymous else get_credentials(args)
+    return build_service(credentials, args.api_endpoint)
+
+def chunk_size_bytes(chunk_mb):
+    """Chunk size in bytes rounded to the 256 KiB multiple required by the API (-1 = single request)"""
+    if chunk_mb <= 0:
+        return -1
+    return max(CHUNK_ALIGN, int(chunk_mb * 1024 * 1024) // CHUNK_ALIGN * CHUNK_ALIGN)
+
+def session_path_for(video_file):
+    return video_file + '.upload.json'
 
-    return build(YOUTUBE_API_SERVICE_NAME, YOUTUBE_API_VERSION,
-        http=credentials.authorize(httplib2.Http()))
+def load_session(video_file):
+    """Saved resumable-session URI, if the video has not changed since"""
+    path = session_path_for(video_file)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        session = json.load(f)
+    stat = os.stat(video_file)
+    if session.get("size") != stat.st_size or session.get("mtime") != stat.st_mtime:
+        os.remove(path)
+        return None
+    return session.get("resumable_uri")
 
-def initialize_upload(youtube, options):
-    tags = None
-    if options.keywords:
-        tags = options.keywords.split(",")
+def save_session(video_file, resumable_uri):
+    stat = os.stat(video_file)
+    with open(session_path_for(video_file), 'w', encoding='utf-8') as f:
+        json.dump({"resumable_uri": resumable_uri, "size": stat.st_size, "mtime": stat.st_mtime}, f)
 
+def clear_session(video_file):
+    path = session_path_for(video_file)
+    if os.path.exists(path):
+        os.remove(path)
+
+def keyword_list(keywords):
+    """Tags from a comma-separated string (command line) or a list (<video>.json)"""
+    if not keywords:
+        return None
+    if isinstance(keywords, str):
+        keywords = keywords.split(",")
+    return [str(k).strip() for k in keywords if str(k).strip()] or None
+
+def upload_uri(uri, api_endpoint=None):
+    """googleapiclient keeps only the host of an api_endpoint for the upload URL, not its scheme (local http)"""
+    if not api_endpoint:
+        return uri
+    return urllib.parse.urlparse(uri)._replace(scheme=urllib.parse.urlparse(api_endpoint).scheme).geturl()
+
+def query_upload_status(insert_request):
+    """Ask the server how much of the session it holds (empty PUT, "308 Resume Incomplete" + Range).
+
+    Moves insert_request.resumable_progress to the first byte not acknowledged;
+    returns the response body if the upload had already completed, else None.
+    """
+    size = insert_request.resumable.size()
+    resp, content = insert_request.http.request(
+        insert_request.resumable_uri, "PUT", headers={"Content-Range": f"bytes */{size}", "Content-Length": "0"})
+    if resp.status in (200, 201):
+        return json.loads(content)
+    if resp.status != 308:
+        raise HttpError(resp, content, uri=insert_request.resumable_uri)
+    # Range: bytes=0-<dernier octet reçu> ; absent si rien n'a été reçu
+    insert_request.resumable_progress = int(resp["range"].split("-")[1]) + 1 if "range" in resp else 0
+    return None
+
+def initialize_upload(youtube, options, chunk_size=None, api_endpoint=None):
+    """Upload options.file, resuming a saved session if one exists; returns the video id"""
     body = dict(
         snippet=dict(
             title=options.title,
             description=options.description,
-            tags=tags,
+            tags=keyword_list(options.keywords),
             categoryId=options.category
         ),
         status=dict(
@@ -81,45 +162,131 @@ def initialize_upload(youtube, options):
         )
     )
 
-    insert_request = youtube.videos().insert(
-        part=",".join(body.keys()),
-        body=body,
-        media_body=MediaFileUpload(options.file, chunksize=-1, resumable=True)
-    )
+    if chunk_size is None:
+        chunk_size = chunk_size_bytes(DEFAULT_CHUNK_MB)
 
-    resumable_upload(insert_request)
+    def new_request():
+        request = youtube.videos().insert(
+            part=",".join(body.keys()),
+            body=body,
+            media_body=MediaFileUpload(options.file, chunksize=chunk_size, resumable=True)
+        )
+        request.uri = upload_uri(request.uri, api_endpoint)
+        return request
 
-def resumable_upload(insert_request):
+    insert_request = new_request()
+    resumable_uri = load_session(options.file)
+    if resumable_uri:
+        print(f"Resuming previous upload session for {options.file}")
+        insert_request.resumable_uri = resumable_uri
+        try:
+            return resumable_upload(insert_request, options.file, resync=True)
+        except HttpError as e:
+            if e.resp.status not in (404, 410):
+                raise
+            print(f"Upload session expired ({e.resp.status}), starting over")
+            clear_session(options.file)
+            insert_request = new_request()
+    return resumable_upload(insert_request, options.file)
+
+def resumable_upload(insert_request, video_file=None, resync=False):
+    """Send the chunks, retrying transient errors; the session URI is saved
+    next to the video so an interrupted upload can resume. After an error
+    (or with `resync`, for a saved session) the server is asked for the last
+    byte it acknowledged before sending the next chunk. Returns the video id."""
+    label = os.path.basename(video_file) if video_file else "file"
+    saved_uri = insert_request.resumable_uri
     response = None
-    error = None
     retry = 0
     while response is None:
+        error = None
         try:
-            print("Uploading file...")
-            status, response = insert_request.next_chunk()
+            if resync and insert_request.resumable_uri:
+                status, response = None, query_upload_status(insert_request)
+                resync = False
+                print(f"Resuming {label} at byte {insert_request.resumable_progress}")
+            else:
+                status, response = insert_request.next_chunk()
+            if video_file and insert_request.resumable_uri and insert_request.resumable_uri != saved_uri:
+                saved_uri = insert_request.resumable_uri
+                save_session(video_file, saved_uri)
+            if status is not None:
+                print(f"Uploading {label}: {int(status.progress() * 100)}%")
             if response is not None:
                 if 'id' in response:
                     print(f"Video id '{response['id']}' was successfully uploaded.")
                 else:
-                    sys.exit(f"The upload failed with an unexpected response: {response}")
+                    raise RuntimeError(f"The upload failed with an unexpected response: {response}")
         except HttpError as e:
             if e.resp.status in RETRIABLE_STATUS_CODES:
                 error = f"A retriable HTTP error {e.resp.status} occurred:\n{e.content}"
+                resync = True
             else:
                 raise
         except RETRIABLE_EXCEPTIONS as e:
             error = f"A retriable error occurred: {e}"
+            resync = True
 
         if error is not None:
             print(error)
             retry += 1
             if retry > MAX_RETRIES:
-                sys.exit("No longer attempting to retry.")
+                raise RuntimeError("No longer attempting to retry.")
 
             max_sleep = 2 ** retry
             sleep_seconds = random.random() * max_sleep
             print(f"Sleeping {sleep_seconds} seconds and then retrying...")
             time.sleep(sleep_seconds)
+        else:
+            retry = 0
+
+    if video_file:
+        clear_session(video_file)
+    return response['id']
+
+def queue_options(video_file, options):
+    """Per-video options: title from <video>.json ({"title", "description", "keywords"}) or the file name.
+    "keywords" may be a list or a comma-separated string."""
+    meta = {}
+    meta_file = os.path.splitext(video_file)[0] + '.json'
+    if os.path.exists(meta_file):
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    title = meta.get("title") or os.path.splitext(os.path.basename(video_file))[0].replace('_', ' ')
+    return Namespace(
+        file=video_file,
+        title=title[:100],
+        description=meta.get("description", options.description),
+        category=options.category,
+        keywords=meta.get("keywords", options.keywords),
+        privacyStatus=options.privacyStatus,
+    )
+
+def upload_queue(video_files, options, credentials=None, workers=3, chunk_size=None, api_endpoint=None):
+    """Upload several videos concurrently with a bounded pool (one client per worker thread).
+
+    Interrupted uploads resume from their saved session on the next run.
+    Returns {video_file: video id or None on failure}.
+    """
+    local = threading.local()
+
+    def job(video_file):
+        if not hasattr(local, "youtube"):
+            local.youtube = build_service(credentials, api_endpoint)
+        return initialize_upload(local.youtube, queue_options(video_file, options), chunk_size, api_endpoint)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(job, video_file): video_file for video_file in video_files}
+        for future in as_completed(futures):
+            video_file = futures[future]
+            try:
+                results[video_file] = future.result()
+            except Exception as e:
+                print(f"Upload of {video_file} failed: {e}")
+                results[video_file] = None
+    print(f"Uploaded {sum(1 for v in results.values() if v)}/{len(video_files)} videos")
+    return results
 
 if __name__ == '__main__':
     argparser.add_argument(
@@ -134,13 +301,31 @@ if __name__ == '__main__':
     argparser.add_argument("--category", default="22", help="Numeric video category. See https://developers.google.com/youtube/v3/docs/videoCategories/list")
     argparser.add_argument("--keywords", help="Video keywords, comma separated", default="")
     argparser.add_argument("--privacyStatus", choices=VALID_PRIVACY_STATUSES, default=VALID_PRIVACY_STATUSES[0], help="Video privacy status.")
+    argparser.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_MB,
+        help=f"Upload chunk size in MiB, rounded to 256 KiB (0 = single request). Default: {DEFAULT_CHUNK_MB}")
+    argparser.add_argument("--queue", nargs="+", default=None, metavar="VIDEO",
+        help="Upload several videos concurrently (title from <video>.json or the file name)")
+    argparser.add_argument("--workers", type=int, default=3, help="Concurrent uploads in --queue mode")
+    argparser.add_argument("--api-endpoint", default=None, help="API root override (e.g. a local fake upload server)")
+    argparser.add_argument("--anonymous", action="store_true", help="Skip OAuth (only for a local fake endpoint)")
     args = argparser.parse_args()
+    chunk_size = chunk_size_bytes(args.chunk_mb)
+
+    if args.queue:
+        missing = [f for f in args.queue if not os.path.exists(f)]
+        if missing:
+            sys.exit(f"Video files not found: {', '.join(missing)}")
+        credentials = None if args.anonymous else get_credentials(args)
+        results = upload_queue(args.queue, args, credentials, args.workers, chunk_size, args.api_endpoint)
+        sys.exit(0 if all(results.values()) else 1)
 
     if not os.path.exists(args.file):
         sys.exit(f"Please specify a valid file using the --file= parameter. (Default: {args.file})")
 
     youtube = get_authenticated_service(args)
     try:
-        initialize_upload(youtube, args)
+        initialize_upload(youtube, args, chunk_size, args.api_endpoint)
     except HttpError as e:
-        print(f"An HTTP error {e.resp.status} occurred:\n{e.content}")
\ No newline at end of file
+        print(f"An HTTP error {e.resp.status} occurred:\n{e.content}")
+    except RuntimeError as e:
+        sys.exit(str(e))
\ No newline at end of file
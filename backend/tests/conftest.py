@@ -0,0 +1,22 @@
+"""Shared fixtures: scripts on sys.path and a local HTTP server for fake APIs."""
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+
+@contextmanager
+def serve(handler_class):
+    """Run `handler_class` on a local ThreadingHTTPServer; yields its base URL"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,70 @@
+"""add_caption.CaptionTrack lookup at word boundaries and the SpriteCache LRU."""
+import numpy as np
+
+from add_caption import CaptionTrack, SpriteCache, render_word_sprite
+
+SCREEN = (180, 320)
+
+
+def word(text, start, end):
+    return {"text": text, "start": start, "end": end}
+
+
+def active(track, t):
+    return [track.entries.index(entry) for entry in track.active_entries(t)]
+
+
+def test_active_words_at_segment_boundaries():
+    words = [word("one", 0.0, 1.0), word("two", 1.0, 2.0), word("three", 1.5, 3.0)]
+    track = CaptionTrack(words, SCREEN, sprite_cache=SpriteCache())
+
+    assert active(track, 0.0) == [0]
+    assert active(track, 0.999) == [0]
+    # Fin exclue : à 1.0 s seul le mot suivant est affiché
+    assert active(track, 1.0) == [1]
+    assert active(track, 1.5) == [1, 2]
+    assert active(track, 2.0) == [2]
+    assert active(track, 3.0) == []
+    assert active(track, -0.1) == []
+
+
+def test_long_word_stays_active_over_later_ones():
+    words = [word("long", 0.0, 10.0), word("a", 2.0, 3.0), word("b", 4.0, 5.0)]
+    track = CaptionTrack(words, SCREEN, sprite_cache=SpriteCache())
+
+    assert active(track, 4.5) == [0, 2]
+    assert active(track, 6.0) == [0]
+    assert active(track, 10.0) == []
+
+
+def test_empty_and_zero_length_words_are_skipped():
+    words = [word("", 0.0, 1.0), word("zero", 1.0, 1.0), word("ok", 1.0, 2.0)]
+    track = CaptionTrack(words, SCREEN, sprite_cache=SpriteCache())
+    assert len(track.entries) == 1
+    assert track.starts == [1.0]
+
+
+def test_compose_only_draws_active_words():
+    track = CaptionTrack([word("hello", 1.0, 2.0)], SCREEN, sprite_cache=SpriteCache())
+    frame = np.zeros((SCREEN[1], SCREEN[0], 3), dtype=np.uint8)
+
+    assert track.compose(frame, 0.5) is frame
+    drawn = track.compose(frame, 1.5)
+    assert drawn.any()
+    # La frame source n'est pas modifiée
+    assert not frame.any()
+
+
+def test_sprite_cache_reuses_and_evicts_least_recently_used():
+    size = {w: render_word_sprite(w, "normal", 40)[0].nbytes for w in ("hello", "world", "again")}
+    cache = SpriteCache(max_bytes=size["hello"] + max(size["world"], size["again"]))
+    first = cache.get("hello", "normal", 40)
+    assert cache.get("hello", "normal", 40) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.get("world", "normal", 40)
+    cache.get("hello", "normal", 40)  # "hello" redevient le plus récent
+    cache.get("again", "normal", 40)
+    assert ("hello", "normal", 40, None) in cache._sprites
+    assert ("world", "normal", 40, None) not in cache._sprites
+    assert cache.current_bytes <= cache.max_bytes
@@ -0,0 +1,52 @@
+"""clip_planner.plan_montage: exact coverage, closing clip and keyframe-aligned offsets."""
+import pytest
+
+from clip_planner import plan_montage
+
+DURATIONS = {"a.mp4": 12.0, "b.mp4": 7.5, "c.mp4": 30.0, "d.mp4": 4.0, "e.mp4": 18.0}
+# Une image clé toutes les 2 s
+KEYFRAMES = {path: [2.0 * i for i in range(int(d // 2) + 1)] for path, d in DURATIONS.items()}
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("target", [3.0, 25.0, 61.3, 150.0])
+def test_segments_cover_target_inside_their_clips(seed, target):
+    segments = plan_montage(DURATIONS, target, seed=seed, max_segment=10.0, keyframes=KEYFRAMES)
+
+    assert sum(seg.end - seg.start for seg in segments) == pytest.approx(target)
+    for seg in segments:
+        assert 0 <= seg.start < seg.end <= DURATIONS[seg.path] + 1e-6
+        assert seg.end - seg.start <= 10.0 + 1e-6
+        # Segment partiel : il commence sur une image clé (stream copy sans déplacer la coupe)
+        if seg.end - seg.start < DURATIONS[seg.path]:
+            assert seg.start in KEYFRAMES[seg.path]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_closing_clip_is_long_enough_for_the_rest(seed):
+    segments = plan_montage(DURATIONS, 45.0, seed=seed, keyframes=KEYFRAMES)
+    shown = sum(seg.end - seg.start for seg in segments[:-1])
+    closing = segments[-1]
+
+    assert closing.end - closing.start == pytest.approx(45.0 - shown)
+    assert DURATIONS[closing.path] >= closing.end - closing.start
+    # 45 s tiennent dans la bibliothèque : aucun clip n'est réutilisé, la clôture comprise
+    assert len({seg.path for seg in segments}) == len(segments)
+
+
+def test_deterministic_for_a_seed():
+    first = plan_montage(DURATIONS, 61.3, seed=7, keyframes=KEYFRAMES)
+    assert plan_montage(DURATIONS, 61.3, seed=7, keyframes=KEYFRAMES) == first
+    assert plan_montage(DURATIONS, 61.3, seed=8, keyframes=KEYFRAMES) != first
+
+
+def test_without_keyframes_offsets_are_free():
+    segments = plan_montage({"long.mp4": 100.0}, 10.0, seed=3)
+    assert len(segments) == 1
+    assert segments[0].end - segments[0].start == pytest.approx(10.0)
+    assert 0 <= segments[0].start <= 90.0
+
+
+def test_empty_library_raises():
+    with pytest.raises(ValueError):
+        plan_montage({"broken.mp4": 0, "missing.mp4": None}, 10.0)
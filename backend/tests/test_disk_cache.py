@@ -0,0 +1,45 @@
+"""disk_cache: LRU eviction without walking the cache on every put."""
+import os
+
+from disk_cache import DiskCache, hash_key
+
+
+def test_put_walks_only_when_over_budget(tmp_path, monkeypatch):
+    cache = DiskCache("t", max_bytes=1000, suffix='.bin', root=str(tmp_path))
+    walks = []
+    entries = DiskCache.entries
+    monkeypatch.setattr(DiskCache, "entries", lambda self: walks.append(1) or entries(self))
+
+    for i in range(9):
+        cache.put_bytes(hash_key(i), b"x" * 100)
+    # Un seul parcours initial pour mesurer le cache
+    assert len(walks) == 1
+
+    for i in range(9, 12):
+        cache.put_bytes(hash_key(i), b"x" * 100)
+    assert len(walks) > 1
+    assert sum(size for _, size, _ in cache.entries()) <= 1000
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache("t", max_bytes=300, suffix='.bin', root=str(tmp_path))
+    keys = [hash_key(i) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put_bytes(key, b"x" * 100)
+        os.utime(cache.path_for(key), (1000 + i, 1000 + i))
+    # Lu récemment : keys[0] devient le plus récent
+    assert cache.get_bytes(keys[0]) is not None
+
+    cache.put_bytes(hash_key("new"), b"y" * 100)
+    assert cache.get_path(keys[1]) is None
+    assert cache.get_path(keys[0]) is not None
+    assert cache.get_path(keys[2]) is not None
+
+
+def test_overwrite_does_not_count_twice(tmp_path):
+    cache = DiskCache("t", max_bytes=250, suffix='.bin', root=str(tmp_path))
+    key = hash_key("same")
+    for _ in range(5):
+        cache.put_bytes(key, b"x" * 100)
+    assert cache._total == 100
+    assert os.path.exists(cache.path_for(key))
@@ -0,0 +1,144 @@
+"""generate_story batch mode against a stub Gemini REST endpoint (http.server)."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from conftest import serve
+
+import generate_story
+
+STORY = "Once upon a time, in a quiet town, something strange happened at the bakery. " * 5
+PROMPT_TOKENS = 120
+OUTPUT_TOKENS = 400
+
+
+class StubGemini:
+    """generateContent endpoint; answers the first requests with the `failures` statuses"""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.times = []
+        self.statuses = []
+        self.lock = threading.Lock()
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub.lock:
+                    stub.times.append(time.monotonic())
+                    status = stub.failures.pop(0) if stub.failures else 200
+                    stub.statuses.append(status)
+                if ":generateContent" not in self.path:
+                    status = 404
+                if status == 200:
+                    body = {
+                        "candidates": [{"content": {"parts": [{"text": STORY}], "role": "model"},
+                                        "finishReason": "STOP", "index": 0}],
+                        "usageMetadata": {"promptTokenCount": PROMPT_TOKENS, "candidatesTokenCount": OUTPUT_TOKENS,
+                                          "totalTokenCount": PROMPT_TOKENS + OUTPUT_TOKENS},
+                    }
+                else:
+                    body = {"error": {"code": status, "message": "stub failure", "status": "UNAVAILABLE"}}
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def sample(tmp_path):
+    path = tmp_path / "sample.md"
+    path.write_text("A short sample story about a baker.\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def rest_client():
+    pytest.importorskip("google.generativeai")
+
+    def make(base_url):
+        return generate_story.create_model("gemini-2.5-flash", base_url)
+    return make
+
+
+def test_retry_with_backoff_on_429_and_5xx(rest_client):
+    stub = StubGemini(failures=[429, 503])
+    budget = generate_story.TokenBudget(100000)
+    with serve(stub.handler()) as base_url:
+        story, meta = generate_story.generate_one(rest_client(base_url), "prompt", budget=budget, backoff=0.2)
+
+    assert story == STORY
+    assert stub.statuses == [429, 503, 200]
+    assert meta["attempts"] == 3
+    gaps = [b - a for a, b in zip(stub.times, stub.times[1:])]
+    # Backoff exponentiel : ~0.2 s puis ~0.4 s
+    assert gaps[0] >= 0.2 and gaps[1] >= 0.4
+    # Les essais échoués libèrent leur réservation sans rien consommer
+    assert budget.reserved == 0
+    assert budget.used == PROMPT_TOKENS + OUTPUT_TOKENS
+
+
+def test_gives_up_after_max_attempts(rest_client):
+    stub = StubGemini(failures=[500, 502, 503])
+    with serve(stub.handler()) as base_url:
+        with pytest.raises(RuntimeError):
+            generate_story.generate_one(rest_client(base_url), "prompt", max_attempts=3, backoff=0.01)
+    assert stub.statuses == [500, 502, 503]
+
+
+def test_batch_rate_limit_and_meta(tmp_path, sample, rest_client):
+    stub = StubGemini()
+    output_dir = tmp_path / "generated"
+    with serve(stub.handler()) as base_url:
+        written = generate_story.generate_stories(sample, str(output_dir), count=4, model="gemini-2.5-flash",
+                                                  concurrency=4, requests_per_minute=240, api_endpoint=base_url)
+
+    assert len(written) == 4
+    # 240 requêtes/min : une requête toutes les 0,25 s malgré 4 threads
+    gaps = [b - a for a, b in zip(stub.times, stub.times[1:])]
+    assert min(gaps) >= 0.2
+
+    meta = json.loads((output_dir / "generated_story_01_meta.json").read_text(encoding="utf-8"))
+    assert meta["prompt_tokens"] == PROMPT_TOKENS
+    assert meta["output_tokens"] == OUTPUT_TOKENS
+    assert meta["total_tokens"] == PROMPT_TOKENS + OUTPUT_TOKENS
+    assert meta["length_chars"] == len(STORY)
+    assert meta["index"] == 1 and meta["attempts"] == 1
+
+    batch = json.loads((output_dir / "batch_meta.json").read_text(encoding="utf-8"))
+    assert batch["generated"] == 4 and batch["failed"] == 0
+    assert batch["tokens_used"] == 4 * (PROMPT_TOKENS + OUTPUT_TOKENS)
+
+
+def test_token_budget_stops_new_requests(tmp_path, sample, rest_client):
+    stub = StubGemini()
+    with serve(stub.handler()) as base_url:
+        written = generate_story.generate_stories(sample, str(tmp_path / "out"), count=3, model="gemini-2.5-flash",
+                                                  concurrency=1, requests_per_minute=0, token_budget=1000,
+                                                  api_endpoint=base_url)
+    # L'estimation d'une génération (prompt + 1500 tokens) dépasse déjà le budget
+    assert written == []
+    assert stub.statuses == []
+
+
+def test_token_budget_reserve_settle():
+    budget = generate_story.TokenBudget(1000)
+    assert budget.reserve(600)
+    assert not budget.reserve(600)
+    budget.settle(600, 200)
+    assert (budget.reserved, budget.used) == (0, 200)
+    assert budget.reserve(800)
+    assert not budget.reserve(1)
@@ -0,0 +1,26 @@
+"""media_index frame-rate parsing and the stream-copy check built on it."""
+from media_index import parse_fps
+from montage import stream_copy_compatible
+
+
+def probe(**overrides):
+    meta = {'codec': 'h264', 'width': 1080, 'height': 1920, 'fps': '30/1', 'frame_rate': 30.0,
+            'pix_fmt': 'yuv420p', 'time_base': '1/15360'}
+    meta.update(overrides)
+    return meta
+
+
+def test_parse_fps():
+    assert parse_fps('30/1') == 30.0
+    assert abs(parse_fps('30000/1001') - 29.97) < 0.01
+    assert parse_fps('25') == 25.0
+    assert parse_fps('0/0') is None
+    assert parse_fps('0/1') is None
+    assert parse_fps('N/A') is None
+
+
+def test_unknown_frame_rate_is_not_stream_copy_compatible():
+    assert stream_copy_compatible([probe(), probe()])
+    # ffprobe "0/0" : repli sur moviepy au lieu d'une ZeroDivisionError
+    assert not stream_copy_compatible([probe(fps='0/0', frame_rate=None), probe(fps='0/0', frame_rate=None)])
+    assert not stream_copy_compatible([probe(), probe(width=720)])
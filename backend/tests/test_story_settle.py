@@ -0,0 +1,71 @@
+"""A Reddit story split in several parts is settled once, when all its parts are finished."""
+import pytest
+
+import job_scheduler
+import pipeline_runner
+import reddit_harvester
+
+
+@pytest.fixture
+def settled(monkeypatch):
+    calls = []
+    monkeypatch.setattr(reddit_harvester, "settle_story", lambda path, used, *args: calls.append((path, used)))
+    return calls
+
+
+def test_run_queue_partial_failure_marks_source_used(tmp_path, monkeypatch, settled):
+    source = str(tmp_path / "reddit_story.md")
+    parts = [str(tmp_path / f"part{i}.md") for i in range(3)]
+    monkeypatch.setattr(pipeline_runner, "AUDIO_DIR", str(tmp_path / "audio"))
+    monkeypatch.setattr(pipeline_runner, "VIDEO_DIR", str(tmp_path / "video"))
+    monkeypatch.setattr(pipeline_runner, "ensure_video_list", lambda path: None)
+    monkeypatch.setattr("story_text.preprocess_file", lambda path: parts)
+
+    def run_story(story_md, *args):
+        if story_md == parts[1]:
+            raise RuntimeError("render failed")
+        return story_md + ".mp4"
+    monkeypatch.setattr(pipeline_runner, "run_story", run_story)
+
+    outputs = pipeline_runner.run_queue([source])
+
+    assert outputs == [parts[0] + ".mp4", parts[2] + ".mp4"]
+    # Deux parties publiées : l'histoire ne doit pas revenir dans la file
+    assert settled == [(source, True)]
+
+
+def test_run_queue_all_parts_failed_releases_source(tmp_path, monkeypatch, settled):
+    source = str(tmp_path / "reddit_story.md")
+    monkeypatch.setattr(pipeline_runner, "AUDIO_DIR", str(tmp_path / "audio"))
+    monkeypatch.setattr(pipeline_runner, "VIDEO_DIR", str(tmp_path / "video"))
+    monkeypatch.setattr(pipeline_runner, "ensure_video_list", lambda path: None)
+    monkeypatch.setattr("story_text.preprocess_file", lambda path: [path])
+    monkeypatch.setattr(pipeline_runner, "run_story", lambda *args: 1 / 0)
+
+    assert pipeline_runner.run_queue([source]) == []
+    assert settled == [(source, False)]
+
+
+def test_job_store_source_rendered(tmp_path):
+    store = job_scheduler.JobStore(str(tmp_path / "jobs.db"))
+    try:
+        source, other_source = str(tmp_path / "story.md"), str(tmp_path / "other.md")
+        ids = [store.add(f"part{i}.md", {}, source=source) for i in range(3)]
+        assert store.source_rendered(source) is None
+
+        store.start(ids[0])
+        store.finish_stage(ids[0], job_scheduler.STAGES[-1], "part0.mp4")
+        for _ in range(job_scheduler.MAX_ATTEMPTS):
+            store.fail(ids[1], "render: boom")
+        # Une partie encore en file : rien n'est décidé
+        assert store.source_rendered(source) is None
+
+        store.finish_stage(ids[2], job_scheduler.STAGES[-1], "part2.mp4")
+        assert store.source_rendered(source) is True
+
+        other = store.add("alone.md", {}, source=other_source)
+        for _ in range(job_scheduler.MAX_ATTEMPTS):
+            store.fail(other, "tts: boom")
+        assert store.source_rendered(other_source) is False
+    finally:
+        store.close()
@@ -0,0 +1,57 @@
+"""story_text: spoken normalization (SO, years, amounts) and multi-story parsing."""
+import pytest
+
+from story_text import normalize_text, parse_stories
+
+
+@pytest.mark.parametrize("text, spoken", [
+    ("I told my SO about it.", "I told my partner about it."),
+    ("Her SO, who is great, agreed.", "Her partner, who is great, agreed."),
+    ("It was SO much fun.", "It was SO much fun."),
+    ("SO. Anyway.", "SO. Anyway."),
+])
+def test_so_only_after_a_possessive(text, spoken):
+    assert normalize_text(text) == spoken
+
+
+@pytest.mark.parametrize("text, spoken", [
+    ("We met in 1999.", "We met in nineteen ninety-nine."),
+    ("Since 2005, nothing changed.", "Since two thousand five, nothing changed."),
+    ("The summer of 2019 was hot.", "The summer of twenty nineteen was hot."),
+    ("On May 3, 2021 we moved.", "On May three, twenty twenty-one we moved."),
+    ("It cost 1500 dollars.", "It cost one thousand five hundred dollars."),
+    ("I paid in 1500 dollars.", "I paid in one thousand five hundred dollars."),
+    ("There were 1200 people.", "There were one thousand two hundred people."),
+    ("I have 1999 reasons.", "I have one thousand nine hundred ninety-nine reasons."),
+])
+def test_years_only_in_a_date_context(text, spoken):
+    assert normalize_text(text) == spoken
+
+
+def test_amounts_times_and_ages():
+    assert normalize_text("$12.50 at 7:30pm") == "twelve dollars and fifty cents at seven thirty P M"
+    assert normalize_text("I (25F) won $2k") == "I (twenty-five, female) won two thousand dollars"
+    assert normalize_text("the 3rd time, 40%") == "the third time, forty percent"
+
+
+def test_parse_stories_splits_on_headings_and_keeps_metadata():
+    md = ("# Story 1: First one\n"
+          "Author: someone\n"
+          "URL: https://reddit.com/r/stories/1\n"
+          "\n"
+          "Body of the first story.\n"
+          "Score: in the body, this line stays\n"
+          "\n"
+          "# Second\n"
+          "Second body.\n")
+    stories = parse_stories(md)
+
+    assert [s["title"] for s in stories] == ["First one", "Second"]
+    assert stories[0]["meta"] == {"author": "someone", "url": "https://reddit.com/r/stories/1"}
+    assert stories[0]["body"] == "Body of the first story.\nScore: in the body, this line stays"
+    assert stories[1]["body"] == "Second body."
+
+
+def test_parse_stories_without_heading():
+    assert parse_stories("Just text.\n") == [{"title": None, "meta": {}, "body": "Just text."}]
+    assert parse_stories("\n\n") == []
@@ -0,0 +1,153 @@
+"""upload_to_YT resumable uploads against a fake YouTube upload endpoint (http.server)."""
+import json
+import os
+import re
+import threading
+from argparse import Namespace
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+pytest.importorskip("oauth2client")
+
+from conftest import serve
+
+import upload_to_YT
+
+CHUNK = upload_to_YT.CHUNK_ALIGN
+
+
+class FakeUploadServer:
+    """Resumable-upload protocol: session start, chunk PUTs answered by 308 + Range, status queries.
+
+    `drop_at` lists chunk offsets whose PUT is read then dropped without a
+    response (the connection dies mid-upload, the bytes are not kept).
+    """
+
+    def __init__(self, drop_at=()):
+        self.data = bytearray()
+        self.total = None
+        self.drop_at = set(drop_at)
+        self.puts = []
+        self.status_queries = 0
+        self.lock = threading.Lock()
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # httplib2 re-sends a dropped request once with an already consumed body: don't wait for it
+            timeout = 1
+
+            def reply(self, status, headers=(), body=b""):
+                self.send_response(status)
+                for key, value in headers:
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def acknowledged(self):
+                if fake.data:
+                    return [("Range", f"bytes=0-{len(fake.data) - 1}")]
+                return []
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                fake.total = int(self.headers["X-Upload-Content-Length"])
+                host = self.headers["Host"]
+                self.reply(200, [("Location", f"http://{host}/upload/session/1")])
+
+            def do_PUT(self):
+                try:
+                    body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                except TimeoutError:
+                    self.close_connection = True
+                    return
+                content_range = self.headers.get("Content-Range", "")
+                with fake.lock:
+                    if content_range.startswith("bytes */"):
+                        fake.status_queries += 1
+                        if len(fake.data) == fake.total:
+                            self.reply(200, [("Content-Type", "application/json")], json.dumps({"id": "vid123"}).encode())
+                        else:
+                            self.reply(308, self.acknowledged())
+                        return
+                    start, end, total = map(int, re.match(r"bytes (\d+)-(\d+)/(\d+)", content_range).groups())
+                    fake.puts.append(start)
+                    if start in fake.drop_at:
+                        fake.drop_at.discard(start)
+                        self.close_connection = True
+                        self.connection.shutdown(2)
+                        return
+                    assert start == len(fake.data), f"chunk at {start}, server holds {len(fake.data)} bytes"
+                    fake.data.extend(body)
+                    if len(fake.data) == total:
+                        self.reply(200, [("Content-Type", "application/json")], json.dumps({"id": "vid123"}).encode())
+                    else:
+                        self.reply(308, self.acknowledged())
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "short.mp4"
+    path.write_bytes(os.urandom(3 * CHUNK + 1000))
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(upload_to_YT.random, "random", lambda: 0.0)
+
+
+def options_for(video_file, keywords="a,b"):
+    return Namespace(file=video_file, title="t", description="d", category="22",
+                     keywords=keywords, privacyStatus="private")
+
+
+def test_retry_resumes_from_last_acknowledged_byte(video):
+    fake = FakeUploadServer(drop_at={2 * CHUNK})
+    with serve(fake.handler()) as base_url:
+        youtube = upload_to_YT.build_service(None, base_url)
+        video_id = upload_to_YT.initialize_upload(youtube, options_for(video), CHUNK, base_url)
+
+    assert video_id == "vid123"
+    assert bytes(fake.data) == open(video, "rb").read()
+    # Le morceau perdu est renvoyé depuis le dernier octet acquitté, pas depuis le début
+    assert fake.puts == [0, CHUNK, 2 * CHUNK, 2 * CHUNK, 3 * CHUNK]
+    assert fake.status_queries >= 1
+    assert not os.path.exists(upload_to_YT.session_path_for(video))
+
+
+def test_saved_session_resumes_after_a_crash(video, monkeypatch):
+    fake = FakeUploadServer(drop_at={2 * CHUNK})
+    with serve(fake.handler()) as base_url:
+        monkeypatch.setattr(upload_to_YT, "MAX_RETRIES", 0)
+        with pytest.raises(RuntimeError):
+            upload_to_YT.initialize_upload(upload_to_YT.build_service(None, base_url), options_for(video),
+                                           CHUNK, base_url)
+        assert os.path.exists(upload_to_YT.session_path_for(video))
+        assert len(fake.data) == 2 * CHUNK
+
+        # Nouveau processus : client neuf, session relue depuis <video>.upload.json
+        video_id = upload_to_YT.initialize_upload(upload_to_YT.build_service(None, base_url), options_for(video),
+                                                  CHUNK, base_url)
+
+    assert video_id == "vid123"
+    assert bytes(fake.data) == open(video, "rb").read()
+    assert fake.puts == [0, CHUNK, 2 * CHUNK, 2 * CHUNK, 3 * CHUNK]
+    assert not os.path.exists(upload_to_YT.session_path_for(video))
+
+
+def test_keywords_from_string_or_list():
+    assert upload_to_YT.keyword_list("reddit, story,") == ["reddit", "story"]
+    assert upload_to_YT.keyword_list(["reddit", " story "]) == ["reddit", "story"]
+    assert upload_to_YT.keyword_list("") is None
+    assert upload_to_YT.keyword_list([]) is None